@@ -0,0 +1,169 @@
+"""Decode the feeds from many ground stations in one process, tagging each packet with the station that heard it"""
+
+# Run from the repository root: python aggregation_server.py --stations stations.cfg --save all_stations.bin
+# The stations file has a section for each station, with the same options as the GUI's input_properties.cfg, e.g.,
+#   [boulder]
+#   ip_address = localhost
+#   port = 10000
+#   decode_kiss = True
+#   callsign = SFJPM86
+#   latitude = 40.240
+#   longitude = -105.2353
+# A station with serial_port and baud_rate instead of ip_address and port is read from its serial port. Without
+# --stations, the GUI's own input_properties.cfg is read, as a single station.
+
+import argparse
+import asyncio
+import configparser
+import os
+import sys
+from collections import namedtuple
+from async_socket_source import AsyncSocketSource, AsyncSerialSource, read_feeds
+from deduplicator import Deduplicator
+from logger import Logger
+from minxss_decoder_cli import format_packet
+from minxss_parser import beacon_fields
+from packet_demux import PacketDemultiplexer
+from packet_index import CaptureWriter
+
+DECODED_PACKETS = 'decoded_packets'  # Packets that parsed, e.g., housekeeping packets that passed validation
+
+default_config_filename = os.path.join(os.path.expanduser("~"), "MinXSS_Beacon_Decoder", "input_properties.cfg")
+
+# Where a packet was heard, as entered in the GUI
+Station = namedtuple('Station', ['callsign', 'latitude', 'longitude'])
+
+# A station and the source reading its feed, e.g., an AsyncSocketSource
+StationFeed = namedtuple('StationFeed', ['station', 'source'])
+
+# What the aggregation server hands to its handlers
+#   station [Station]: Where the packet was heard
+#   decoded_packet [DecodedPacket]: The packet, as from pipeline.parse_packets
+StationPacket = namedtuple('StationPacket', ['station', 'decoded_packet'])
+
+
+def read_station_config(config_filename, read_timeout=None, deduplicator=None):
+    """
+    Make a source for each station in a config file
+    # Input:
+    #   config_filename [str]: Path to the stations file, or to the GUI's input_properties.cfg
+    #   read_timeout [float]: [s] For each source: reconnect to a feed that has sent nothing for this long
+    #   deduplicator [Deduplicator]: Shared by every source, so a beacon heard by several stations is only passed on
+    #                                from the first
+    # Output:
+    #   station_feeds [list of StationFeed]: One for each section, in order
+    """
+    config = configparser.ConfigParser()
+    if not config.read(config_filename):
+        raise ValueError('Could not read the stations file {0}.'.format(config_filename))
+
+    station_feeds = []
+    for section in config.sections():
+        station = Station(config.get(section, 'callsign'), config.getfloat(section, 'latitude'),
+                          config.getfloat(section, 'longitude'))
+        if station.callsign in [station_feed.station.callsign for station_feed in station_feeds]:
+            raise ValueError('More than one station has the callsign {0}.'.format(station.callsign))
+
+        decode_kiss = config.getboolean(section, 'decode_kiss', fallback=False)
+        if config.has_option(section, 'ip_address'):  # As the GUI does, prefer the socket if both are set
+            source = AsyncSocketSource(config.get(section, 'ip_address'), config.getint(section, 'port'), decode_kiss,
+                                       read_timeout, deduplicator=deduplicator)
+        else:
+            source = AsyncSerialSource(config.get(section, 'serial_port'), config.getint(section, 'baud_rate'),
+                                       decode_kiss, read_timeout, deduplicator=deduplicator)
+        station_feeds.append(StationFeed(station, source))
+    return station_feeds
+
+
+class AggregationServer:
+    """
+    Reads every station's feed concurrently on one event loop, through the same framing and parser stages as pipeline,
+    and hands each packet, tagged with its station, to the handlers registered with packet_demultiplexer. Each station
+    has its own framing state, DeltaDecoder, and counters, so one station's noise or lost connection doesn't touch the
+    others' packets or statistics.
+    Input:
+        station_feeds [list of StationFeed]: E.g., from read_station_config
+    """
+    def __init__(self, station_feeds):
+        self.station_feeds = station_feeds
+        self.stations = {station_feed.source: station_feed.station for station_feed in station_feeds}
+        self.packet_demultiplexer = PacketDemultiplexer()  # Register handlers here; they're called with a StationPacket
+        self.log = Logger().create_log()
+
+    def handle_packet(self, source, decoded_packet):
+        if decoded_packet.decoded is not None:
+            source.counters[DECODED_PACKETS] += 1
+        self.packet_demultiplexer.dispatch(decoded_packet.apid, StationPacket(self.stations[source], decoded_packet))
+
+    def get_statistics(self):
+        """
+        Returns the link statistics of every station
+        # Output:
+        #   statistics [dict of dict]: For each station's callsign, its counters, e.g., DECODED_PACKETS, the frame
+        #                              extractor's, the number of reconnects, and, with a Deduplicator, the packets it
+        #                              heard first (UNIQUE_PACKETS) and after another station (DUPLICATE_PACKETS)
+        """
+        return {station.callsign: dict(source.counters) for station, source in self.station_feeds}
+
+    def log_statistics(self):
+        for callsign, counters in self.get_statistics().items():
+            self.log.info('Link statistics for {0}: {1}'.format(callsign, counters))
+
+    async def run(self, statistics_interval=None):
+        """
+        Read the feeds until cancelled
+        # Input:
+        #   statistics_interval [float]: [s] How often to log every station's statistics, or None not to
+        """
+        reading = asyncio.ensure_future(read_feeds([station_feed.source for station_feed in self.station_feeds],
+                                                   self.handle_packet))
+        try:
+            while statistics_interval is not None and not reading.done():
+                await asyncio.wait([reading], timeout=statistics_interval)
+                self.log_statistics()
+            await reading
+        finally:
+            reading.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stations', default=default_config_filename,
+                        help='Stations file, with a section for each station. Defaults to the GUI\'s input_properties.cfg.')
+    parser.add_argument('--read-timeout', type=float,
+                        help='[s] Reconnect to a feed that has sent nothing for this long. Defaults to waiting forever.')
+    parser.add_argument('--statistics-interval', type=float, default=600,
+                        help='[s] How often to log the link statistics of every station')
+    parser.add_argument('--duplicate-window', type=float, default=600,
+                        help='[s] Drop copies of a packet heard again within this long, e.g., by another station. 0 keeps them all.')
+    parser.add_argument('--save', help='Also append every packet, as received, to this binary file, and index it in the file plus .idx')
+    parser.add_argument('--all-fields', action='store_true', help='Print every housekeeping telemetry point, not just the summary')
+    args = parser.parse_args()
+
+    field_names = None if args.all_fields else beacon_fields.names + [value.name for value in beacon_fields.derived]
+    deduplicator = Deduplicator(args.duplicate_window) if args.duplicate_window > 0 else None
+    aggregation_server = AggregationServer(read_station_config(args.stations, args.read_timeout, deduplicator))
+    save_file = CaptureWriter(args.save) if args.save else None
+
+    def print_packet(station_packet):
+        if save_file:
+            save_file.write(station_packet.decoded_packet.frame, station_packet.decoded_packet.apid)
+        line = format_packet(station_packet.decoded_packet, field_names, station=station_packet.station._asdict())
+        if line:
+            print(line, flush=True)
+    aggregation_server.packet_demultiplexer.register(print_packet)
+
+    try:
+        asyncio.run(aggregation_server.run(args.statistics_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if save_file:
+            save_file.close()
+        aggregation_server.log_statistics()
+        for callsign, counters in aggregation_server.get_statistics().items():
+            print('Link statistics for {0}: {1}'.format(callsign, counters), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Read TCP/IP (and serial) feeds from TNCs or SDRs with asyncio, so one event loop thread can serve many of them"""
+
+import asyncio
+from collections import Counter
+from connect_port_get_packet import ConnectSerial, KissDecoder, KISS_FRAME_END, get_kiss_packets
+from frame_extractor import FrameExtractor, DISCARDED_BYTES
+from logger import Logger
+from minxss_parser import DeltaDecoder
+import pipeline
+
+RECONNECTS = 'reconnects'  # Times a feed's connection dropped (or went quiet for too long) and was opened again
+
+kiss_frame_end_bytes = bytes([KISS_FRAME_END])
+
+
+class AsyncSocketSource:
+    """
+    One TCP/IP feed, read through the same framing and parser stages as pipeline. The StreamReader does the buffering,
+    so each read hands on everything that has arrived: for KISS feeds, up through the next FEND (readuntil), so that
+    each read completes a frame, and otherwise whatever is waiting. When the connection drops, fails to open, or goes
+    quiet for longer than read_timeout, it is opened again after a wait that doubles with each failure, and only goes
+    back to initial_backoff once data arrives, so a server that accepts connections and then hangs up at once isn't
+    hammered. Cancelling the task reading it closes the connection.
+    Input:
+        ip_address [str]: E.g., 'localhost'
+        port [int or str]: E.g., 10000
+        decode_kiss [bool]: If set, the feed is KISS frames from a TNC; otherwise frames are found by sync bytes
+        read_timeout [float]: [s] Longest to wait for data before reconnecting, or None to wait forever
+        initial_backoff [float]: [s] Wait before the first retry after a failure
+        maximum_backoff [float]: [s] Longest wait between retries
+        receive_buffer_size [int]: Most bytes to hand on from each read of a feed that isn't KISS encoded
+        counters [Counter]: Where to tally what happens to the bytes received, as in FrameExtractor, and reconnects.
+                            Defaults to a new one.
+        deduplicator [Deduplicator]: If given, copies of packets already heard, e.g., by other feeds sharing it, are
+                                     dropped before parsing
+    """
+    def __init__(self, ip_address, port, decode_kiss=False, read_timeout=None, initial_backoff=0.5, maximum_backoff=30.0,
+                 receive_buffer_size=4096, counters=None, deduplicator=None):
+        self.ip_address = ip_address
+        self.port = port
+        self.decode_kiss = decode_kiss
+        self.read_timeout = read_timeout
+        self.initial_backoff = initial_backoff
+        self.maximum_backoff = maximum_backoff
+        self.backoff = initial_backoff  # [s] Wait before the next retry
+        self.receive_buffer_size = receive_buffer_size
+        self.counters = Counter() if counters is None else counters
+        self.deduplicator = deduplicator
+        self.delta_decoder = DeltaDecoder()
+        self.log = Logger().create_log()
+
+        self.reader = None
+        self.writer = None
+        self.kiss_decoder = None
+        self.frame_extractor = None
+        self.reset_framing()
+
+    def __str__(self):
+        return '{0}:{1}'.format(self.ip_address, self.port)
+
+    def reset_framing(self):
+        # A new connection starts a new stream, so a frame cut off by the old one can't be finished
+        if self.kiss_decoder is not None:
+            self.counters[DISCARDED_BYTES] += len(self.kiss_decoder.escaped_frame) + len(self.frame_extractor.ring_buffer)
+        self.kiss_decoder = KissDecoder(counters=self.counters)
+        self.frame_extractor = FrameExtractor(counters=self.counters)
+
+    async def connect(self):
+        # Keep trying until the connection opens
+        while True:
+            self.log.info("Opening {0}.".format(self))
+            try:
+                await self.open()
+                self.log.info("Successful open of {0}.".format(self))
+                return
+            except OSError as error:
+                self.log.warning("Failed opening {0}: {1}. Retrying in {2} s.".format(self, error, self.backoff))
+            await self.back_off()
+
+    async def back_off(self):
+        # Wait before retrying, twice as long each time until data arrives again
+        await asyncio.sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, self.maximum_backoff)
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.ip_address, int(self.port))
+
+    def is_open(self):
+        return self.writer is not None
+
+    async def read_chunk(self):
+        # The next bytes to arrive, or none if the connection has closed
+        if not self.decode_kiss:
+            return await self.reader.read(self.receive_buffer_size)
+        try:
+            return await self.reader.readuntil(kiss_frame_end_bytes)
+        except asyncio.IncompleteReadError as error:
+            return error.partial  # Closed part way through a frame, so this is the last of it
+        except asyncio.LimitOverrunError as error:
+            # No FEND in more than the StreamReader will hold, so hand on what's there for the KissDecoder to drop
+            return await self.reader.read(max(error.consumed, 1))
+
+    async def read_chunks(self):
+        """
+        Source: yields chunks of bytes as they arrive, forever, reconnecting as needed
+        """
+        try:
+            while True:
+                if not self.is_open():
+                    await self.connect()
+                try:
+                    chunk = await asyncio.wait_for(self.read_chunk(), self.read_timeout)
+                except asyncio.TimeoutError:
+                    self.log.warning("Nothing from {0} in {1} s.".format(self, self.read_timeout))
+                    chunk = None
+                except OSError as error:  # E.g., the connection was reset or the serial port unplugged
+                    self.log.warning("Lost {0}: {1}".format(self, error))
+                    chunk = None
+
+                if chunk:
+                    self.backoff = self.initial_backoff  # Only data, not just an open connection, shows the feed is back
+                    yield chunk
+                else:
+                    self.log.warning("Reconnecting to {0} in {1} s.".format(self, self.backoff))
+                    self.counters[RECONNECTS] += 1
+                    self.close()
+                    self.reset_framing()
+                    await self.back_off()
+        finally:  # E.g., the task reading it was cancelled
+            self.close()
+
+    async def read_packets(self):
+        """
+        Yields a DecodedPacket for each packet from the feed, as in pipeline.build_pipeline
+        """
+        async for chunk in self.read_chunks():
+            if self.decode_kiss:
+                packets = get_kiss_packets(self.kiss_decoder.feed(chunk), self.counters)
+            else:
+                packets = self.frame_extractor.feed_packets(chunk)
+            if self.deduplicator is not None:
+                packets = pipeline.deduplicate(packets, self.deduplicator, self, self.counters)
+            for decoded_packet in pipeline.parse_packets(packets, self.delta_decoder):
+                yield decoded_packet
+
+    def close(self):
+        if self.writer is not None:
+            self.log.info("Closing {0}.".format(self))
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class AsyncSerialSource(AsyncSocketSource):
+    """
+    A serial port feed, read the same way as AsyncSocketSource so that it can share an event loop with socket feeds.
+    pyserial has no asyncio interface, so each read waits on ConnectSerial in the loop's default thread pool, which
+    returns within ConnectSerial's read_timeout even when nothing arrives, so read_timeout here should be longer.
+    Input:
+        serial_port [str]: E.g., '/dev/ttyUSB0' or 'COM3'
+        baud_rate [int]: E.g., 19200
+        Otherwise as for AsyncSocketSource
+    """
+    def __init__(self, serial_port, baud_rate, decode_kiss=False, read_timeout=None, initial_backoff=0.5,
+                 maximum_backoff=30.0, counters=None, deduplicator=None):
+        super(AsyncSerialSource, self).__init__(None, None, decode_kiss, read_timeout, initial_backoff, maximum_backoff,
+                                                counters=counters, deduplicator=deduplicator)
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+        self.connected_port = None
+
+    def __str__(self):
+        return self.serial_port
+
+    async def open(self):
+        connected_port = await asyncio.get_running_loop().run_in_executor(
+            None, ConnectSerial(self.serial_port, self.baud_rate, None).connect_to_port)
+        if connected_port is None:
+            raise OSError('Serial port not readable.')
+        self.connected_port = connected_port
+
+    def is_open(self):
+        return self.connected_port is not None
+
+    async def read_chunk(self):
+        loop = asyncio.get_running_loop()
+        while True:  # Nothing from a read means only that the serial read timed out, not that the port closed
+            data = await loop.run_in_executor(None, self.connected_port.get_data_from_buffer)
+            if data:
+                return data
+
+    def close(self):
+        if self.connected_port is not None:
+            self.connected_port.close()
+            self.connected_port = None
+
+
+async def read_feeds(sources, handle_packet):
+    """
+    Read every feed concurrently on the running event loop, until cancelled
+    # Input:
+    #   sources [list of AsyncSocketSource]: The feeds
+    #   handle_packet [function]: Called with the source and each DecodedPacket from it, as the packets arrive
+    """
+    async def read_feed(source):
+        async for decoded_packet in source.read_packets():
+            handle_packet(source, decoded_packet)
+
+    await asyncio.gather(*[read_feed(source) for source in sources])
@@ -0,0 +1,279 @@
+"""Benchmark each stage of the decode pipeline and save the results to a JSON file for comparing releases"""
+
+# Run from the repository root: python benchmarks/benchmark_decoder.py --output benchmark_results.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_stream import build_synthetic_stream, build_consecutive_beacons
+
+from connect_port_get_packet import PacketReader, KissDecoder
+from deduplicator import Deduplicator
+from find_sync_bytes import FindSyncBytes
+from minxss_parser import MinxssParser, DeltaDecoder
+import pipeline
+import replay
+
+try:
+    from minxss_beacon_decoder import MainWindow
+except ImportError as error:  # The GUI methods need PySide2
+    MainWindow = None
+    gui_import_error = str(error)
+
+
+class StreamPacketReader(PacketReader):
+    """
+    Feeds a prerecorded stream to PacketReader.read_packet the way a port would, chunk_size bytes at a time
+    """
+    def __init__(self, stream, chunk_size=1, decode_kiss=False):
+        super(StreamPacketReader, self).__init__(decode_kiss)
+        self.stream = memoryview(stream)
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def get_data_from_buffer(self):
+        if self.position >= len(self.stream):
+            raise EOFError('End of the benchmark stream.')
+        chunk = bytearray(self.stream[self.position:self.position + self.chunk_size])
+        self.position += self.chunk_size
+        return chunk
+
+
+def summarize(name, latencies, number_of_bytes, extra=None, total_seconds=None):
+    """
+    Turn per-call latencies in seconds into the record saved for one benchmark
+    total_seconds defaults to the sum of the latencies; pass it in when time was also spent outside of the timed calls
+    """
+    if total_seconds is None:
+        total_seconds = sum(latencies)
+    sorted_latencies = sorted(latencies)
+    result = {'name': name,
+              'calls': len(latencies),
+              'bytes': number_of_bytes,
+              'total_seconds': total_seconds,
+              'calls_per_second': len(latencies) / total_seconds if latencies else None,
+              'megabytes_per_second': number_of_bytes / 1e6 / total_seconds if latencies else None,
+              'latency_mean_us': total_seconds / len(latencies) * 1e6 if latencies else None,
+              'latency_median_us': sorted_latencies[len(sorted_latencies) // 2] * 1e6 if latencies else None,
+              'latency_p99_us': sorted_latencies[int(len(sorted_latencies) * 0.99)] * 1e6 if latencies else None}
+    if extra:
+        result.update(extra)
+    return result
+
+
+def time_calls(function, inputs):
+    latencies = []
+    for function_input in inputs:
+        start_time = time.perf_counter()
+        function(function_input)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies
+
+
+def benchmark_find_sync_bytes(stream, frames, beacons):
+    fsb = FindSyncBytes()
+
+    def find_all_sync_bytes(frame):
+        fsb.find_log_sync_start_index(frame)
+        fsb.find_sync_start_index(frame)
+        fsb.find_sync_stop_index(frame)
+
+    return summarize('FindSyncBytes', time_calls(find_all_sync_bytes, frames), sum(len(frame) for frame in frames))
+
+
+def benchmark_read_packet(stream, frames, beacons):
+    # One byte at a time, as the serial port and socket used to be read, and in chunks, finding frames by sync bytes
+    # or by the KISS frame ends
+    results = []
+    for chunk_size, decode_kiss in [(1, False), (4096, False), (1, True), (4096, True)]:
+        reader = StreamPacketReader(stream, chunk_size, decode_kiss)
+        latencies = []
+        benchmark_start_time = time.perf_counter()
+        while True:
+            start_time = time.perf_counter()
+            try:
+                reader.read_packet()
+            except EOFError:
+                break
+            latencies.append(time.perf_counter() - start_time)
+        total_seconds = time.perf_counter() - benchmark_start_time  # Includes reading whatever followed the last frame
+
+        name = 'PacketReader.read_packet[{0} byte chunks{1}]'.format(chunk_size, ', KISS' if decode_kiss else '')
+        results.append(summarize(name, latencies, len(stream),
+                                 {'frames_returned': len(latencies), 'beacons_in_stream': len(beacons)}, total_seconds))
+    return results
+
+
+def benchmark_kiss_decoder(stream, frames, beacons):
+    # Splitting and unescaping every KISS frame in the stream as it arrives in 4096 byte chunks
+    kiss_decoder = KissDecoder()
+    chunks = [stream[chunk_start:chunk_start + 4096] for chunk_start in range(0, len(stream), 4096)]
+    return summarize('KissDecoder.feed', time_calls(kiss_decoder.feed, chunks), len(stream))
+
+
+def benchmark_convert_buffer_data_to_hex_string(stream, frames, beacons):
+    if MainWindow is None:
+        return {'name': 'MainWindow.convert_buffer_data_to_hex_string', 'skipped': gui_import_error}
+    return summarize('MainWindow.convert_buffer_data_to_hex_string',
+                     time_calls(MainWindow.convert_buffer_data_to_hex_string, frames), sum(len(frame) for frame in frames))
+
+
+def benchmark_parse_packet(stream, frames, beacons):
+    MinxssParser(beacons[0]).parse_packet()  # Builds the calibration tables, which happens once per process
+    latencies = time_calls(lambda beacon: MinxssParser(beacon).parse_packet(), beacons)
+
+    # Peak memory allocated while parsing one packet, to catch regressions like copying the buffer
+    tracemalloc.start()
+    memory_before_parse = tracemalloc.get_traced_memory()[0]
+    MinxssParser(beacons[0]).parse_packet()
+    peak_allocated_bytes = tracemalloc.get_traced_memory()[1] - memory_before_parse
+    tracemalloc.stop()
+
+    return summarize('MinxssParser.parse_packet', latencies, sum(len(beacon) for beacon in beacons),
+                     {'peak_allocated_bytes_per_packet': peak_allocated_bytes})
+
+
+def benchmark_parse_telemetry_all_fields(stream, frames, beacons):
+    # Every housekeeping telemetry point decoded per packet, to compare against parse_packet's 27 field summary
+    MinxssParser(beacons[0]).parse_telemetry().decode_all()
+    latencies = time_calls(lambda beacon: MinxssParser(beacon).parse_telemetry().decode_all(), beacons)
+    return summarize('MinxssParser.parse_telemetry[all fields]', latencies, sum(len(beacon) for beacon in beacons))
+
+
+def benchmark_delta_decoder(stream, frames, beacons):
+    # Beacons as one spacecraft sends them, where little changes from one to the next, and the synthetic stream's
+    # beacons, which cycle through unrelated examples so that most telemetry changes every time
+    results = []
+    for name, delta_beacons in [('consecutive', build_consecutive_beacons(len(beacons))), ('unrelated', beacons)]:
+        delta_decoder = DeltaDecoder()
+        delta_decoder.parse_telemetry(delta_beacons[0])
+        latencies = time_calls(delta_decoder.parse_telemetry, delta_beacons)
+        results.append(summarize('DeltaDecoder.parse_telemetry[{0}]'.format(name), latencies,
+                                 sum(len(beacon) for beacon in delta_beacons)))
+    return results
+
+
+def benchmark_parse_many(stream, frames, beacons):
+    aligned_beacons = b''.join(beacons)
+    results = []
+    for backend in ['python', 'numpy']:
+        MinxssParser.parse_many(aligned_beacons[:len(beacons[0])], backend)
+        start_time = time.perf_counter()
+        MinxssParser.parse_many(aligned_beacons, backend)
+        total_seconds = time.perf_counter() - start_time
+        results.append(summarize('MinxssParser.parse_many[{0}]'.format(backend), [total_seconds], len(aligned_beacons),
+                                 {'packets_per_second': len(beacons) / total_seconds}))
+    return results
+
+
+def benchmark_deduplicator(stream, frames, beacons):
+    # Each beacon heard twice, e.g., by two stations, so half of the lookups find a duplicate
+    deduplicator = Deduplicator()
+    heard_beacons = [beacon for beacon in beacons for _ in range(2)]
+    return summarize('Deduplicator.check', time_calls(deduplicator.check, heard_beacons),
+                     sum(len(beacon) for beacon in heard_beacons))
+
+
+def benchmark_pipeline(stream, frames, beacons):
+    # End to end, from 4096 byte chunks to decoded packets, through the same stages as the GUI and the command line
+    chunks = [stream[chunk_start:chunk_start + 4096] for chunk_start in range(0, len(stream), 4096)]
+    results = []
+    for kiss in [False, True]:
+        start_time = time.perf_counter()
+        number_of_packets = pipeline.run(pipeline.build_pipeline(chunks, kiss))
+        total_seconds = time.perf_counter() - start_time
+        results.append(summarize('pipeline[kiss={0}]'.format(kiss), [total_seconds], len(stream),
+                                 {'packets_per_second': number_of_packets / total_seconds}))
+    return results
+
+
+def benchmark_replay(stream, frames, beacons):
+    # Offline, from a memory mapped capture to columns of telemetry, discarding them rather than timing a sink
+    class DiscardSink:
+        def write(self, telemetry):
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture_filename = os.path.join(directory, 'capture.dat')
+        with open(capture_filename, 'wb') as capture_file:
+            capture_file.write(stream)
+        start_time = time.perf_counter()
+        counters = replay.replay([capture_filename], DiscardSink())
+        total_seconds = time.perf_counter() - start_time
+    return [summarize('replay', [total_seconds], len(stream),
+                      {'packets_per_second': counters[replay.DECODED_PACKETS] / total_seconds})]
+
+
+benchmarks = [benchmark_find_sync_bytes,
+              benchmark_read_packet,
+              benchmark_kiss_decoder,
+              benchmark_convert_buffer_data_to_hex_string,
+              benchmark_parse_packet,
+              benchmark_parse_telemetry_all_fields,
+              benchmark_delta_decoder,
+              benchmark_parse_many,
+              benchmark_deduplicator,
+              benchmark_pipeline,
+              benchmark_replay]
+
+
+def split_kiss_frames(stream):
+    # Frames as read_packet would hand them on: everything between frame ends, with the frame end itself
+    return [bytearray(frame) + bytearray([0xc0]) for frame in stream.split(bytes([0xc0])) if len(frame) > 0]
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(number_of_beacons=5000, seed=0):
+    stream, beacons = build_synthetic_stream(number_of_beacons, seed=seed)
+    frames = split_kiss_frames(stream)
+
+    results = {'date': datetime.datetime.utcnow().isoformat(),
+               'git_commit': get_git_commit(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'stream_bytes': len(stream),
+               'stream_beacons': len(beacons),
+               'seed': seed,
+               'benchmarks': []}
+    for benchmark in benchmarks:
+        result = benchmark(stream, frames, beacons)
+        results['benchmarks'].extend(result if isinstance(result, list) else [result])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--beacons', type=int, default=5000, help='Number of beacons in the synthetic stream')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic stream')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.beacons, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    for result in results['benchmarks']:
+        if 'skipped' in result:
+            print('{0:45s} skipped: {1}'.format(result['name'], result['skipped']))
+        else:
+            print('{0:45s} {1:12.0f} calls/s {2:8.2f} MB/s {3:10.1f} us median'.format(
+                result['name'], result['calls_per_second'], result['megabytes_per_second'], result['latency_median_us']))
+    print('Saved results to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Measure how offline replay scales with worker processes on a synthetic multi-gigabyte archive of captures"""
+
+# Run from the repository root: python benchmarks/benchmark_parallel_replay.py --gigabytes 2 --output scaling.json
+# The archive is a directory of .dat files built by repeating a synthetic stream (KISS framed beacons, log packets, and
+# junk bytes), like a year of captures from several stations. It's decoded once by replay, in this process, then by
+# replay_in_parallel with each number of workers, and each run's throughput and speedup over one worker is reported.
+# On a machine with fewer cores than workers the speedup stops growing, so run it where the archive will be reprocessed.
+# By default replay.py also checks every packet for copies, in the main process, so the speedup stops growing once the
+# workers decode packets faster than they can be checked. The archive repeats one stream, so nearly every packet in it
+# would be a copy; instead, the runs skip the checks, and checking as many distinct packets is timed on its own and
+# reported as the most speedup any number of workers can reach on this machine.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from synthetic_stream import build_synthetic_stream
+
+from deduplicator import Deduplicator
+import replay
+
+
+class DiscardSink:
+    # Times the decoding alone, not a sink
+    def write(self, telemetry):
+        pass
+
+
+def build_archive(directory, gigabytes, file_megabytes, seed=0):
+    """
+    Write .dat files totalling gigabytes to directory, each file_megabytes long, and return their names
+    """
+    stream, _ = build_synthetic_stream(20000, seed=seed)
+    copies_per_file = max(int(file_megabytes * 2 ** 20 // len(stream)), 1)
+    number_of_files = max(int(round(gigabytes * 2 ** 30 / (copies_per_file * len(stream)))), 1)
+    filenames = []
+    for file_number in range(number_of_files):
+        filename = os.path.join(directory, 'capture_{0:04d}.dat'.format(file_number))
+        with open(filename, 'wb') as capture_file:
+            for _ in range(copies_per_file):
+                capture_file.write(stream)
+        filenames.append(filename)
+    return filenames
+
+
+def time_replay(filenames, workers, chunk_length):
+    start_time = time.perf_counter()
+    if workers is None:
+        counters = replay.replay(filenames, DiscardSink())
+    else:
+        counters = replay.replay_in_parallel(filenames, DiscardSink(), workers=workers, chunk_length=chunk_length)
+    return time.perf_counter() - start_time, counters[replay.DECODED_PACKETS]
+
+
+def time_duplicate_checks(number_of_packets, duplicate_memory, chunk_length, seed=0):
+    """
+    Returns how long replay_in_parallel's main process takes to check number_of_packets distinct packets for copies,
+    a chunk at a time, which bounds how fast any number of workers can go
+    """
+    if duplicate_memory <= 0:
+        return 0.0
+    deduplicator = Deduplicator(float('inf'), duplicate_memory)  # As replay.py's --duplicate-memory sets it up
+    generator = random.Random(seed)
+    packet_keys = [generator.getrandbits(64) for _ in range(number_of_packets)]
+    packets_per_chunk = max(chunk_length // 254, 1)
+    start_time = time.perf_counter()
+    for start in range(0, number_of_packets, packets_per_chunk):
+        deduplicator.check_keys(packet_keys[start:start + packets_per_chunk])  # As replay_in_parallel checks a chunk
+    return time.perf_counter() - start_time
+
+
+def run_benchmark(filenames, worker_counts, chunk_length, duplicate_memory):
+    archive_bytes = sum(os.path.getsize(filename) for filename in filenames)
+    results = []
+    for workers in [None] + worker_counts:
+        seconds, decoded_packets = time_replay(filenames, workers, chunk_length)
+        results.append({'workers': workers or 0,  # 0 for replay, in this process
+                        'seconds': seconds,
+                        'megabytes_per_second': archive_bytes / 2 ** 20 / seconds,
+                        'packets_per_second': decoded_packets / seconds,
+                        'decoded_packets': decoded_packets})
+
+    one_worker_seconds = next(result['seconds'] for result in results if result['workers'] == 1)
+    for result in results:
+        result['speedup'] = one_worker_seconds / result['seconds']
+        result['efficiency'] = result['speedup'] / result['workers'] if result['workers'] else None
+
+    decoded_packets = results[0]['decoded_packets']
+    duplicate_check_seconds = time_duplicate_checks(decoded_packets, duplicate_memory, chunk_length)
+    limit = {'duplicate_check_microseconds_per_packet': duplicate_check_seconds / max(decoded_packets, 1) * 1e6,
+             'maximum_speedup': one_worker_seconds / duplicate_check_seconds if duplicate_check_seconds else None}
+    return results, limit
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gigabytes', type=float, default=2, help='Size of the synthetic archive')
+    parser.add_argument('--file-size', type=float, default=256, help='[MB] Size of each capture in the archive')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, cpu_count} | {2 ** power for power in range(cpu_count.bit_length()) if 2 ** power <= cpu_count}),
+                        help='Numbers of worker processes to try. Defaults to 1, 2, 4, ... up to the number of CPUs.')
+    parser.add_argument('--chunk-size', type=float, default=16, help='[MB] About how much of a capture each worker takes at a time')
+    parser.add_argument('--duplicate-memory', type=int, default=1000000,
+                        help='As for replay.py, for timing the checks for copies. 0 times the decoding alone.')
+    parser.add_argument('--directory', help='Where to build the archive, kept for the next run. Defaults to a temporary directory.')
+    parser.add_argument('--output', default=None, help='Optional JSON file to write the results to')
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp()
+    try:
+        filenames = replay.get_capture_filenames([directory])
+        if not filenames:
+            filenames = build_archive(directory, args.gigabytes, args.file_size)
+        print('Archive of {0} captures, {1:.2f} GB, on {2} CPUs'.format(
+            len(filenames), sum(os.path.getsize(filename) for filename in filenames) / 2 ** 30, cpu_count))
+
+        results, limit = run_benchmark(filenames, sorted(set(args.workers) | {1}), int(args.chunk_size * 2 ** 20),
+                                       args.duplicate_memory)
+        for result in results:
+            print('{0:>8} {1:8.2f} s {2:8.1f} MB/s {3:10.0f} packets/s {4:5.2f}x speedup'.format(
+                'replay' if not result['workers'] else '{0} worker{1}'.format(result['workers'], 's' * (result['workers'] > 1)),
+                result['seconds'], result['megabytes_per_second'], result['packets_per_second'], result['speedup']))
+        if limit['maximum_speedup']:
+            print('Copies are checked in the main process at {0:.2f} us per packet, so no number of workers can be more '
+                  'than {1:.1f}x faster than one'.format(limit['duplicate_check_microseconds_per_packet'],
+                                                         limit['maximum_speedup']))
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'cpu_count': cpu_count, 'chunk_size_megabytes': args.chunk_size,
+                       'duplicate_memory': args.duplicate_memory, 'results': results, 'limit': limit}, output_file,
+                      indent=2)
+        print('Saved results to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Compare MinxssParser throughput with per-packet logging enabled and disabled"""
+
+# Run from the repository root: python benchmarks/benchmark_parser_logging.py
+
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+from example_data import get_example_data
+from logger import Logger
+from minxss_parser import MinxssParser
+
+
+def packets_per_second(packet, number_of_packets):
+    seconds = min(timeit.repeat(lambda: MinxssParser(packet).parse_packet(), number=number_of_packets, repeat=3))
+    return number_of_packets / seconds
+
+
+def main(number_of_packets=20000):
+    packet = get_example_data(4)  # Includes a header ahead of the start sync, as read from the port
+    log = Logger().create_log()
+
+    # Send the log to a scratch file instead of the user's debug log while benchmarking
+    original_handlers = log.handlers[:]
+    scratch_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False)
+    scratch_file.close()
+    scratch_handler = logging.FileHandler(scratch_file.name)
+    scratch_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    log.handlers = [scratch_handler]
+
+    try:
+        disabled_rate = packets_per_second(packet, number_of_packets)
+        Logger().enable_packet_logging()
+        enabled_rate = packets_per_second(packet, number_of_packets)
+    finally:
+        Logger().enable_packet_logging(False)
+        log.handlers = original_handlers
+        scratch_handler.close()
+        os.remove(scratch_file.name)
+
+    print('Packet logging disabled: {0:10.0f} packets/s'.format(disabled_rate))
+    print('Packet logging enabled:  {0:10.0f} packets/s'.format(enabled_rate))
+    print('Logging slows parsing down by a factor of {0:.1f}'.format(disabled_rate / enabled_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Compare reading the serial port and socket one byte at a time against reading everything available at once"""
+
+# Run from the repository root: python benchmarks/benchmark_port_reads.py
+# The serial port is a pseudo terminal, so this runs on Linux and Mac. Bytes are written at the given baud rate, so each
+# case takes about --seconds to run; compare the reader's CPU time and number of reads rather than the wall time.
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from synthetic_stream import build_synthetic_stream
+
+from connect_port_get_packet import ConnectSerial, ConnectSocket
+from frame_extractor import FrameExtractor
+
+
+class ByteAtATimeSerial(ConnectSerial):
+    """
+    ConnectSerial as it used to read, one byte per call
+    """
+    def get_data_from_buffer(self):
+        return bytearray(self.ser.read())
+
+
+class ByteAtATimeSocket(ConnectSocket):
+    """
+    ConnectSocket as it used to read, one byte per call
+    """
+    def get_data_from_buffer(self):
+        return bytearray(self.client_socket.recv(1))
+
+
+def count_reads(reader):
+    # Wraps the reader's get_data_from_buffer so that the number of reads (i.e., system calls) can be reported
+    reader.number_of_reads = 0
+    get_data_from_buffer = reader.get_data_from_buffer
+
+    def counted_get_data_from_buffer():
+        reader.number_of_reads += 1
+        return get_data_from_buffer()
+
+    reader.get_data_from_buffer = counted_get_data_from_buffer
+    return reader
+
+
+def write_at_baud_rate(write, stream, baud_rate, interval=0.005):
+    """
+    Write stream in small pieces, as fast as a radio at baud_rate would deliver it (10 bits per byte with start and stop bits)
+    """
+    bytes_per_interval = max(int(baud_rate / 10 * interval), 1)
+    start_time = time.perf_counter()
+    for position in range(0, len(stream), bytes_per_interval):
+        delay = start_time + position / (baud_rate / 10) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        write(stream[position:position + bytes_per_interval])
+
+
+def read_frames(reader, number_of_frames):
+    start_cpu_time = time.thread_time()  # Only the reading thread, not the writer
+    start_time = time.perf_counter()
+    for _ in range(number_of_frames):
+        reader.read_packet()
+    return time.thread_time() - start_cpu_time, time.perf_counter() - start_time
+
+
+def open_pty_serial(reader_class, baud_rate):
+    import pty
+    import tty
+    master_fd, slave_fd = pty.openpty()
+    tty.setraw(slave_fd)  # No line discipline, so bytes pass through unchanged, like a serial port
+    reader = reader_class(os.ttyname(slave_fd), baud_rate, None).connect_to_port()
+
+    def close():
+        reader.close()
+        os.close(slave_fd)
+        os.close(master_fd)
+    return reader, lambda data: os.write(master_fd, data), close
+
+
+def open_loopback_socket(reader_class, baud_rate):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.bind(('127.0.0.1', 0))
+    server_socket.listen(1)
+    reader = reader_class('127.0.0.1', server_socket.getsockname()[1]).connect_to_port()
+    connection, _ = server_socket.accept()
+
+    def close():
+        reader.close()
+        connection.close()
+        server_socket.close()
+    return reader, connection.sendall, close
+
+
+def benchmark_reads(transport, open_port, reader_class, read_style, baud_rate, stream, number_of_frames):
+    reader, write, close = open_port(reader_class, baud_rate)
+    count_reads(reader)
+    writer = threading.Thread(target=write_at_baud_rate, args=(write, stream, baud_rate))
+    writer.start()
+    try:
+        cpu_seconds, wall_seconds = read_frames(reader, number_of_frames)
+    finally:
+        writer.join()
+        close()
+
+    return {'name': '{0}[{1}, {2} baud]'.format(transport, read_style, baud_rate),
+            'baud_rate': baud_rate,
+            'bytes': len(stream),
+            'frames': number_of_frames,
+            'wall_seconds': wall_seconds,
+            'reader_cpu_seconds': cpu_seconds,
+            'reader_cpu_us_per_frame': cpu_seconds / number_of_frames * 1e6,
+            'reads': reader.number_of_reads,
+            'reads_per_frame': reader.number_of_reads / number_of_frames}
+
+
+def run_benchmarks(baud_rates, seconds, seed=0):
+    results = []
+    for baud_rate in baud_rates:
+        # About seconds worth of beacons at this baud rate, and the frames read_packet will return for them
+        stream_bytes = int(baud_rate / 10 * seconds)
+        stream, _ = build_synthetic_stream(max(stream_bytes // 300, 1), seed=seed)
+        number_of_frames = len(FrameExtractor().feed(stream))
+
+        for transport, open_port, read_styles in [
+                ('ConnectSerial (pty)', open_pty_serial, [('byte at a time', ByteAtATimeSerial), ('bulk', ConnectSerial)]),
+                ('ConnectSocket (loopback)', open_loopback_socket, [('byte at a time', ByteAtATimeSocket), ('bulk', ConnectSocket)])]:
+            for read_style, reader_class in read_styles:
+                results.append(benchmark_reads(transport, open_port, reader_class, read_style, baud_rate, stream, number_of_frames))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--baud-rates', type=int, nargs='+', default=[19200, 115200], help='Baud rates to stream at')
+    parser.add_argument('--seconds', type=float, default=3, help='Approximate length of each case')
+    parser.add_argument('--output', default=None, help='Optional JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.baud_rates, args.seconds)
+    for result in results:
+        print('{0:50s} {1:8d} reads {2:8.1f} reads/frame {3:10.1f} us CPU/frame'.format(
+            result['name'], result['reads'], result['reads_per_frame'], result['reader_cpu_us_per_frame']))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print('Saved results to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
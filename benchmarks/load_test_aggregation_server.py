@@ -0,0 +1,103 @@
+"""Load test the aggregation server with hundreds of simulated stations, to check that one core keeps up with them"""
+
+# Run from the repository root: python benchmarks/load_test_aggregation_server.py --stations 300 --cadence 1
+# Each simulated station is the example packet sender from tests/test_send_tcpip_packets.py, all of them on one event
+# loop in a separate process. The aggregation server runs in this process, pinned to one core where the OS allows it,
+# and its CPU time is reported as a fraction of the wall time: below 1, that core keeps up with every station.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+import synthetic_stream  # noqa: F401 Puts the repository and its tests on the path
+from test_send_tcpip_packets import serve_example_packets, number_of_examples
+
+from aggregation_server import AggregationServer, Station, StationFeed, DECODED_PACKETS
+from async_socket_source import AsyncSocketSource, RECONNECTS
+from frame_extractor import ABORTED_FRAMES, FALSE_SYNCS
+
+valid_examples = 6  # Of each round of the examples, the beacons that are valid without KISS decoding
+
+
+def simulate_stations(number_of_stations, cadence, connection):
+    # Runs in its own process: listens as every station, sends the ports back, then keeps sending until terminated
+    async def serve():
+        servers = [await serve_example_packets(cadence=cadence, repeat=None) for _ in range(number_of_stations)]
+        connection.send([server.sockets[0].getsockname()[1] for server in servers])
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+
+async def aggregate(ports, seconds):
+    station_feeds = [StationFeed(Station('SIM{0:04d}'.format(i), 40.0, -105.0), AsyncSocketSource('localhost', port))
+                     for i, port in enumerate(ports)]
+    aggregation_server = AggregationServer(station_feeds)
+    running = asyncio.ensure_future(aggregation_server.run())
+
+    start_cpu_time = time.process_time()
+    start_time = time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu_seconds = time.process_time() - start_cpu_time
+    wall_seconds = time.perf_counter() - start_time
+    running.cancel()
+    return aggregation_server.get_statistics(), cpu_seconds, wall_seconds
+
+
+def run_load_test(number_of_stations, cadence, seconds):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {sorted(os.sched_getaffinity(0))[0]})
+
+    parent_connection, child_connection = multiprocessing.Pipe()
+    simulator = multiprocessing.Process(target=simulate_stations, args=(number_of_stations, cadence, child_connection),
+                                        daemon=True)
+    simulator.start()
+    try:
+        ports = parent_connection.recv()
+        statistics, cpu_seconds, wall_seconds = asyncio.run(aggregate(ports, seconds))
+    finally:
+        simulator.terminate()
+        simulator.join()
+
+    decoded_packets = [counters.get(DECODED_PACKETS, 0) for counters in statistics.values()]
+    return {'stations': number_of_stations,
+            'cadence_seconds': cadence,
+            'wall_seconds': wall_seconds,
+            'server_cpu_seconds': cpu_seconds,
+            'server_cpu_fraction': cpu_seconds / wall_seconds,
+            'decoded_packets': sum(decoded_packets),
+            'expected_packets': int(number_of_stations * seconds / cadence * valid_examples / number_of_examples),
+            'packets_per_second': sum(decoded_packets) / wall_seconds,
+            'server_cpu_us_per_packet': cpu_seconds / max(sum(decoded_packets), 1) * 1e6,
+            'fewest_packets_from_a_station': min(decoded_packets),
+            'most_packets_from_a_station': max(decoded_packets),
+            'aborted_frames': sum(counters.get(ABORTED_FRAMES, 0) for counters in statistics.values()),
+            'false_syncs': sum(counters.get(FALSE_SYNCS, 0) for counters in statistics.values()),
+            'reconnects': sum(counters.get(RECONNECTS, 0) for counters in statistics.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stations', type=int, nargs='+', default=[100, 300], help='Numbers of simulated stations to try')
+    parser.add_argument('--cadence', type=float, default=1, help='[s] Time between packets from each station (9 s nominally)')
+    parser.add_argument('--seconds', type=float, default=10, help='Length of each case')
+    parser.add_argument('--output', default=None, help='Optional JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = []
+    for number_of_stations in args.stations:
+        result = run_load_test(number_of_stations, args.cadence, args.seconds)
+        results.append(result)
+        print('{0:5d} stations {1:8d} of ~{2:d} packets {3:8.1f} packets/s {4:6.1f} us CPU/packet {5:5.0%} of a core'.format(
+            result['stations'], result['decoded_packets'], result['expected_packets'], result['packets_per_second'],
+            result['server_cpu_us_per_packet'], result['server_cpu_fraction']))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print('Saved results to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
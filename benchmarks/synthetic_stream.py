@@ -0,0 +1,117 @@
+"""Build large synthetic receiver streams out of the example packets for benchmarking"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+from example_data import get_example_data
+from find_sync_bytes import FindSyncBytes
+
+kiss_frame_end = 0xc0
+kiss_frame_escape = 0xdb
+kiss_transposed_frame_end = 0xdc
+kiss_transposed_frame_escape = 0xdd
+
+# AX.25 UI frame header (destination, source, control, PID) as seen ahead of the beacon in example data 6
+ax25_header = bytes([0x86, 0xa2, 0x40, 0x40, 0x40, 0x40, 0x60, 0x9a, 0x92, 0x9c, 0xb0, 0xa6, 0xa6, 0xe1, 0x03, 0xf0])
+
+
+def get_example_beacons():
+    """
+    Returns the valid example beacons, each trimmed to start at its start sync and end with its stop sync
+    """
+    fsb = FindSyncBytes()
+    beacons = []
+    for sample_number in [1, 2, 3, 4, 6]:
+        sample = get_example_data(sample_number)
+        sync_start_index = fsb.find_sync_start_index(sample)
+        beacons.append(bytes(sample[sync_start_index:sync_start_index + 254]))
+    return beacons
+
+
+def kiss_escape(data):
+    return bytes(data).replace(bytes([kiss_frame_escape]), bytes([kiss_frame_escape, kiss_transposed_frame_escape])) \
+                      .replace(bytes([kiss_frame_end]), bytes([kiss_frame_escape, kiss_transposed_frame_end]))
+
+
+def build_kiss_frame(packet):
+    return bytes([kiss_frame_end, 0x00]) + kiss_escape(ax25_header + packet) + bytes([kiss_frame_end])
+
+
+def build_log_packet(rng, message_length=80):
+    """
+    A real time spacecraft message: log sync, rest of a CCSDS header, printable text, checksum, and stop sync
+    """
+    total_length = 6 + 6 + message_length + 2 + 2
+    data_length = total_length - 7  # As defined by the CCSDS packet length field
+    header = bytes([0x08, 0x1d, 0xc0 | rng.randrange(64), rng.randrange(256), data_length >> 8, data_length & 0xff])
+    time = bytes(rng.randrange(256) for _ in range(6))
+    message = bytes(rng.randrange(0x20, 0x7f) for _ in range(message_length))
+    return header + time + message + bytes([rng.randrange(256), rng.randrange(256), 0xa5, 0xa5])
+
+
+def build_junk(rng, length):
+    # Noise on the link. Sync patterns can show up in junk, as they can in real noise.
+    return bytes(rng.randrange(256) for _ in range(length))
+
+
+def build_word_without_stop_sync(rng):
+    # Random bytes, but never 0xA5, so that changing them can't put a stop sync in the middle of the beacon
+    return bytes(rng.choice([value for value in range(256) if value != 0xa5]) for _ in range(2))
+
+
+def build_consecutive_beacons(number_of_beacons, changed_words=8, seed=0):
+    """
+    Build beacons as one spacecraft sends them, one after another: the sequence count and time advance, the checksum
+    changes, and so do a few housekeeping words, while everything else stays the same
+    # Input:
+    #   number_of_beacons [int]: How many beacons to build
+    #   changed_words [int]: Number of random 2 byte housekeeping words that change from one beacon to the next
+    #   seed [int]: Seed for the random numbers so that runs are comparable
+    # Output:
+    #   beacons [list of bytes]: The beacons, in order
+    """
+    rng = random.Random(seed)
+    beacon = bytearray(get_example_beacons()[0])
+
+    beacons = []
+    for beacon_number in range(number_of_beacons):
+        sequence_count = (int.from_bytes(beacon[2:4], 'big') & 0x3fff) + 1
+        beacon[2:4] = (0xc000 | sequence_count & 0x3fff).to_bytes(2, 'big')
+        beacon[6:10] = (int.from_bytes(beacon[6:10], 'little') + 9).to_bytes(4, 'little')
+        beacon[10:12] = rng.randrange(1000).to_bytes(2, 'little')
+        for offset in rng.sample(range(12, 250, 2), changed_words) + [250]:  # 250 is the checksum
+            beacon[offset:offset + 2] = build_word_without_stop_sync(rng)
+        beacons.append(bytes(beacon))
+    return beacons
+
+
+def build_synthetic_stream(number_of_beacons, log_packets_per_beacon=0.2, junk_bytes_per_beacon=20, seed=0):
+    """
+    Build a KISS encoded stream like the one a TNC sends over serial or TCP/IP
+    # Input:
+    #   number_of_beacons [int]: How many housekeeping beacons to include, cycling through the example beacons
+    #   log_packets_per_beacon [float]: Average number of log packets (0x08 0x1D) to interleave per beacon
+    #   junk_bytes_per_beacon [int]: Maximum number of random bytes to insert between frames
+    #   seed [int]: Seed for the random numbers so that runs are comparable
+    # Output:
+    #   stream [bytes]: The encoded stream
+    #   beacons [list of bytes]: The beacons in the stream, in order, without any framing
+    """
+    rng = random.Random(seed)
+    example_beacons = get_example_beacons()
+
+    pieces = []
+    beacons = []
+    for beacon_number in range(number_of_beacons):
+        beacon = example_beacons[beacon_number % len(example_beacons)]
+        beacons.append(beacon)
+        pieces.append(build_junk(rng, rng.randrange(junk_bytes_per_beacon + 1)))
+        pieces.append(build_kiss_frame(beacon))
+        if rng.random() < log_packets_per_beacon:
+            pieces.append(build_kiss_frame(build_log_packet(rng)))
+
+    return b''.join(pieces), beacons
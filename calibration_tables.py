@@ -0,0 +1,58 @@
+"""Precomputed lookup tables for converting raw telemetry to engineering units"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:  # Only batch decoding with the numpy backend needs it
+    numpy = None
+
+
+class CalibrationTable:
+    """
+    A calibration evaluated once for every possible 16 bit raw value, the first time it's needed, so that decoding costs
+    a single table lookup no matter how involved the calibration is (e.g., a non-linear thermistor curve)
+    Input:
+        calibration [function]: Converts a raw value to engineering units
+    """
+    number_of_entries = 65536
+
+    def __init__(self, calibration):
+        self.calibration = calibration
+        self.tables = {}  # [array of float] for unsigned (False) and signed (True) raw values, built on demand
+        self.numpy_tables = {}
+
+    def __call__(self, raw):
+        # Evaluates the calibration directly, which works on anything, e.g., raw values too wide for the table
+        return self.calibration(raw)
+
+    def get_table(self, signed=False):
+        """
+        Returns the table of calibrated values indexed by raw value
+        Signed tables hold 0 to 32767 then -32768 to -1, so that a negative raw value indexes from the end of the table,
+        both in python and in numpy.take.
+        """
+        if signed not in self.tables:
+            if signed:
+                raw_values = list(range(self.number_of_entries // 2)) + list(range(-self.number_of_entries // 2, 0))
+            else:
+                raw_values = range(self.number_of_entries)
+            self.tables[signed] = array('d', [self.calibration(raw) for raw in raw_values])
+        return self.tables[signed]
+
+    def get_lookup(self, signed=False):
+        """
+        Returns a function calibrating a single raw value with the table
+        """
+        return self.get_table(signed).__getitem__
+
+    def get_column_lookup(self, signed=False):
+        """
+        Returns a function calibrating a numpy array of raw values with the table
+        """
+        if signed not in self.numpy_tables:
+            if numpy is None:
+                raise ImportError('Calibrating numpy columns needs numpy to be installed.')
+            self.numpy_tables[signed] = numpy.frombuffer(self.get_table(signed), dtype=numpy.float64)  # Shares the table
+        numpy_table = self.numpy_tables[signed]
+        return lambda column: numpy.take(numpy_table, column.astype(numpy.intp))  # Much faster than with 16 bit indices
@@ -0,0 +1,50 @@
+"""CCSDS space packet primary header, which starts every MinXSS packet"""
+
+from collections import namedtuple
+from struct import Struct
+
+PRIMARY_HEADER_LENGTH = 6
+HOUSEKEEPING_APID = 25  # Beacon housekeeping data, so the header starts with the start sync 0x08 0x19
+LOG_APID = 29  # Real time spacecraft messages, so the header starts with the log sync 0x08 0x1D
+
+# Total packet length (header through stop sync) for each APID that always has the same length. Others can be any
+# length that holds a packet's primary header, spacecraft time (GPS seconds and milliseconds), checksum, and stop sync.
+expected_packet_lengths = {HOUSEKEEPING_APID: 254}
+SPACECRAFT_TIME_LENGTH = 6
+TRAILER_LENGTH = 4  # Checksum and stop sync
+MINIMUM_PACKET_LENGTH = PRIMARY_HEADER_LENGTH + SPACECRAFT_TIME_LENGTH + TRAILER_LENGTH
+
+primary_header_struct = Struct('>HHH')  # Big endian, unlike the rest of the packet
+
+
+class CcsdsHeader(namedtuple('CcsdsHeader', ['version', 'packet_type', 'secondary_header_flag', 'apid', 'sequence_flags',
+                                             'sequence_count', 'packet_data_length'])):
+    """
+    The six byte primary header. packet_data_length is as sent, i.e., one less than the number of bytes after the header.
+    """
+    __slots__ = ()
+
+    @property
+    def packet_length(self):
+        # Total number of bytes in the packet, header included
+        return self.packet_data_length + PRIMARY_HEADER_LENGTH + 1
+
+    def has_expected_length(self):
+        expected_packet_length = expected_packet_lengths.get(self.apid)
+        if expected_packet_length is None:
+            return self.packet_length >= MINIMUM_PACKET_LENGTH
+        return self.packet_length == expected_packet_length
+
+
+def parse_ccsds_header(packet, offset=0):
+    """
+    Decode the primary header without copying the packet
+    # Input:
+    #   packet [bytes-like]: Holds at least PRIMARY_HEADER_LENGTH bytes from offset
+    #   offset [int]: Index of the first byte of the header, e.g., the start sync
+    # Output:
+    #   header [CcsdsHeader]: The decoded header
+    """
+    packet_id, sequence_control, packet_data_length = primary_header_struct.unpack_from(packet, offset)
+    return CcsdsHeader(packet_id >> 13, (packet_id >> 12) & 0x1, (packet_id >> 11) & 0x1, packet_id & 0x7ff,
+                       sequence_control >> 14, sequence_control & 0x3fff, packet_data_length)
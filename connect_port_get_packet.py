@@ -1,119 +1,265 @@
-"""Handle serial or TCP/IP interfaces and grab spacecraft packet packet"""
-__authors__ = "James Paul Mason"
-__contact__ = "jmason86@gmail.com"
-
-import serial
-import socket
-from find_sync_bytes import FindSyncBytes
-from logger import Logger
-
-
-class PacketReader:
-    def read_packet(self):
-        #  From all of the binary coming in, grab and return a single packet including all headers/footers
-        packet = bytearray()
-
-        found_sync_start_index = 0
-        found_sync_stop_index = 0
-        found_log_packet = 0
-        while (found_sync_start_index + found_sync_stop_index) < 2:
-            buffered_data = self.get_data_from_buffer()
-            for byte in buffered_data:
-                packet.append(byte)
-
-            fsb = FindSyncBytes()
-            if fsb.find_log_sync_start_index(packet) != -1:
-                found_log_packet = True
-            if fsb.find_sync_start_index(packet) != -1:
-                found_sync_start_index = True
-            if fsb.find_sync_stop_index(packet) != -1:
-                if found_log_packet:
-                    packet = bytearray()  # Clear out the packet because its a log message not a housekeeping packet
-                else:
-                    found_sync_stop_index = True
-            if found_sync_start_index and found_sync_stop_index:
-                if fsb.find_sync_start_index(packet) > fsb.find_sync_stop_index(packet):
-                    packet = packet[fsb.find_sync_start_index(packet):]
-                    found_sync_stop_index = 0
-
-            if len(packet) > 500:  # Assuming that there's no way to have this much header on the 254 byte MinXSS packet
-                if found_sync_start_index:
-                    packet = packet[fsb.find_sync_start_index(packet):]  # start packet at start sync
-                else:
-                    packet = bytearray()
-
-        return packet
-
-    @staticmethod
-    def get_data_from_buffer():
-        # Placeholder method to be overridden by subclasses for serial and sockets
-        # because they have different objects to read from and syntax to read with.
-        return bytearray()
-
-
-class ConnectSerial(PacketReader):
-    def __init__(self, port, baud_rate, log):
-        super(ConnectSerial, self).__init__()
-
-        self.port = port
-        self.baud_rate = baud_rate
-        self.log = Logger().create_log()
-
-        self.ser = None
-        self.port_readable = None
-        self.start_sync_bytes = None
-        self.stop_sync_bytes = None
-
-    def connect_to_port(self):
-        self.log.info("Opening serial port {0} at baud rate {1}".format(self.port, self.baud_rate))
-
-        self.ser = serial.Serial(self.port, self.baud_rate)
-        if not self.ser.readable():
-            self.log.error('Serial port not readable.')
-            self.port_readable = False
-        else:
-            self.log.info('Successful serial port open.')
-            self.port_readable = True
-            return self
-
-    def get_data_from_buffer(self):
-        return bytearray(self.ser.read())
-
-    def close(self):
-        self.log.info("Closing serial port.")
-        self.ser.close()
-
-
-class ConnectSocket(PacketReader):
-    def __init__(self, ip_address, port):
-        super(ConnectSocket, self).__init__()
-
-        self.ip_address = ip_address
-        self.port = port
-        self.log = Logger().create_log()
-
-        self.client_socket = None
-        self.port_readable = None
-
-    def connect_to_port(self):
-        self.log.info("Opening IP address: {0} on port: {1}".format(self.ip_address, self.port))
-
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        try:
-            self.client_socket.connect((self.ip_address, int(self.port)))
-            self.log.info('Successful TCP/IP port open.')
-            self.port_readable = True
-        except socket.error as error:
-            self.log.warning("Failed connecting to {0} on port {1}".format(self.ip_address, self.port))
-            self.log.warning(''.format(error))
-            self.port_readable = False
-        finally:
-            return self
-
-    def get_data_from_buffer(self):
-        return bytearray(self.client_socket.recv(1))
-    
-    def close(self):
-        self.log.info("Closing TCP/IP port.")
-        self.client_socket.close()
+"""Handle serial or TCP/IP interfaces and grab spacecraft packet packet"""
+__authors__ = "James Paul Mason"
+__contact__ = "jmason86@gmail.com"
+
+import serial
+import socket
+from collections import Counter, deque, namedtuple
+from ccsds import HOUSEKEEPING_APID
+from find_sync_bytes import FindSyncBytes
+from frame_extractor import FrameExtractor, check_packet, FRAMED_PACKETS, DISCARDED_BYTES, ABORTED_FRAMES
+from logger import Logger
+
+# KISS special characters, as sent by a TNC in KISS mode
+KISS_FRAME_END = 0xc0  # FEND: Marks the start and end of every frame
+KISS_FRAME_ESCAPE = 0xdb  # FESC: The next byte stands for FEND or FESC in the data
+KISS_TRANSPOSED_FRAME_END = 0xdc  # TFEND: FEND in the data, after FESC
+KISS_TRANSPOSED_FRAME_ESCAPE = 0xdd  # TFESC: FESC in the data, after FESC
+KISS_DATA_FRAME = 0x00  # Command for frames carrying data from the radio, rather than TNC settings
+
+# One frame from the TNC
+#   port [int]: Which of the TNC's radio ports it came from (the high nibble of the first byte)
+#   command [int]: What the frame holds (the low nibble of the first byte), e.g., KISS_DATA_FRAME
+#   data [bytearray]: The unescaped contents, i.e., the AX.25 header and packet
+KissFrame = namedtuple('KissFrame', ['port', 'command', 'data'])
+
+
+class KissDecoder:
+    """
+    Streaming KISS decoder: feed it bytes as they arrive and it returns the frames that they complete, split on FEND
+    and unescaped in a single pass. A frame is complete as soon as its closing FEND arrives.
+    Input:
+        maximum_frame_length [int]: Frames longer than this are dropped, e.g., when noise ate a FEND
+        counters [Counter]: Where to tally dropped frames and bytes, as in FrameExtractor. Defaults to a new one.
+    """
+    transposed_bytes = {KISS_TRANSPOSED_FRAME_END: KISS_FRAME_END, KISS_TRANSPOSED_FRAME_ESCAPE: KISS_FRAME_ESCAPE}
+
+    def __init__(self, maximum_frame_length=1024, counters=None):
+        self.maximum_frame_length = maximum_frame_length
+        self.counters = Counter() if counters is None else counters
+        self.escaped_frame = bytearray()  # Bytes received since the last FEND, still escaped
+        self.frame_too_long = False
+
+    def feed(self, data):
+        """
+        Add newly received bytes
+        # Input:
+        #   data [bytes-like]: The bytes, in any size chunk
+        # Output:
+        #   kiss_frames [list of KissFrame]: The frames completed by data, in order, possibly none
+        """
+        pieces = bytes(data).split(bytes([KISS_FRAME_END]))
+        self.add_to_frame(pieces[0])
+
+        kiss_frames = []
+        for piece in pieces[1:]:  # Each FEND ends the frame in progress and starts the next one
+            kiss_frame = self.close_frame()
+            if kiss_frame is not None:
+                kiss_frames.append(kiss_frame)
+            self.add_to_frame(piece)
+        return kiss_frames
+
+    def add_to_frame(self, piece):
+        if self.frame_too_long:
+            self.counters[DISCARDED_BYTES] += len(piece)
+            return
+        self.escaped_frame += piece
+        if len(self.escaped_frame) > self.maximum_frame_length:
+            self.counters[ABORTED_FRAMES] += 1
+            self.counters[DISCARDED_BYTES] += len(self.escaped_frame)
+            self.escaped_frame = bytearray()
+            self.frame_too_long = True  # Drop the rest of it too, up to the next FEND
+
+    def close_frame(self):
+        escaped_frame = self.escaped_frame
+        frame_too_long = self.frame_too_long
+        self.escaped_frame = bytearray()
+        self.frame_too_long = False
+        if frame_too_long or not escaped_frame:  # Nothing between two FENDs is just padding
+            return None
+
+        frame = self.unescape(escaped_frame)
+        if not frame:
+            return None
+        return KissFrame(frame[0] >> 4, frame[0] & 0x0f, frame[1:])
+
+    @classmethod
+    def unescape(cls, escaped_frame):
+        """
+        Replace each FESC TFEND with FEND and each FESC TFESC with FESC, working left to right so that an escaped FESC
+        is never mistaken for the start of another escape
+        """
+        pieces = escaped_frame.split(bytes([KISS_FRAME_ESCAPE]))
+        if len(pieces) == 1:
+            return escaped_frame
+        frame = bytearray(pieces[0])
+        for piece in pieces[1:]:
+            if piece:  # Otherwise the FESC ended the frame or was doubled, which is an error, so it's dropped
+                frame.append(cls.transposed_bytes.get(piece[0], piece[0]))
+                frame += piece[1:]
+        return frame
+
+
+sync_finder = FindSyncBytes()
+
+
+def get_kiss_packets(kiss_frames, counters):
+    """
+    Pick out the KISS data frames that hold a packet, with the same checks as FrameExtractor
+    # Input:
+    #   kiss_frames [list of KissFrame]: As returned by KissDecoder.feed
+    #   counters [Counter]: Where to tally the packets and the bytes and syncs dropped, as in FrameExtractor
+    # Output:
+    #   packets [list of (int, bytearray)]: The APID and frame of each packet, in order. As from FrameExtractor, a
+    #                                       frame keeps the AX.25 header ahead of its packet unless a sync was rejected
+    #                                       there, so the packet's sync is the first one in its frame.
+    """
+    packets = []
+    for kiss_frame in kiss_frames:
+        if kiss_frame.command != KISS_DATA_FRAME:  # TNC settings rather than data from the radio
+            continue
+        data = kiss_frame.data
+        rejected_sync = False
+        sync_position = sync_finder.find_packet_start(data)
+        while sync_position is not None:
+            status, header = check_packet(data, sync_position.index, len(data))
+            if status == FRAMED_PACKETS:
+                frame_start = sync_position.index if rejected_sync else 0
+                packet_end = sync_position.index + header.packet_length
+                if frame_start or packet_end < len(data):
+                    data = data[frame_start:packet_end]
+                packets.append((header.apid, data))
+                counters[FRAMED_PACKETS] += 1
+                counters[DISCARDED_BYTES] += len(kiss_frame.data) - len(data)
+                break
+            counters[ABORTED_FRAMES if status is None else status] += 1  # None: the frame ended part way through it
+            rejected_sync = True
+            sync_position = sync_finder.find_packet_start(data, sync_position.index + len(sync_finder.start_sync_bytes))
+        else:
+            counters[DISCARDED_BYTES] += len(data)
+    return packets
+
+
+class PacketReader:
+    def __init__(self, decode_kiss=False):
+        self.decode_kiss = decode_kiss  # If set, the stream is KISS frames from a TNC; otherwise frames are found by sync bytes
+        self.counters = Counter()  # What happened to the bytes received, as tallied by FrameExtractor and KissDecoder
+        self.frame_extractor = FrameExtractor(counters=self.counters)
+        self.kiss_decoder = KissDecoder(counters=self.counters)
+        self.packets = deque()  # (APID, frame) of packets already extracted but not yet returned
+
+    def read_packet(self):
+        #  From all of the binary coming in, grab and return a single housekeeping packet including all headers/footers
+        while True:
+            packet = self.read_any_packet()
+            if packet is None:  # The port was closed
+                return None
+            apid, frame = packet
+            if apid == HOUSEKEEPING_APID:
+                return frame
+
+    def read_any_packet(self):
+        """
+        Same as read_packet, but for packets of every APID, e.g., log packets too
+        # Output:
+        #   apid [int]: The packet's APID, from its CCSDS header, to route it by
+        #   frame [bytearray]: The packet including all headers/footers
+        #   Or None instead, once the other end has closed the port
+        """
+        while not self.packets:
+            data = self.get_data_from_buffer()
+            if data is None:
+                return None
+            if self.decode_kiss:
+                self.packets.extend(get_kiss_packets(self.kiss_decoder.feed(data), self.counters))
+            else:
+                self.packets.extend(self.frame_extractor.feed_packets(data))
+        return self.packets.popleft()
+
+    @staticmethod
+    def get_data_from_buffer():
+        # Placeholder method to be overridden by subclasses for serial and sockets
+        # because they have different objects to read from and syntax to read with.
+        # Returns None once the other end has closed the port, as opposed to nothing having arrived yet.
+        return bytearray()
+
+
+class ConnectSerial(PacketReader):
+    def __init__(self, port, baud_rate, log, read_timeout=0.1, decode_kiss=False):
+        super(ConnectSerial, self).__init__(decode_kiss)
+
+        self.port = port
+        self.baud_rate = baud_rate
+        self.read_timeout = read_timeout  # [s] Longest a read waits for the first byte before returning nothing
+        self.log = Logger().create_log()
+
+        self.ser = None
+        self.port_readable = None
+        self.start_sync_bytes = None
+        self.stop_sync_bytes = None
+
+    def connect_to_port(self):
+        self.log.info("Opening serial port {0} at baud rate {1}".format(self.port, self.baud_rate))
+
+        self.ser = serial.Serial(self.port, self.baud_rate, timeout=self.read_timeout)
+        if not self.ser.readable():
+            self.log.error('Serial port not readable.')
+            self.port_readable = False
+        else:
+            self.log.info('Successful serial port open.')
+            self.port_readable = True
+            return self
+
+    def get_data_from_buffer(self):
+        # Everything that has already arrived, or else wait for the next byte
+        return self.ser.read(max(self.ser.in_waiting, 1))
+
+    def close(self):
+        self.log.info("Closing serial port.")
+        self.ser.close()
+
+
+class ConnectSocket(PacketReader):
+    def __init__(self, ip_address, port, receive_buffer_size=4096, decode_kiss=False):
+        super(ConnectSocket, self).__init__(decode_kiss)
+
+        self.ip_address = ip_address
+        self.port = port
+        self.log = Logger().create_log()
+
+        # Reused for every read rather than allocating new bytes each time
+        self.receive_buffer = bytearray(receive_buffer_size)
+        self.receive_view = memoryview(self.receive_buffer)
+
+        self.client_socket = None
+        self.port_readable = None
+
+    def connect_to_port(self):
+        self.log.info("Opening IP address: {0} on port: {1}".format(self.ip_address, self.port))
+
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        try:
+            self.client_socket.connect((self.ip_address, int(self.port)))
+            self.log.info('Successful TCP/IP port open.')
+            self.port_readable = True
+        except socket.error as error:
+            self.log.warning("Failed connecting to {0} on port {1}".format(self.ip_address, self.port))
+            self.log.warning(''.format(error))
+            self.port_readable = False
+        finally:
+            return self
+
+    def get_data_from_buffer(self):
+        # Everything that has already arrived, up to the size of the buffer. The frame extractor copies what it keeps,
+        # so the view is only valid until the next read.
+        number_of_bytes = self.client_socket.recv_into(self.receive_buffer)
+        if number_of_bytes == 0:  # The other end closed the connection, so nothing more will ever arrive
+            self.log.warning("Connection to {0} on port {1} closed by the other end.".format(self.ip_address, self.port))
+            self.port_readable = False
+            return None
+        return self.receive_view[:number_of_bytes]
+
+    def close(self):
+        self.log.info("Closing TCP/IP port.")
+        self.client_socket.close()
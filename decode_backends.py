@@ -0,0 +1,99 @@
+"""Interchangeable ways to turn the raw bytes of packets into integers"""
+
+try:
+    import numpy
+except ImportError:  # Only the numpy backend needs it
+    numpy = None
+
+
+class PythonDecodeBackend:
+    """
+    Pure python decoding with int.from_bytes and struct. Fastest for one packet at a time and doesn't need numpy.
+    """
+    name = 'python'
+    converts_columns = False  # Converts one value at a time
+
+    @staticmethod
+    def decode_bytes(bytearray_temp, signed=True):
+        return int.from_bytes(bytearray_temp, 'little', signed=signed)
+
+    @staticmethod
+    def unpack(compiled_fields, packet, offset=0):
+        raw_values = list(compiled_fields.struct.unpack_from(packet, offset))
+        if compiled_fields.big_endian_slots:
+            big_endian_values = compiled_fields.big_endian_struct.unpack_from(packet, offset + compiled_fields.big_endian_offset)
+            for slot, value in zip(compiled_fields.big_endian_slots, big_endian_values):
+                raw_values[slot] = value
+        return raw_values
+
+    @staticmethod
+    def unpack_many(compiled_fields, buffer):
+        rows = list(compiled_fields.packet_struct.iter_unpack(buffer))
+        if not rows:
+            return [[] for _ in compiled_fields.raw_slots]
+        columns = [list(column) for column in zip(*rows)]
+
+        if compiled_fields.big_endian_slots:
+            big_endian_rows = [compiled_fields.big_endian_struct.unpack_from(buffer, packet_offset + compiled_fields.big_endian_offset)
+                               for packet_offset in range(0, len(buffer), compiled_fields.packet_length)]
+            for slot, column in zip(compiled_fields.big_endian_slots, zip(*big_endian_rows)):
+                columns[slot] = list(column)
+        return columns
+
+    @staticmethod
+    def convert_column(column, converter):
+        return [converter(value) for value in column]
+
+
+class NumpyDecodeBackend:
+    """
+    Decoding with numpy structured arrays. Fastest for many packets at once, where each column is calibrated in one go.
+    """
+    name = 'numpy'
+    converts_columns = True
+
+    @staticmethod
+    def get_dtype(compiled_fields):
+        if numpy is None:
+            raise ImportError('The numpy decode backend needs numpy to be installed.')
+        if compiled_fields.numpy_dtype is None:  # Built the first time it's needed so numpy stays optional
+            raw_slots = compiled_fields.raw_slots
+            compiled_fields.numpy_dtype = numpy.dtype({
+                'names': ['raw{0}'.format(raw_slot[0]) for raw_slot in raw_slots],
+                'formats': ['{0}{1}{2}'.format('>' if big_endian else '<', 'i' if signed else 'u', width)
+                            for offset, width, signed, big_endian in raw_slots],
+                'offsets': [raw_slot[0] for raw_slot in raw_slots],
+                'itemsize': compiled_fields.packet_length})
+        return compiled_fields.numpy_dtype
+
+    @staticmethod
+    def decode_bytes(bytearray_temp, signed=True):
+        if numpy is None:
+            raise ImportError('The numpy decode backend needs numpy to be installed.')
+        numpy_format = '<{0}{1}'.format('i' if signed else 'u', len(bytearray_temp))
+        return numpy.frombuffer(bytes(bytearray_temp), dtype=numpy_format)[0]
+
+    def unpack(self, compiled_fields, packet, offset=0):
+        # A fresh list, as from the python backend, so the caller can decode into it
+        return list(numpy.frombuffer(packet, dtype=self.get_dtype(compiled_fields), count=1, offset=offset)[0].tolist())
+
+    def unpack_many(self, compiled_fields, buffer):
+        packets = numpy.frombuffer(buffer, dtype=self.get_dtype(compiled_fields))
+        return [packets[name] for name in packets.dtype.names]
+
+    @staticmethod
+    def convert_column(column, converter):
+        return converter(column)  # A column converter, e.g., arithmetic or a calibration table lookup
+
+
+decode_backends = {PythonDecodeBackend.name: PythonDecodeBackend(),
+                   NumpyDecodeBackend.name: NumpyDecodeBackend()}
+
+
+def get_decode_backend(backend):
+    """
+    Returns the backend with the given name ('python' or 'numpy'), or backend itself if it's already a backend
+    """
+    if isinstance(backend, str):
+        return decode_backends[backend]
+    return backend
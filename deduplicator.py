@@ -0,0 +1,143 @@
+"""Drop the extra copies of a packet, e.g., a beacon heard by several ground stations or re-sent from a TNC's buffer"""
+
+import time
+from collections import Counter, OrderedDict
+from ccsds import PRIMARY_HEADER_LENGTH, parse_ccsds_header
+from find_sync_bytes import FindSyncBytes
+from logger import Logger, PACKET_LOG_LEVEL
+
+# Tallied in Deduplicator.counters, and in the counters of whoever heard the packet, e.g., a station in the aggregation server
+UNIQUE_PACKETS = 'unique_packets'  # Packets heard for the first time, i.e., heard first by this station
+DUPLICATE_PACKETS = 'duplicate_packets'  # Copies of packets already heard, which were dropped
+
+sync_finder = FindSyncBytes()
+
+
+class HeardPacket:
+    """
+    What the Deduplicator knows about a packet already heard
+    first_heard_time [float]: [s] From Deduplicator.clock, when it was first heard
+    first_heard_by: Whoever passed it to Deduplicator.check first, e.g., the source of a station's feed, or None
+    copies [int]: Number of times it has been heard since
+    """
+    __slots__ = ('first_heard_time', 'first_heard_by', 'copies')
+
+    def __init__(self, first_heard_time, first_heard_by):
+        self.first_heard_time = first_heard_time
+        self.first_heard_by = first_heard_by
+        self.copies = 0
+
+
+def get_packet_key(frame):
+    """
+    Returns the hash of just the packet, from its sync bytes through the end given by its header, so that copies match
+    however they were framed (e.g., behind different KISS or AX.25 headers, or junk bytes)
+    # Input:
+    #   frame [bytes-like]: As from a framing stage
+    # Output:
+    #   packet_key [int]: The same for every copy of the packet
+    """
+    sync_position = sync_finder.find_packet_start(frame)
+    if sync_position is None or len(frame) - sync_position.index < PRIMARY_HEADER_LENGTH:
+        return hash(bytes(frame))
+    packet_start = sync_position.index
+    return hash(bytes(frame[packet_start:packet_start + parse_ccsds_header(frame, packet_start).packet_length]))
+
+
+class Deduplicator:
+    """
+    Time windowed index of the packets heard: a packet heard again within window seconds of its first copy is a
+    duplicate. The index is an OrderedDict keyed by get_packet_key, so a lookup costs a single hash, and it's kept in
+    the order the packets were first heard, so packets older than the window (or past maximum_packets) are dropped
+    from its front and memory stays bounded.
+    Input:
+        window [float]: [s] How long after a packet is first heard that copies of it count as duplicates. MinXSS
+                        beacons are 9 s apart and each has its own sequence count, so copies are only ever heard as
+                        late as a TNC's buffer is replayed.
+        maximum_packets [int]: Most packets to remember, whatever their age
+        counters [Counter]: Where to tally UNIQUE_PACKETS and DUPLICATE_PACKETS from everyone. Defaults to a new one.
+        clock [function]: Returns the time in seconds, e.g., for tests. Defaults to time.monotonic.
+    """
+    def __init__(self, window=600.0, maximum_packets=100000, counters=None, clock=time.monotonic):
+        self.window = window
+        self.maximum_packets = maximum_packets
+        self.counters = Counter() if counters is None else counters
+        self.clock = clock
+        self.heard_packets = OrderedDict()  # [OrderedDict of HeardPacket] By packet key, first heard first
+        self.log = Logger().create_log()
+
+    def check(self, frame, heard_by=None, counters=None):
+        """
+        Look a packet up, adding it to the index if it's new
+        # Input:
+        #   frame [bytes-like]: The packet, e.g., as from a framing stage
+        #   heard_by: Whoever heard it, e.g., the source of a station's feed, recorded if it's the first to
+        #   counters [Counter]: Also tally the packet here, e.g., the station's counters
+        # Output:
+        #   heard_packet [HeardPacket]: If the packet is a duplicate, what's known about its first copy; otherwise None
+        """
+        return self.check_key(get_packet_key(frame), heard_by, counters)
+
+    def check_key(self, packet_key, heard_by=None, counters=None):
+        """
+        Same as check, for a packet whose key is already known, e.g., the hash of a packet found at its sync bytes
+        """
+        now = self.clock()
+        self.drop_expired_packets(now)
+        heard_packet = self.heard_packets.get(packet_key)
+        if heard_packet is None:
+            self.heard_packets[packet_key] = HeardPacket(now, heard_by)
+            if len(self.heard_packets) > self.maximum_packets:
+                self.heard_packets.popitem(last=False)
+            status = UNIQUE_PACKETS
+        else:
+            heard_packet.copies += 1
+            status = DUPLICATE_PACKETS
+            if self.log.isEnabledFor(PACKET_LOG_LEVEL):
+                self.log.log(PACKET_LOG_LEVEL, 'Duplicate {0} of a packet first heard by {1}, {2:.1f} s ago.'.format(
+                    heard_packet.copies, heard_packet.first_heard_by, now - heard_packet.first_heard_time))
+
+        self.counters[status] += 1
+        if counters is not None:
+            counters[status] += 1
+        return heard_packet
+
+    def check_keys(self, packet_keys, heard_by=None, counters=None):
+        """
+        Same as check_key, for a batch of packets heard at once, e.g., a chunk of a capture being replayed, so the
+        clock is read and expired packets dropped once for the whole batch
+        # Output:
+        #   is_unique [list of bool]: For each packet, False if it's a duplicate
+        """
+        now = self.clock()
+        self.drop_expired_packets(now)
+        heard_packets = self.heard_packets
+        is_unique = []
+        for packet_key in packet_keys:
+            heard_packet = heard_packets.get(packet_key)
+            if heard_packet is None:
+                heard_packets[packet_key] = HeardPacket(now, heard_by)
+                is_unique.append(True)
+            else:
+                heard_packet.copies += 1
+                is_unique.append(False)
+        while len(heard_packets) > self.maximum_packets:
+            heard_packets.popitem(last=False)
+
+        number_of_unique_packets = sum(is_unique)
+        for tallies in (self.counters, counters):
+            if tallies is not None:
+                tallies[UNIQUE_PACKETS] += number_of_unique_packets
+                tallies[DUPLICATE_PACKETS] += len(is_unique) - number_of_unique_packets
+        if self.log.isEnabledFor(PACKET_LOG_LEVEL) and number_of_unique_packets < len(is_unique):
+            self.log.log(PACKET_LOG_LEVEL, 'Dropped {0} duplicates of packets heard earlier from a batch heard by {1}.'.format(
+                len(is_unique) - number_of_unique_packets, heard_by))
+        return is_unique
+
+    def drop_expired_packets(self, now):
+        heard_packets = self.heard_packets
+        while heard_packets:
+            packet_key, heard_packet = next(iter(heard_packets.items()))
+            if now - heard_packet.first_heard_time < self.window:
+                return
+            del heard_packets[packet_key]
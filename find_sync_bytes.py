@@ -1,14 +1,75 @@
+import re
+from collections import namedtuple
+
+# Kinds of packet start found by FindSyncBytes.find_packet_start
+LOG_SYNC_START = 'log_sync_start'
+SYNC_START = 'sync_start'
+
+# Where a packet starts
+#   index [int]: Index of the first byte of the sync bytes
+#   sync_type [str]: LOG_SYNC_START or SYNC_START
+SyncPosition = namedtuple('SyncPosition', ['index', 'sync_type'])
+
+
 class FindSyncBytes:
     def __init__(self):
         self.log_sync_bytes = bytearray([0x08, 0x1D])  # Real time spacecraft messages to ignore
         self.start_sync_bytes = bytearray([0x08, 0x19])  # Beacon housekeeping data
         self.stop_sync_bytes = bytearray([0xa5, 0xa5])
 
-    def find_log_sync_start_index(self, packets):
-        return bytearray(packets).find(self.log_sync_bytes)
+        # Used to search memoryviews, which have no find method, without copying them
+        self.sync_patterns = {bytes(sync_bytes): re.compile(re.escape(bytes(sync_bytes)))
+                              for sync_bytes in [self.log_sync_bytes, self.start_sync_bytes, self.stop_sync_bytes]}
+
+        # Both packet start patterns at once for find_packet_start. Capture groups would say which one matched, but they
+        # stop the regular expression engine from skipping quickly to likely matches, so the type is looked up instead.
+        self.sync_types = {bytes(self.log_sync_bytes): LOG_SYNC_START,
+                           bytes(self.start_sync_bytes): SYNC_START}
+        self.packet_start_pattern = re.compile(re.escape(bytes(self.log_sync_bytes)) + b'|' +
+                                               re.escape(bytes(self.start_sync_bytes)))
+
+    def find_log_sync_start_index(self, packets, start=0, end=None):
+        return self.find_sync_bytes(packets, self.log_sync_bytes, start, end)
+
+    def find_sync_start_index(self, packets, start=0, end=None):
+        return self.find_sync_bytes(packets, self.start_sync_bytes, start, end)
+
+    def find_sync_stop_index(self, packets, start=0, end=None):
+        return self.find_sync_bytes(packets, self.stop_sync_bytes, start, end)
 
-    def find_sync_start_index(self, packets):
-        return bytearray(packets).find(self.start_sync_bytes)
+    def find_packet_start(self, packets, start=0, end=None):
+        """
+        Find the first log sync or start sync in packets[start:end], i.e., where the next packet of either kind begins
+        # Input:
+        #   packets [bytes, bytearray, or memoryview]: The buffer to search
+        #   start, end [int]: Optional bounds of the search
+        # Output:
+        #   sync_position [SyncPosition]: The first one found, or None if there isn't one
+        """
+        if end is None:
+            end = len(packets)
+        match = self.packet_start_pattern.search(packets, start, end)
+        if match is None:
+            return None
+        return SyncPosition(match.start(), self.sync_types[match.group()])
 
-    def find_sync_stop_index(self, packets):
-        return bytearray(packets).find(self.stop_sync_bytes)
+    def find_sync_bytes(self, packets, sync_bytes, start=0, end=None):
+        """
+        Find the first index of sync_bytes in packets[start:end] without copying packets
+        # Input:
+        #   packets [bytes, bytearray, or memoryview]: The buffer to search. Anything else (e.g., a list of ints) is
+        #                                              converted to a bytearray first.
+        #   sync_bytes [bytearray]: The pattern to search for
+        #   start, end [int]: Optional bounds of the search, as in bytearray.find
+        # Output:
+        #   index [int]: Index into packets of the first match, or -1 if there is none
+        """
+        if end is None:
+            end = len(packets)
+        if isinstance(packets, (bytes, bytearray)):
+            return packets.find(sync_bytes, start, end)
+        if isinstance(packets, memoryview):
+            pattern = self.sync_patterns.get(bytes(sync_bytes)) or re.compile(re.escape(bytes(sync_bytes)))
+            match = pattern.search(packets, start, end)
+            return match.start() if match else -1
+        return bytearray(packets).find(sync_bytes, start, end)
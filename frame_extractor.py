@@ -0,0 +1,196 @@
+"""Split the stream of bytes from a serial port or socket into frames, each holding one packet"""
+
+from collections import Counter
+from ccsds import HOUSEKEEPING_APID, PRIMARY_HEADER_LENGTH, parse_ccsds_header
+from find_sync_bytes import FindSyncBytes
+from logger import Logger, PACKET_LOG_LEVEL
+from ring_buffer import RingBuffer
+
+# What happened to the bytes received, tallied in FrameExtractor.counters, to tell packets lost on the radio link from
+# packets lost in the decoder
+FRAMED_PACKETS = 'framed_packets'  # Packets returned, of any APID, each already checked as the parser checks them
+DISCARDED_BYTES = 'discarded_bytes'  # Bytes dropped without being returned as part of a frame, e.g., a packet cut short
+FALSE_SYNCS = 'false_syncs'  # Sync bytes whose header has an impossible packet length, i.e., sync bytes in noise or data
+ABORTED_FRAMES = 'aborted_frames'  # Packets with a good header but no stop sync where it should be, e.g., bytes were lost
+
+
+sync_finder = FindSyncBytes()
+
+
+def check_packet(data, packet_start, data_end, maximum_packet_length=500):
+    """
+    The framing checks, shared by everything that finds packets: the header's packet length must be possible for its
+    APID, and the stop sync must be where that length puts it
+    # Input:
+    #   data [bytes-like]: Holds the packet, e.g., a receive buffer or a capture
+    #   packet_start [int]: Index of the packet's start sync (or log sync) in data
+    #   data_end [int]: Index just past the last byte received, e.g., len(data)
+    #   maximum_packet_length [int]: Longest packet to accept
+    # Output:
+    #   status [str]: FRAMED_PACKETS if it's a packet, FALSE_SYNCS or ABORTED_FRAMES if not, or None if more bytes are
+    #                 needed to tell
+    #   header [CcsdsHeader]: The packet's header, or None if it hasn't all arrived
+    """
+    if data_end - packet_start < PRIMARY_HEADER_LENGTH:
+        return None, None
+    header = parse_ccsds_header(data, packet_start)
+    if not header.has_expected_length() or header.packet_length > maximum_packet_length:
+        return FALSE_SYNCS, header
+    packet_end = packet_start + header.packet_length
+    if data_end < packet_end:
+        return None, header
+    stop_sync_bytes = sync_finder.stop_sync_bytes
+    if data[packet_end - len(stop_sync_bytes):packet_end] != stop_sync_bytes:
+        return ABORTED_FRAMES, header  # E.g., bytes were lost, or the sync bytes were really data
+    return FRAMED_PACKETS, header
+
+
+class FrameExtractor:
+    """
+    Incremental framer: feed it bytes as they arrive and it returns the frames they complete. Packets are found by
+    their start sync (or log sync), which is also the start of their CCSDS header, and the packet length field in that
+    header says where they end. So the bytes inside a packet are never searched, and a stop sync pattern that happens
+    to be in the data can't cut the packet short; the stop sync is only checked where the header says it should be.
+    Each byte outside of packets is searched once, so the cost is linear in the number of bytes received.
+    A frame is everything since the end of the previous packet (e.g., KISS and AX.25 headers) through the stop sync
+    of a packet, unless a sync was rejected in between, in which case the frame starts at the packet's own sync and
+    the bytes ahead of it are discarded. Either way, the packet's sync is the first one in its frame, so the parser
+    finds the packet that was validated here. feed returns the housekeeping frames, and feed_packets the frames of every packet, including log
+    packets (real time spacecraft messages), along with their APID. Stray bytes are dropped.
+    Received bytes are held in a fixed size RingBuffer, so memory use stays flat however much junk arrives. When a packet
+    turns out to be false, the search resumes right after its sync bytes, and what's dropped is tallied in counters.
+    Input:
+        maximum_frame_length [int]: Frames longer than this are trimmed to start at their start sync, as there's no way
+                                    to have this much header on the 254 byte MinXSS packet. Packets whose header says
+                                    they're longer than this are taken to be sync bytes in noise.
+        buffer_capacity [int]: Size of the receive buffer. Must be more than maximum_frame_length.
+        counters [Counter]: Where to tally what happens to the bytes received, e.g., shared with a KissDecoder. Defaults
+                            to a new one.
+    """
+    def __init__(self, maximum_frame_length=500, buffer_capacity=4096, counters=None):
+        if buffer_capacity <= maximum_frame_length:
+            raise ValueError('The buffer capacity ({0}) must be more than the maximum frame length ({1}).'.format(
+                buffer_capacity, maximum_frame_length))
+        self.maximum_frame_length = maximum_frame_length
+        self.ring_buffer = RingBuffer(buffer_capacity)
+        self.scanned_length = 0  # Number of bytes from the ring buffer's head already searched for sync bytes
+        self.sync_bytes = FindSyncBytes()
+        self.counters = Counter() if counters is None else counters
+        self.log = Logger().create_log()
+
+        # The packet found but not yet complete, counted from the ring buffer's head, or -1 if there isn't one
+        self.packet_start = -1
+        self.packet_end = -1  # Also -1 until its whole header has arrived
+        self.rejected_since_last_packet = False  # Whether the bytes ahead of the packet found hold a rejected sync
+
+    def feed(self, data):
+        """
+        Add newly received bytes
+        # Input:
+        #   data [bytes-like]: The bytes, in any size chunk
+        # Output:
+        #   frames [list of bytearray]: The housekeeping frames completed by data, in order, possibly none
+        """
+        return [frame for apid, frame in self.feed_packets(data) if apid == HOUSEKEEPING_APID]
+
+    def feed_packets(self, data):
+        """
+        Same as feed, but for packets of every APID
+        # Output:
+        #   packets [list of (int, bytearray)]: The APID and frame of each packet completed by data, in order
+        """
+        packets = []
+        number_of_bytes_written = self.ring_buffer.write(data)
+        self.extract_packets(packets)
+        if number_of_bytes_written < len(data):
+            # Bigger than the free space, so the rest goes in a piece at a time, extracting frames to make room
+            data = memoryview(data)
+            while number_of_bytes_written < len(data):
+                number_of_bytes_written += self.ring_buffer.write(data[number_of_bytes_written:])
+                self.extract_packets(packets)
+        return packets
+
+    def extract_packets(self, packets):
+        while self.packet_start != -1 or self.find_next_packet():
+            if not self.complete_packet(packets):
+                break
+
+        if len(self.ring_buffer) > self.maximum_frame_length:
+            self.drop_stale_bytes()
+
+    def find_next_packet(self):
+        # Back up one byte in case the last chunk ended half way through a sync
+        ring_buffer = self.ring_buffer
+        search_start = ring_buffer.head + max(self.scanned_length - 1, 0)
+        sync_position = self.sync_bytes.find_packet_start(ring_buffer.data, search_start, ring_buffer.tail)
+        if sync_position is None:
+            self.scanned_length = len(ring_buffer)
+            return False
+
+        self.packet_start = sync_position.index - ring_buffer.head
+        return True
+
+    def complete_packet(self, packets):
+        """
+        Read the header of the packet found by find_next_packet and, once all of its bytes have arrived, check its stop
+        sync and add its APID and frame to packets
+        # Output:
+        #   done [bool]: False if the packet needs more bytes, True if it has been taken out of the buffer or rejected
+        """
+        ring_buffer = self.ring_buffer
+        if self.packet_end != -1 and len(ring_buffer) < self.packet_end:
+            return False  # Still waiting for the rest of the packet, so don't check its header again
+        status, header = check_packet(ring_buffer.data, ring_buffer.head + self.packet_start, ring_buffer.tail,
+                                      self.maximum_frame_length)
+        if status is None:
+            if header is not None:
+                self.packet_end = self.packet_start + header.packet_length
+            return False
+        if status != FRAMED_PACKETS:
+            return self.reject_packet(status)
+        self.packet_end = self.packet_start + header.packet_length
+        packet_end = ring_buffer.head + self.packet_end
+
+        if self.rejected_since_last_packet or self.packet_end > self.maximum_frame_length:
+            frame_start = self.packet_start  # What's ahead is from a lost packet or noise, not this packet's headers
+        else:
+            frame_start = 0
+        packets.append((header.apid, ring_buffer.copy(ring_buffer.head + frame_start, packet_end)))
+        self.counters[FRAMED_PACKETS] += 1
+        if frame_start:
+            self.discard_bytes(frame_start, 'ahead of a packet')
+        ring_buffer.consume(self.packet_end)
+        self.packet_start = self.packet_end = -1
+        self.scanned_length = 0
+        self.rejected_since_last_packet = False
+        return True
+
+    def reject_packet(self, reason):
+        # Not a real packet after all, so search on from just after its sync bytes
+        self.counters[reason] += 1
+        if self.log.isEnabledFor(PACKET_LOG_LEVEL):
+            self.log.log(PACKET_LOG_LEVEL, 'Frame extractor rejected the packet starting {0} bytes into the buffer: {1}.'.format(
+                self.packet_start, reason))
+        self.scanned_length = self.packet_start + len(self.sync_bytes.start_sync_bytes)
+        self.packet_start = self.packet_end = -1
+        self.rejected_since_last_packet = True
+        return True
+
+    def drop_stale_bytes(self):
+        # No packet has ended in too long, so keep only what could still be the start of one
+        if self.packet_start != -1:
+            keep_from = self.packet_start
+        else:
+            keep_from = len(self.ring_buffer) - 1  # The last byte could be the first half of a sync
+        self.discard_bytes(keep_from, 'without a packet')
+        self.ring_buffer.consume(keep_from)
+        self.scanned_length = max(self.scanned_length - keep_from, 0)
+        if self.packet_start != -1:
+            self.packet_start = 0
+            if self.packet_end != -1:
+                self.packet_end -= keep_from
+
+    def discard_bytes(self, number_of_bytes, reason):
+        self.counters[DISCARDED_BYTES] += number_of_bytes
+        if number_of_bytes and self.log.isEnabledFor(PACKET_LOG_LEVEL):
+            self.log.log(PACKET_LOG_LEVEL, 'Frame extractor discarded {0} bytes {1}.'.format(number_of_bytes, reason))
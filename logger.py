@@ -1,6 +1,10 @@
 import logging
 import os
 
+# Below DEBUG so that per-packet output (every decoded packet, every rejected packet) stays off unless asked for
+PACKET_LOG_LEVEL = 5
+logging.addLevelName(PACKET_LOG_LEVEL, 'PACKET')
+
 
 class Logger:
     def __init__(self):
@@ -10,10 +14,10 @@ class Logger:
         """
         For debugging and informational purposes.
         """
-        self.ensure_log_folder_exists()
         log = logging.getLogger('minxss_beacon_decoder_debug')
 
-        if not self.logger_exists(log):
+        if not self.logger_exists(log):  # Only touch the disk the first time
+            self.ensure_log_folder_exists()
             handler = logging.FileHandler(self.create_log_filename())
             formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
             handler.setFormatter(formatter)
@@ -22,6 +26,14 @@ class Logger:
 
         return log
 
+    def enable_packet_logging(self, enable=True):
+        """
+        Opt in to (or back out of) logging every packet the parser sees. This costs more than decoding the packet.
+        """
+        log = self.create_log()
+        log.setLevel(PACKET_LOG_LEVEL if enable else logging.DEBUG)
+        return log
+
     @staticmethod
     def logger_exists(log):
         if len(log.handlers) > 0:
@@ -10,7 +10,13 @@ import connect_port_get_packet
 import file_upload
 import datetime
 from serial.tools import list_ports  # This is pyserial, not plain serial
-from minxss_parser import MinxssParser
+from minxss_parser import MinxssParser, DeltaDecoder, VALID_PACKET
+from frame_extractor import FRAMED_PACKETS, DISCARDED_BYTES, FALSE_SYNCS, ABORTED_FRAMES
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from packet_demux import PacketDemultiplexer
+from deduplicator import Deduplicator, DUPLICATE_PACKETS
+from packet_index import CaptureWriter
+import pipeline
 
 """Call the GUI and attach it to functions."""
 __author__ = "James Paul Mason"
@@ -18,6 +24,16 @@ __contact__ = "jmason86@gmail.com"
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
+    # Telemetry shown in each group of labels, so that a group is only redrawn when some of its telemetry changed
+    spacecraft_state_telemetry = {'FlightModel', 'CommandAcceptCount', 'SpacecraftMode', 'PointingMode', 'EnableX123',
+                                  'EnableSps', 'Eclipse'}
+    solar_data_telemetry = {'SpsX', 'SpsY', 'Xp'}
+    power_telemetry = {'BatteryVoltage', 'BatteryChargeCurrent', 'BatteryDischargeCurrent', 'SolarPanelMinusYPower',
+                       'SolarPanelPlusXPower', 'SolarPanelPlusYPower'}
+    temperature_telemetry = {'CommBoardTemperature', 'BatteryTemperature', 'EpsBoardTemperature', 'CdhBoardTemperature',
+                             'MotherboardTemperature', 'SolarPanelMinusYTemperature', 'SolarPanelPlusXTemperature',
+                             'SolarPanelPlusYTemperature'}
+
     def __init__(self):
         super(MainWindow, self).__init__()
 
@@ -30,7 +46,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.base_output_filename = None
         self.output_hex_filename = None
         self.output_binary_filename = None
+        self.capture_writer = None  # Saves to output_binary_filename, and its index, while the port is read
         self.port_read_thread = PortReadThread(self.read_port, self.stop_read)
+        self.delta_decoder = DeltaDecoder()
+        self.deduplicator = Deduplicator()  # E.g., for beacons the TNC sends again when it replays its buffer
+        self.packet_demultiplexer = self.setup_packet_demultiplexer()
 
         self.log = Logger().create_log()
         self.log.info("Launched MinXSS Beacon Decoder.")
@@ -281,7 +301,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         port = self.comboBox_serialPort.currentText()
         baud_rate = self.lineEdit_baudRate.text()
 
-        connect_serial = connect_port_get_packet.ConnectSerial(port, baud_rate, self.log)
+        connect_serial = connect_port_get_packet.ConnectSerial(port, baud_rate, self.log, decode_kiss=self.do_decode_kiss())
         connected_port = connect_serial.connect_to_port()
         port_readable = connected_port.port_readable
 
@@ -291,7 +311,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         ip_address = self.lineEdit_ipAddress.text()
         port = self.lineEdit_ipPort.text()
 
-        connect_socket = connect_port_get_packet.ConnectSocket(ip_address, port)
+        connect_socket = connect_port_get_packet.ConnectSocket(ip_address, port, decode_kiss=self.do_decode_kiss())
         connected_port = connect_socket.connect_to_port()
         port_readable = connect_socket.port_readable
 
@@ -320,6 +340,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.toggle_connect_button(is_currently_connect=False)
         self.display_gui_port_closed()
+        if self.connected_port is not None:
+            self.log.info("Link statistics: {0}".format(self.get_link_statistics()))
 
         self.stop_read()
 
@@ -350,30 +372,55 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def display_gui_upload_complete(self):
         self.label_uploadStatus.setText("Upload status: Complete")
 
-    def read_port(self):
-        while True:
-            buffer_data = self.connected_port.read_packet()
-            if len(buffer_data) == 0:
-                continue
-
-            buffer_data = self.decode_kiss(buffer_data)
-
-            buffer_data_hex_string = self.convert_buffer_data_to_hex_string(buffer_data)
-            self.display_gui_hex(buffer_data_hex_string)
+    def setup_packet_demultiplexer(self):
+        packet_demultiplexer = PacketDemultiplexer()
+        packet_demultiplexer.register(self.archive_packet)  # Every packet, whatever its APID
+        packet_demultiplexer.register(self.handle_housekeeping_packet, HOUSEKEEPING_APID)
+        packet_demultiplexer.register(self.handle_log_packet, LOG_APID)
+        return packet_demultiplexer
 
-            self.save_data_to_disk(buffer_data_hex_string, buffer_data)
-
-            minxss_parser = MinxssParser(buffer_data)
-            telemetry = minxss_parser.parse_packet()
-            self.display_gui_telemetry(telemetry)
-
-    def decode_kiss(self, buffer_data):
-        if self.do_decode_kiss():
-            # C0 is a special KISS character that get replaced; unreplace it
-            buffer_data = buffer_data.replace(bytearray([0xdb, 0xdc]), bytearray([0xc0]))
-            # DB is a special KISS character that get replaced; unreplace it
-            buffer_data = buffer_data.replace(bytearray([0xdb, 0xdd]), bytearray([0xdb]))
-        return buffer_data
+    def read_port(self):
+        # The same pipeline stages as the command line decoder, with the port doing the KISS decoding or framing so
+        # that the decode KISS box can be toggled while reading
+        packets = iter(self.connected_port.read_any_packet, None)
+        packets = pipeline.deduplicate(packets, self.deduplicator, counters=self.connected_port.counters)
+        decoded_packets = pipeline.parse_packets(packets, self.delta_decoder)
+        try:
+            for _ in pipeline.dispatch(decoded_packets, self.packet_demultiplexer):
+                self.display_gui_link_statistics()
+        finally:  # E.g., the port was closed by disconnecting
+            self.close_capture_writer()
+
+    def archive_packet(self, decoded_packet):
+        buffer_data = decoded_packet.frame
+        buffer_data_hex_string = self.convert_buffer_data_to_hex_string(buffer_data)
+        self.display_gui_hex(buffer_data_hex_string)
+
+        self.save_data_to_disk(buffer_data_hex_string, buffer_data, decoded_packet.apid)
+
+    def handle_housekeeping_packet(self, decoded_packet):
+        self.display_gui_telemetry(decoded_packet.decoded, decoded_packet.changed_telemetry)
+
+    def handle_log_packet(self, decoded_packet):
+        log_message = decoded_packet.decoded
+        if log_message:
+            self.log.info("Spacecraft message {0} at {1}.{2:03d} GPS s: {3}".format(
+                log_message.sequence_count, log_message.spacecraft_time_seconds,
+                log_message.spacecraft_time_milliseconds, log_message.message))
+
+    def get_link_statistics(self):
+        # Losses on the radio link show up as discarded bytes, false syncs, and aborted frames; losses in the decoder
+        # as packets that were framed but then rejected by the parser
+        port_counters = self.connected_port.counters
+        parser_rejected = sum(count for status, count in MinxssParser.counters.items() if status != VALID_PACKET)
+        return "Packets framed: {0}   valid: {1}   rejected by parser: {2}   duplicates: {3}   Discarded bytes: {4}   " \
+               "False syncs: {5}   Aborted frames: {6}".format(
+                   port_counters[FRAMED_PACKETS], MinxssParser.counters[VALID_PACKET], parser_rejected,
+                   port_counters[DUPLICATE_PACKETS], port_counters[DISCARDED_BYTES], port_counters[FALSE_SYNCS],
+                   port_counters[ABORTED_FRAMES])
+
+    def display_gui_link_statistics(self):
+        self.statusbar.showMessage(self.get_link_statistics())
 
     def do_decode_kiss(self):
         return self.checkBox_decodeKiss.isChecked()
@@ -387,33 +434,71 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         scroll_to_bottom = self.textBrowser_serialOutput.verticalScrollBar().maximum()
         self.textBrowser_serialOutput.verticalScrollBar().setValue(scroll_to_bottom)
 
-    def save_data_to_disk(self, buffer_data_hex_string, buffer_data):
+    def save_data_to_disk(self, buffer_data_hex_string, buffer_data, apid):
         if self.do_save_data():
             output_hex_file = open(self.output_hex_filename, 'a')
             output_hex_file.write(buffer_data_hex_string)
             output_hex_file.close()
 
-            output_binary_file = open(self.output_binary_filename, 'ab')
-            output_binary_file.write(buffer_data)
-            output_binary_file.close()
+            capture_writer = self.get_capture_writer()  # Also indexes the packet, in .dat.idx
+            capture_writer.write(buffer_data, apid)
+            capture_writer.flush()  # So the file is complete whenever it's uploaded
+
+    def get_capture_writer(self):
+        # Kept open while the port is read, and replaced when the output file changes
+        if self.capture_writer is not None and self.capture_writer.capture_filename != self.output_binary_filename:
+            self.close_capture_writer()
+        if self.capture_writer is None:
+            self.capture_writer = CaptureWriter(self.output_binary_filename)
+        return self.capture_writer
+
+    def close_capture_writer(self):
+        if self.capture_writer is not None:
+            self.capture_writer.close()
+            self.capture_writer = None
 
     def do_save_data(self):
         return self.checkBox_saveData.isChecked()
 
-    def display_gui_telemetry(self, telemetry):
+    def display_gui_telemetry(self, telemetry, changed_telemetry=None):
+        """
+        Input:
+            telemetry [Telemetry]: Decoded telemetry, as from pipeline.parse_packets, or None if the packet was not
+                                   valid. Not a dict from parse_packet, which lacks the derived telemetry, e.g.,
+                                   SolarPanelMinusYPower.
+            changed_telemetry [list of str]: Names of the telemetry points that changed since the last packet, to only
+                                             redraw those. Redraws everything if None.
+        """
         if not telemetry:
             return
 
         self.label_lastPacketTime.setText(
             "Last packet at: {} local    /    {} UTC".format(self.get_local_time(), self.get_utc_time()))
 
-        self.display_gui_telemetry_spacecraft_state(telemetry)
-        self.display_gui_telemetry_solar_data(telemetry)
-        self.display_gui_telemetry_power(telemetry)
-        self.display_gui_telemetry_temperature(telemetry)
+        if changed_telemetry is None:
+            self.display_gui_telemetry_spacecraft_state(telemetry)
+            self.display_gui_telemetry_solar_data(telemetry)
+            self.display_gui_telemetry_power(telemetry)
+            self.display_gui_telemetry_temperature(telemetry)
 
-        self.label_spacecraftMode.setPalette(self.green_color)
-        self.color_code_telemetry(telemetry)
+            self.label_spacecraftMode.setPalette(self.green_color)
+            self.color_code_telemetry(telemetry)
+            return
+
+        changed_telemetry = set(changed_telemetry)
+        if changed_telemetry & self.spacecraft_state_telemetry:
+            self.display_gui_telemetry_spacecraft_state(telemetry)
+            self.label_spacecraftMode.setPalette(self.green_color)
+            self.color_code_spacecraft_state(telemetry)
+        if changed_telemetry & self.solar_data_telemetry:
+            self.display_gui_telemetry_solar_data(telemetry)
+            self.color_code_solar_data(telemetry)
+        if changed_telemetry & self.power_telemetry:
+            self.display_gui_telemetry_power(telemetry)
+            self.color_code_power(telemetry)
+        if changed_telemetry & self.temperature_telemetry:
+            self.display_gui_telemetry_temperature(telemetry)
+            self.color_code_temperature(telemetry)
 
     @staticmethod
     def get_local_time():
@@ -463,9 +548,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         battery_current = self.get_battery_current(telemetry)
         self.label_batteryCurrent.setText("{0:.2f}".format(round(battery_current, 2)))
 
-        solar_panel_minus_y_power = telemetry['SolarPanelMinusYVoltage'] * telemetry['SolarPanelMinusYCurrent'] / 1e3
-        solar_panel_plus_x_power = telemetry['SolarPanelPlusXVoltage'] * telemetry['SolarPanelPlusXCurrent'] / 1e3
-        solar_panel_plus_y_power = telemetry['SolarPanelPlusYVoltage'] * telemetry['SolarPanelPlusYCurrent'] / 1e3
+        solar_panel_minus_y_power = telemetry['SolarPanelMinusYPower']
+        solar_panel_plus_x_power = telemetry['SolarPanelPlusXPower']
+        solar_panel_plus_y_power = telemetry['SolarPanelPlusYPower']
         self.label_solarPanelMinusYPower.setText("{0:.2f}".format(round(solar_panel_minus_y_power, 2)))
         self.label_solarPanelPlusXPower.setText("{0:.2f}".format(round(solar_panel_plus_x_power, 2)))
         self.label_solarPanelPlusYPower.setText("{0:.2f}".format(round(solar_panel_plus_y_power, 2)))
@@ -526,9 +611,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.label_xp.setPalette(self.red_color)
 
     def color_code_power(self, telemetry):
-        solar_panel_minus_y_power = telemetry['SolarPanelMinusYVoltage'] * telemetry['SolarPanelMinusYCurrent'] / 1e3
-        solar_panel_plus_x_power = telemetry['SolarPanelPlusXVoltage'] * telemetry['SolarPanelPlusXCurrent'] / 1e3
-        solar_panel_plus_y_power = telemetry['SolarPanelPlusYVoltage'] * telemetry['SolarPanelPlusYCurrent'] / 1e3
+        solar_panel_minus_y_power = telemetry['SolarPanelMinusYPower']  # Computed once and cached by the Telemetry record
+        solar_panel_plus_x_power = telemetry['SolarPanelPlusXPower']
+        solar_panel_plus_y_power = telemetry['SolarPanelPlusYPower']
         battery_current = self.get_battery_current(telemetry)
 
         if -1.0 <= solar_panel_minus_y_power <= 10.4:
@@ -626,9 +711,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def decode_kiss_toggled(self):
         self.write_gui_config_options_to_config_file()
+        if self.connected_port is not None:  # The port reader unescapes KISS frames as they arrive
+            self.connected_port.decode_kiss = self.do_decode_kiss()
 
     def prepare_to_exit(self):
         self.log.info("About to quit.")
+        self.log.info("Packets seen by the parser: {0}".format(dict(MinxssParser.counters)))
+        if self.connected_port is not None:
+            self.log.info("Link statistics: {0}".format(self.get_link_statistics()))
+        self.close_capture_writer()
         self.upload_data()  # Only occurs if forward data is toggled on
         self.log.info("Closing MinXSS Beacon Decoder.")
 
@@ -0,0 +1,123 @@
+"""Decode MinXSS beacons without the GUI, from a serial port, TCP/IP sockets, or a recording, printing JSON lines"""
+
+# Examples, from the repository root:
+#   python minxss_decoder_cli.py --serial /dev/ttyUSB0 --baud 19200 --kiss --save pass.bin
+#   python minxss_decoder_cli.py --socket localhost:10000 --socket 192.168.1.20:8001 --kiss --read-timeout 600
+#   python minxss_decoder_cli.py --file pass.bin --all-fields > pass.jsonl
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+from async_socket_source import AsyncSocketSource, read_feeds
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from connect_port_get_packet import ConnectSerial
+from deduplicator import Deduplicator
+from minxss_parser import beacon_fields
+from packet_index import CaptureWriter
+import pipeline
+
+
+def get_deduplicator(args):
+    return Deduplicator(args.duplicate_window) if args.duplicate_window > 0 else None
+
+
+def read_stream(args, field_names, counters, save_file):
+    # A serial port or a recording, through the pipeline on this thread
+    if args.file:
+        chunks, port = pipeline.read_file(args.file), None
+    else:
+        port = ConnectSerial(args.serial, args.baud, None).connect_to_port()
+        if port is None or not port.port_readable:
+            raise SystemExit('Could not read from {0}.'.format(args.serial))
+        chunks = pipeline.read_port(port)
+
+    decoded_packets = pipeline.build_pipeline(chunks, args.kiss, counters, deduplicator=get_deduplicator(args))
+    if save_file:
+        decoded_packets = pipeline.save_indexed_frames(decoded_packets, save_file)
+    try:
+        for decoded_packet in decoded_packets:
+            line = format_packet(decoded_packet, field_names)
+            if line:
+                print(line, flush=port is not None)  # Live from a port, so don't wait for a full buffer
+    finally:
+        if port:
+            port.close()
+
+
+def read_sockets(args, field_names, counters, save_file):
+    # Every socket at once on one event loop, reconnecting to any that drop
+    def handle_packet(source, decoded_packet):
+        if save_file:
+            save_file.write(decoded_packet.frame, decoded_packet.apid)
+        line = format_packet(decoded_packet, field_names, feed=str(source))
+        if line:
+            print(line, flush=True)
+
+    deduplicator = get_deduplicator(args)  # Shared, so a beacon heard on several sockets is printed once
+    sources = []
+    for address in args.socket:
+        ip_address, ip_port = address.rsplit(':', 1)
+        sources.append(AsyncSocketSource(ip_address, ip_port, args.kiss, args.read_timeout, counters=counters,
+                                         deduplicator=deduplicator))
+    asyncio.run(read_feeds(sources, handle_packet))
+
+
+def format_packet(decoded_packet, field_names, **tags):
+    """
+    Returns one JSON line for a valid packet, or None
+    # Input:
+    #   decoded_packet [DecodedPacket]: From the parser stage
+    #   field_names [list of str]: Telemetry points to include for housekeeping packets, or None for all of them
+    #   tags: Anything else to record with the packet, e.g., feed='localhost:10000' for the socket it came from
+    """
+    if decoded_packet.decoded is None:
+        return None
+    if decoded_packet.apid == HOUSEKEEPING_APID:
+        telemetry = decoded_packet.decoded
+        values = telemetry.to_dict() if field_names is None else {name: telemetry[name] for name in field_names}
+        record = {'apid': decoded_packet.apid, 'telemetry': values}
+    elif decoded_packet.apid == LOG_APID:
+        record = {'apid': decoded_packet.apid, 'log_message': decoded_packet.decoded._asdict()}
+    else:
+        return None
+    record.update(tags)
+    return json.dumps(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--serial', help='Serial port to read, e.g., /dev/ttyUSB0 or COM3')
+    source.add_argument('--socket', action='append',
+                        help='TCP/IP address and port to read, e.g., localhost:10000. Repeat it to read several feeds at once.')
+    source.add_argument('--file', help='Binary recording to reprocess, e.g., as saved by the GUI or --save, which need no --kiss')
+    parser.add_argument('--baud', type=int, default=19200, help='Baud rate for --serial')
+    parser.add_argument('--read-timeout', type=float,
+                        help='[s] Reconnect to a socket that has sent nothing for this long. Defaults to waiting forever.')
+    parser.add_argument('--duplicate-window', type=float, default=600,
+                        help='[s] Drop copies of a packet heard again within this long. 0 keeps them all.')
+    parser.add_argument('--kiss', action='store_true', help='The stream is KISS encoded, as from a TNC in KISS mode')
+    parser.add_argument('--save', help='Also append every packet, as received, to this binary file, and index it in the file plus .idx')
+    parser.add_argument('--all-fields', action='store_true', help='Print every housekeeping telemetry point, not just the summary')
+    args = parser.parse_args()
+
+    field_names = None if args.all_fields else beacon_fields.names + [value.name for value in beacon_fields.derived]
+    counters = Counter()
+    save_file = CaptureWriter(args.save) if args.save else None
+    try:
+        if args.socket:
+            read_sockets(args, field_names, counters, save_file)
+        else:
+            read_stream(args, field_names, counters, save_file)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if save_file:
+            save_file.close()
+        print('Link statistics: {0}'.format(dict(counters)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
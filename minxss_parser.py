@@ -2,176 +2,679 @@
 __author__ = "James Paul Mason"
 __contact__ = "jmason86@gmail.com"
 
-from numpy import uint8, int16, uint16
+from collections import namedtuple, Counter
+from functools import lru_cache
+from itertools import compress, repeat
+from operator import is_, itemgetter, ne
+from struct import Struct
+from calibration_tables import CalibrationTable
+from ccsds import HOUSEKEEPING_APID, LOG_APID, MINIMUM_PACKET_LENGTH, PRIMARY_HEADER_LENGTH, expected_packet_lengths, \
+    parse_ccsds_header
+from decode_backends import get_decode_backend
 from find_sync_bytes import FindSyncBytes
-from logger import Logger
+from logger import Logger, PACKET_LOG_LEVEL
+
+# Result of validating a packet. Kept in MinxssParser.status and tallied in MinxssParser.counters.
+VALID_PACKET = 'valid_packet'
+NO_START_SYNC = 'no_start_sync'
+NO_STOP_SYNC = 'no_stop_sync'
+WRONG_PACKET_LENGTH = 'wrong_packet_length'
+
+# One telemetry point in the beacon. Adding a telemetry point only takes a new row in telemetry_fields below.
+#   name [str]: Key in the decoded telemetry dictionary
+#   offset [int]: Index of the first byte of the raw value, counted from the start sync
+#   width [int]: Number of bytes in the raw value (1, 2, or 4)
+#   signed [bool]: If set, the raw value is a two's complement signed integer
+#   mask [int or None]: Bits to keep from the raw value, or None to keep them all
+#   shift [int]: Number of bits to shift right after masking
+#   calibration [function or None]: Converts the raw value to engineering units, or None to keep the raw value. Wrap it
+#                                   in a CalibrationTable (as below) to decode with a table lookup instead.
+#   units [str]: Units after calibration
+#   big_endian [bool]: If set, the raw value is big endian like the CCSDS header; otherwise little endian (the default)
+TelemetryField = namedtuple('TelemetryField', ['name', 'offset', 'width', 'signed', 'mask', 'shift', 'calibration', 'units',
+                                               'big_endian'])
+TelemetryField.__new__.__defaults__ = (False,)
+
+
+def correct_flight_model(flight_model):
+    # Fix mistaken flight model number in final flight software burn: 3 is really 2, and 4 is the engineering test
+    # unit (AKA FlatSat), really 3. Written as arithmetic so it works on a single value and on a numpy array alike.
+    return flight_model - (flight_model >= 3)
+
+
+# Calibrations shared by several telemetry points, so that each one only builds its lookup table once
+calibrate_sps_angle = CalibrationTable(lambda raw: raw / 1e4 * 3.0)
+calibrate_board_temperature = CalibrationTable(lambda raw: raw / 256.0)
+calibrate_solar_panel_temperature = CalibrationTable(lambda raw: raw * 0.1744 - 216.0)
+calibrate_battery_temperature = CalibrationTable(lambda raw: raw * 0.307 - 373.0)
+calibrate_battery_voltage = CalibrationTable(lambda raw: raw / 6415.0)
+calibrate_battery_current = CalibrationTable(lambda raw: raw * 3.5568 - 61.6)
+calibrate_solar_array_current = CalibrationTable(lambda raw: raw * 163.8 / 327.68)
+calibrate_solar_array_voltage = CalibrationTable(lambda raw: raw * 32.76 / 32768.0)
+
+telemetry_fields = [
+    TelemetryField('FlightModel', 51, 1, False, 0x30, 4, correct_flight_model, 'Unitless'),
+    TelemetryField('CommandAcceptCount', 16, 2, True, None, 0, None, '#'),
+    TelemetryField('SpacecraftMode', 12, 1, False, 0x07, 0, None, 'Unitless'),
+    TelemetryField('PointingMode', 13, 1, False, 0x01, 0, None, 'Unitless'),
+    TelemetryField('Eclipse', 12, 1, False, 0x08, 3, None, 'Boolean'),
+
+    TelemetryField('EnableX123', 88, 2, True, 0x0002, 1, None, 'Boolean'),
+    TelemetryField('EnableSps', 88, 2, True, 0x0004, 2, None, 'Boolean'),
+
+    TelemetryField('SpsX', 204, 2, True, None, 0, calibrate_sps_angle, 'deg'),
+    TelemetryField('SpsY', 206, 2, True, None, 0, calibrate_sps_angle, 'deg'),
+    TelemetryField('Xp', 192, 4, False, None, 0, None, 'DN'),
+
+    TelemetryField('CdhBoardTemperature', 86, 2, True, None, 0, calibrate_board_temperature, 'deg C'),
+    TelemetryField('CommBoardTemperature', 122, 2, True, None, 0, calibrate_board_temperature, 'deg C'),
+    TelemetryField('MotherboardTemperature', 124, 2, True, None, 0, calibrate_board_temperature, 'deg C'),
+    TelemetryField('EpsBoardTemperature', 128, 2, True, None, 0, calibrate_board_temperature, 'deg C'),
+    TelemetryField('SolarPanelMinusYTemperature', 160, 2, False, None, 0, calibrate_solar_panel_temperature, 'deg C'),
+    TelemetryField('SolarPanelPlusXTemperature', 162, 2, False, None, 0, calibrate_solar_panel_temperature, 'deg C'),
+    TelemetryField('SolarPanelPlusYTemperature', 164, 2, False, None, 0, calibrate_solar_panel_temperature, 'deg C'),
+    TelemetryField('BatteryTemperature', 174, 2, False, None, 0, calibrate_battery_temperature, 'deg C'),
+
+    TelemetryField('BatteryVoltage', 132, 2, False, None, 0, calibrate_battery_voltage, 'V'),
+    TelemetryField('BatteryChargeCurrent', 168, 2, False, None, 0, calibrate_battery_current, 'mA'),
+    TelemetryField('BatteryDischargeCurrent', 172, 2, False, None, 0, calibrate_battery_current, 'mA'),
+
+    TelemetryField('SolarPanelMinusYCurrent', 136, 2, False, None, 0, calibrate_solar_array_current, 'mA'),
+    TelemetryField('SolarPanelPlusXCurrent', 140, 2, False, None, 0, calibrate_solar_array_current, 'mA'),
+    TelemetryField('SolarPanelPlusYCurrent', 144, 2, False, None, 0, calibrate_solar_array_current, 'mA'),
+
+    TelemetryField('SolarPanelMinusYVoltage', 138, 2, False, None, 0, calibrate_solar_array_voltage, 'V'),
+    TelemetryField('SolarPanelPlusXVoltage', 142, 2, False, None, 0, calibrate_solar_array_voltage, 'V'),
+    TelemetryField('SolarPanelPlusYVoltage', 146, 2, False, None, 0, calibrate_solar_array_voltage, 'V'),
+]
+
+# CCSDS primary header, big endian unlike the rest of the packet, and the spacecraft time that follows it
+ccsds_header_fields = [
+    TelemetryField('CcsdsVersion', 0, 2, False, 0xe000, 13, None, 'Unitless', True),
+    TelemetryField('CcsdsPacketType', 0, 2, False, 0x1000, 12, None, 'Unitless', True),
+    TelemetryField('CcsdsSecondaryHeaderFlag', 0, 2, False, 0x0800, 11, None, 'Boolean', True),
+    TelemetryField('Apid', 0, 2, False, 0x07ff, 0, None, 'Unitless', True),
+    TelemetryField('SequenceFlags', 2, 2, False, 0xc000, 14, None, 'Unitless', True),
+    TelemetryField('SequenceCount', 2, 2, False, 0x3fff, 0, None, '#', True),
+    TelemetryField('PacketDataLength', 4, 2, False, None, 0, None, 'bytes', True),  # Packet length - 7, per CCSDS
+
+    TelemetryField('SpacecraftTimeSeconds', 6, 4, False, None, 0, None, 'GPS s'),
+    TelemetryField('SpacecraftTimeMilliseconds', 10, 2, False, None, 0, None, 'ms'),
+]
+
+checksum_field = TelemetryField('Checksum', 250, 2, False, None, 0, None, 'Unitless')
+
+# A real time spacecraft message from a log packet (APID 29): CCSDS header, spacecraft time, text, checksum, stop sync
+#   sequence_count [int]: From the CCSDS header, to put messages in order
+#   spacecraft_time_seconds [int]: GPS seconds, as in housekeeping packets
+#   spacecraft_time_milliseconds [int]
+#   message [str]: The text, without any padding
+LogMessage = namedtuple('LogMessage', ['sequence_count', 'spacecraft_time_seconds', 'spacecraft_time_milliseconds', 'message'])
+log_message_time_struct = Struct('<IH')
+log_message_offset = PRIMARY_HEADER_LENGTH + log_message_time_struct.size
+log_message_trailer_length = 4  # Checksum and stop sync
+
+
+def get_unnamed_housekeeping_fields(named_fields, start=12, stop=250):
+    """
+    Fill every byte between start and stop that no named field covers with a raw, uncalibrated telemetry point, so that
+    the whole housekeeping packet is decoded. Naming one of these bytes in a table above takes it out of here.
+    # Input:
+    #   named_fields [list of TelemetryField]: The telemetry points that are already defined
+    #   start [int]: Index of the first housekeeping byte, just after the spacecraft time
+    #   stop [int]: Index just past the last housekeeping byte, i.e., the checksum
+    # Output:
+    #   fields [list of TelemetryField]: 2 byte words on even offsets named HousekeepingWordNNN, or HousekeepingByteNNN
+    #                                    for a lone byte, where NNN is the offset
+    """
+    covered = set()
+    for field in named_fields:
+        covered.update(range(field.offset, field.offset + field.width))
+
+    fields = []
+    offset = start
+    while offset < stop:
+        if offset in covered:
+            offset += 1
+        elif offset % 2 == 0 and offset + 1 < stop and offset + 1 not in covered:
+            fields.append(TelemetryField('HousekeepingWord{0:03d}'.format(offset), offset, 2, False, None, 0, None, 'DN'))
+            offset += 2
+        else:
+            fields.append(TelemetryField('HousekeepingByte{0:03d}'.format(offset), offset, 1, False, None, 0, None, 'DN'))
+            offset += 1
+    return fields
+
+
+def order_for_decoding(fields):
+    """
+    Returns the fields in packet order, except that any field sharing bytes with an earlier one goes last. This is the
+    order CompiledTelemetryFields decodes fastest, since the raw values come out of the packet already in place.
+    """
+    first_fields = []
+    shared_fields = []
+    raw_slots = set()
+    for field in sorted(fields, key=lambda field: field.offset):
+        raw_slot = (field.offset, field.width, field.signed, field.big_endian)
+        if raw_slot in raw_slots:
+            shared_fields.append(field)
+        else:
+            first_fields.append(field)
+            raw_slots.add(raw_slot)
+    return first_fields + shared_fields
+
+
+# Every telemetry point in the housekeeping packet
+named_housekeeping_fields = telemetry_fields + ccsds_header_fields + [checksum_field]
+housekeeping_fields = order_for_decoding(named_housekeeping_fields + get_unnamed_housekeeping_fields(named_housekeeping_fields))
+
+# Telemetry computed from other telemetry points, only available from a Telemetry record
+#   name [str]: Key in the Telemetry record
+#   inputs [list of str]: Names of the telemetry points passed to function, in order
+#   function [function]: Computes the derived value from the inputs
+#   units [str]: Units of the derived value
+DerivedTelemetry = namedtuple('DerivedTelemetry', ['name', 'inputs', 'function', 'units'])
+
+derived_telemetry = [
+    DerivedTelemetry('SolarPanelMinusYPower', ['SolarPanelMinusYVoltage', 'SolarPanelMinusYCurrent'], lambda voltage, current: voltage * current / 1e3, 'W'),
+    DerivedTelemetry('SolarPanelPlusXPower', ['SolarPanelPlusXVoltage', 'SolarPanelPlusXCurrent'], lambda voltage, current: voltage * current / 1e3, 'W'),
+    DerivedTelemetry('SolarPanelPlusYPower', ['SolarPanelPlusYVoltage', 'SolarPanelPlusYCurrent'], lambda voltage, current: voltage * current / 1e3, 'W'),
+]
+
+
+def make_converter(field, for_columns=False):
+    """
+    Returns a function turning the raw value of field into its decoded value, or None if the raw value is already the
+    decoded value
+    # Input:
+    #   field [TelemetryField]: The telemetry point to convert
+    #   for_columns [bool]: If set, the function converts a numpy array of raw values instead of a single value
+    """
+    mask, shift, calibration = field.mask, field.shift, field.calibration
+    if isinstance(calibration, CalibrationTable):
+        if field.width <= 2 or mask is not None:  # Every possible raw value is in the table
+            signed = field.signed and mask is None
+            calibration = calibration.get_column_lookup(signed) if for_columns else calibration.get_lookup(signed)
+        else:
+            calibration = calibration.calibration
+    if mask is None:
+        return calibration
+    if calibration is None:
+        return lambda raw: (raw & mask) >> shift
+    return lambda raw: calibration((raw & mask) >> shift)
+
+
+class CompiledTelemetryFields:
+    """
+    A table of TelemetryFields turned into a single precomputed unpacker
+    Input:
+        fields [list of TelemetryField]: The telemetry points to decode
+        derived [list of DerivedTelemetry]: Telemetry computed from the fields, available from Telemetry records
+        packet_length [int]: Number of bytes in one packet, from start sync through stop sync
+    """
+    struct_codes = {(1, False): 'B', (1, True): 'b', (2, False): 'H', (2, True): 'h', (4, False): 'I', (4, True): 'i'}
+
+    def __init__(self, fields, derived=(), packet_length=254):
+        self.fields = fields
+        self.derived = derived
+        self.packet_length = packet_length
+        self.names = [field.name for field in fields]
+        self.indices = {name: index for index, name in enumerate(self.names + [value.name for value in derived])}
+
+        # Fields sharing the same bytes (e.g., several flags in one word) share one raw value
+        raw_slots = sorted(set((field.offset, field.width, field.signed, field.big_endian) for field in fields))
+        slot_indices = {}
+        struct_format = '<'
+        position = 0
+        for offset, width, signed, big_endian in raw_slots:
+            if offset < position:
+                raise ValueError('Telemetry field at byte {0} overlaps the field before it.'.format(offset))
+            if offset > position:
+                struct_format += '{0}x'.format(offset - position)
+            struct_format += self.struct_codes[(width, signed)]
+            slot_indices[(offset, width, signed, big_endian)] = len(slot_indices)
+            position = offset + width
+
+        self.raw_slots = raw_slots
+        self.struct = Struct(struct_format)  # All little endian, so big endian slots are read again by big_endian_struct
+        self.packet_struct = Struct(struct_format + '{0}x'.format(packet_length - position))  # Spans a whole packet
+
+        big_endian_slots = [raw_slot for raw_slot in raw_slots if raw_slot[3]]
+        self.big_endian_slots = [slot_indices[raw_slot] for raw_slot in big_endian_slots]
+        self.big_endian_offset = big_endian_slots[0][0] if big_endian_slots else 0
+        big_endian_format = '>'
+        position = self.big_endian_offset
+        for offset, width, signed, big_endian in big_endian_slots:
+            if offset > position:
+                big_endian_format += '{0}x'.format(offset - position)
+            big_endian_format += self.struct_codes[(width, signed)]
+            position = offset + width
+        self.big_endian_struct = Struct(big_endian_format)
+        self.numpy_dtype = None  # Built by the numpy decode backend the first time it's used
+
+        # Most fields are decoded just by unpacking them, so only the rest go through a python function per packet.
+        # When the fields are in packet order (see order_for_decoding) the raw values are already in place too.
+        self.field_slots = [slot_indices[(field.offset, field.width, field.signed, field.big_endian)] for field in fields]
+        if self.field_slots[:len(raw_slots)] == list(range(len(raw_slots))):
+            self.get_field_values = self.get_raw_values_in_place
+            self.shared_slots = self.field_slots[len(raw_slots):]
+        elif len(self.field_slots) == 1:  # itemgetter returns a bare value rather than a tuple for a single item
+            self.get_field_values = lambda raw_values, slot=self.field_slots[0]: [raw_values[slot]]
+        else:
+            self.get_field_values = lambda raw_values, get_values=itemgetter(*self.field_slots): list(get_values(raw_values))
+
+        # Built the first time they're needed, since that's when any calibration tables get built
+        self.converters = None
+        self.column_converters = None
+        self.field_decoders = None  # For decoding one telemetry point at a time, as Telemetry records do
+
+    def compile_converters(self):
+        converters = [make_converter(field) for field in self.fields]
+        self.field_decoders = [(Struct(('>' if field.big_endian else '<') + self.struct_codes[(field.width, field.signed)]),
+                                field.offset, converter)
+                               for field, converter in zip(self.fields, converters)]
+        self.converters = [(index, converter) for index, converter in enumerate(converters) if converter is not None]
+        return self.converters
+
+    def compile_column_converters(self):
+        converters = [make_converter(field, for_columns=True) for field in self.fields]
+        self.column_converters = [(index, converter) for index, converter in enumerate(converters) if converter is not None]
+        return self.column_converters
+
+    def get_raw_values_in_place(self, raw_values):
+        # Fields in packet order, so the raw values list from the backend becomes the field values list
+        raw_values.extend([raw_values[slot] for slot in self.shared_slots])
+        return raw_values
+
+    def decode(self, packet, offset=0, backend='python'):
+        """
+        Returns decoded telemetry for the packet starting at offset in a buffer as a dictionary
+        """
+        return dict(zip(self.names, self.decode_raw(packet, offset, backend)))
+
+    def decode_raw(self, packet, offset=0, backend='python'):
+        """
+        Returns the decoded values of every field as a list, in the same order as the fields
+        """
+        return self.convert(get_decode_backend(backend).unpack(self, packet, offset))
+
+    def convert(self, raw_values):
+        """
+        Returns the decoded values of every field from the list of raw values unpacked by a decode backend, which it
+        may reuse
+        """
+        values = self.get_field_values(raw_values)
+        for index, converter in self.converters if self.converters is not None else self.compile_converters():
+            values[index] = converter(values[index])
+        return values
+
+    def decode_field(self, field_index, packet, offset=0):
+        """
+        Returns the decoded value of a single field
+        """
+        if self.field_decoders is None:
+            self.compile_converters()
+        field_struct, field_offset, converter = self.field_decoders[field_index]
+        value = field_struct.unpack_from(packet, offset + field_offset)[0]
+        if converter is not None:
+            value = converter(value)
+        return value
+
+    def decode_many(self, buffer, backend='numpy'):
+        """
+        Returns decoded telemetry for aligned packets concatenated back to back as a dictionary of columns
+        Each column is a numpy array with the numpy backend or a list with the python backend.
+        """
+        if len(buffer) % self.packet_length != 0:
+            raise ValueError('Buffer length {0} is not a multiple of the {1} byte packet length.'.format(len(buffer), self.packet_length))
+
+        backend = get_decode_backend(backend)
+        raw_columns = backend.unpack_many(self, buffer)
+
+        if backend.converts_columns:  # e.g., numpy, which converts a whole column in one go
+            converters = self.column_converters if self.column_converters is not None else self.compile_column_converters()
+        else:
+            converters = self.converters if self.converters is not None else self.compile_converters()
+
+        columns = [raw_columns[slot] for slot in self.field_slots]
+        for index, converter in converters:
+            columns[index] = backend.convert_column(columns[index], converter)
+        return dict(zip(self.names, columns))
+
+
+@lru_cache(maxsize=64)
+def get_compiled_fields(names):
+    """
+    Returns the compiled unpacker for just the named housekeeping telemetry points, building it the first time
+    # Input:
+    #   names [tuple of str]: Names of telemetry points in housekeeping_fields, in the order to decode them. Derived
+    #                         telemetry is included when all of its inputs are.
+    # Output:
+    #   compiled_fields [CompiledTelemetryFields]: Decodes only those telemetry points
+    """
+    fields_by_name = {field.name: field for field in housekeeping_fields}
+    unknown_names = [name for name in names if name not in fields_by_name]
+    if unknown_names:
+        raise KeyError('Unknown telemetry point(s): {0}'.format(', '.join(unknown_names)))
+
+    derived = [value for value in derived_telemetry if all(name in names for name in value.inputs)]
+    return CompiledTelemetryFields([fields_by_name[name] for name in names], derived)
+
+
+not_decoded = object()  # Marks telemetry in a Telemetry record that hasn't been needed yet
+
+
+class Telemetry:
+    """
+    Decoded telemetry for one packet that only decodes each telemetry point the first time it's accessed
+    Read it like the dictionary from parse_packet, e.g., telemetry['BatteryVoltage'], or convert it with to_dict.
+    Input:
+        packet [bytes-like]: The buffer holding the packet, kept without copying
+        offset [int]: Index of the start sync in packet
+        compiled_fields [CompiledTelemetryFields]: Definition of the telemetry in the packet
+        values [list]: Values already decoded, fields then derived telemetry, with not_decoded for the rest
+    """
+    __slots__ = ['packet', 'offset', 'compiled_fields', 'values']
+
+    def __init__(self, packet, offset=0, compiled_fields=None, values=None):
+        self.packet = packet
+        self.offset = offset
+        self.compiled_fields = compiled_fields or compiled_housekeeping_fields
+        self.values = values if values is not None else [not_decoded] * len(self.compiled_fields.indices)
+
+    def __getitem__(self, name):
+        index = self.compiled_fields.indices[name]
+        value = self.values[index]
+        if value is not_decoded:
+            value = self.values[index] = self.decode(index)
+        return value
+
+    def decode(self, index):
+        number_of_fields = len(self.compiled_fields.fields)
+        if index < number_of_fields:
+            return self.compiled_fields.decode_field(index, self.packet, self.offset)
+
+        derived = self.compiled_fields.derived[index - number_of_fields]
+        return derived.function(*[self[name] for name in derived.inputs])
+
+    def __contains__(self, name):
+        return name in self.compiled_fields.indices
+
+    def __iter__(self):
+        return iter(self.compiled_fields.names)
+
+    def __len__(self):
+        return len(self.compiled_fields.names)
+
+    def keys(self):
+        return list(self.compiled_fields.names)
+
+    def decode_all(self):
+        """
+        Decode every telemetry point that hasn't been accessed or decoded yet, derived telemetry included, e.g., before
+        reading most of them
+        """
+        values = self.values
+        number_of_fields = len(self.compiled_fields.fields)
+        field_values = values[:number_of_fields]
+        number_of_missing_fields = field_values.count(not_decoded)
+        if number_of_missing_fields == number_of_fields:  # Nothing decoded yet, so decode every field in one pass
+            values[:number_of_fields] = self.compiled_fields.decode_raw(self.packet, self.offset)
+        elif number_of_missing_fields:
+            missing_field_indices = compress(range(number_of_fields), map(is_, field_values, repeat(not_decoded)))
+            if number_of_missing_fields > number_of_fields // 2:  # One pass over the packet still costs less
+                decoded_values = self.compiled_fields.decode_raw(self.packet, self.offset)
+                for index in missing_field_indices:
+                    values[index] = decoded_values[index]
+            else:
+                for index in missing_field_indices:
+                    values[index] = self.decode(index)
+        for index in range(number_of_fields, len(values)):  # Derived telemetry, from the fields
+            if values[index] is not_decoded:
+                values[index] = self.decode(index)
+        return self
+
+    def to_dict(self):
+        """
+        Returns a dictionary like parse_packet's, but with every telemetry point in the record, derived telemetry included
+        """
+        self.decode_all()
+        return dict(zip(self.compiled_fields.indices, self.values))
+
+
+beacon_fields = CompiledTelemetryFields(telemetry_fields, derived_telemetry)  # The summary shown in the GUI
+compiled_housekeeping_fields = CompiledTelemetryFields(housekeeping_fields, derived_telemetry)
+sync_finder = FindSyncBytes()
+packet_sync_bytes = {HOUSEKEEPING_APID: sync_finder.start_sync_bytes, LOG_APID: sync_finder.log_sync_bytes}
+log = Logger().create_log()
 
 
 class MinxssParser:
-    def __init__(self, minxss_packet):
+    counters = Counter()  # Shared by all parsers: number of packets seen with each validation status
+
+    def __init__(self, minxss_packet, backend='python'):
         self.minxss_packet = minxss_packet  # [bytearray]: Un-decoded data to be parsed
-        self.log = Logger().create_log()
-        self.expected_packet_length = 252
+        self.backend = get_decode_backend(backend)  # How raw bytes are turned into integers: 'python' or 'numpy'
+        self.log = log
+        self.status = None  # One of the validation statuses above, once the packet has been validated
 
-    def parse_packet(self):
+    def parse_packet(self, fields=None):
         """
         Returns decoded telemetry as a dictionary
+        # Input:
+        #   fields [list of str]: Names of the telemetry points to decode, from housekeeping_fields. Defaults to the
+        #                         summary in telemetry_fields. Use parse_telemetry to get every telemetry point.
         """
-        if not self.is_valid_packet():
+        sync_start_index = self.find_valid_packet_start()
+        if sync_start_index == -1:
             return None
 
-        self.ensure_packet_starts_at_sync()
-
-        telemetry = dict()
-
-        # Note: The [n: n + 2] instead of [n: n + 1] is because python slicing cuts short
-        # e.g., to get bytes at indices 3 and 4, you don't do minxss_packet[3:4], you have to do minxss_packet[3:5]
-        telemetry['FlightModel'] = self.decode_flight_model(self.minxss_packet[51])                        # [Unitless]
-        telemetry['CommandAcceptCount'] = self.decode_command_accept_count(self.minxss_packet[16:16 + 2])  # [#]
-        telemetry['SpacecraftMode'] = self.decode_spacecraft_mode(self.minxss_packet[12])                  # [Unitless]
-        telemetry['PointingMode'] = self.decode_pointing_mode(self.minxss_packet[13])                      # [Unitless]
-        telemetry['Eclipse'] = self.decode_eclipse(self.minxss_packet[12])                                 # [Boolean]
-
-        telemetry['EnableX123'] = self.decode_enable_x123(self.minxss_packet[88:88 + 2])  # [Boolean]
-        telemetry['EnableSps'] = self.decode_enable_sps(self.minxss_packet[88:88 + 2])    # [Boolean]
-
-        telemetry['SpsX'] = self.decode_sps(self.minxss_packet[204:204 + 2])  # [deg]
-        telemetry['SpsY'] = self.decode_sps(self.minxss_packet[206:206 + 2])  # [deg]
-        telemetry['Xp'] = self.decode_xp(self.minxss_packet[192:192 + 4])     # [DN]
-
-        telemetry['CdhBoardTemperature'] = self.decode_temperature(self.minxss_packet[86:86 + 2])                        # [deg C]
-        telemetry['CommBoardTemperature'] = self.decode_temperature(self.minxss_packet[122:122 + 2])                     # [deg C]
-        telemetry['MotherboardTemperature'] = self.decode_temperature(self.minxss_packet[124:124 + 2])                   # [deg C]
-        telemetry['EpsBoardTemperature'] = self.decode_temperature(self.minxss_packet[128:128 + 2])                      # [deg C]
-        telemetry['SolarPanelMinusYTemperature'] = self.decode_temperature_solar_panel(self.minxss_packet[160:160 + 2])  # [deg C]
-        telemetry['SolarPanelPlusXTemperature'] = self.decode_temperature_solar_panel(self.minxss_packet[162:162 + 2])   # [deg C]
-        telemetry['SolarPanelPlusYTemperature'] = self.decode_temperature_solar_panel(self.minxss_packet[164:164 + 2])   # [deg C]
-        telemetry['BatteryTemperature'] = self.decode_temperature_battery(self.minxss_packet[174:174 + 2])               # [deg C]
-
-        telemetry['BatteryVoltage'] = self.decode_battery_voltage(self.minxss_packet[132:132 + 2])           # [V]
-        telemetry['BatteryChargeCurrent'] = self.decode_battery_current(self.minxss_packet[168:168 + 2])     # [mA]
-        telemetry['BatteryDischargeCurrent'] = self.decode_battery_current(self.minxss_packet[172:172 + 2])  # [mA]
-        
-        telemetry['SolarPanelMinusYCurrent'] = self.decode_solar_array_current(self.minxss_packet[136:136 + 2])  # [mA]
-        telemetry['SolarPanelPlusXCurrent'] = self.decode_solar_array_current(self.minxss_packet[140:140 + 2])   # [mA]
-        telemetry['SolarPanelPlusYCurrent'] = self.decode_solar_array_current(self.minxss_packet[144:144 + 2])   # [mA]
-        
-        telemetry['SolarPanelMinusYVoltage'] = self.decode_solar_array_voltage(self.minxss_packet[138:138 + 2])  # [V]
-        telemetry['SolarPanelPlusXVoltage'] = self.decode_solar_array_voltage(self.minxss_packet[142:142 + 2])   # [V]
-        telemetry['SolarPanelPlusYVoltage'] = self.decode_solar_array_voltage(self.minxss_packet[146:146 + 2])   # [V]
-        
-        self.log.info("From MinXSS parser:")
-        self.log.info(telemetry)
+        # Decode in place from the sync offset rather than slicing off any header bytes first
+        compiled_fields = beacon_fields if fields is None else get_compiled_fields(tuple(fields))
+        telemetry = compiled_fields.decode(self.minxss_packet, sync_start_index, self.backend)
+
+        if self.log.isEnabledFor(PACKET_LOG_LEVEL):  # Formatting the telemetry costs more than decoding it
+            self.log.log(PACKET_LOG_LEVEL, "From MinXSS parser: {0}".format(telemetry))
         return telemetry
 
+    def parse_telemetry(self, fields=None):
+        """
+        Returns a Telemetry record that decodes each telemetry point only when it's first accessed, or None if the
+        packet is not valid
+        # Input:
+        #   fields [list of str]: Names of the telemetry points to include. Defaults to every housekeeping telemetry point.
+        """
+        sync_start_index = self.find_valid_packet_start()
+        if sync_start_index == -1:
+            return None
+
+        compiled_fields = compiled_housekeeping_fields if fields is None else get_compiled_fields(tuple(fields))
+        return Telemetry(self.minxss_packet, sync_start_index, compiled_fields)
+
+    @staticmethod
+    def parse_many(buffer, backend='numpy', fields=None):
+        """
+        Returns decoded telemetry for a run of aligned packets as a dictionary of columns
+        # Input:
+        #   buffer [bytes-like]: Packets concatenated back to back, each starting at its start sync and ending with
+        #                        its stop sync, e.g., several packets as returned by ensure_packet_starts_at_sync
+        #   backend [str]: 'numpy' (the default) or 'python' if numpy isn't available
+        #   fields [list of str]: Names of the telemetry points to decode, as for parse_packet
+        # Output:
+        #   telemetry [dict]: Same keys as parse_packet, but each value is a column with one entry per packet
+        """
+        compiled_fields = beacon_fields if fields is None else get_compiled_fields(tuple(fields))
+        return compiled_fields.decode_many(buffer, backend)
+
+    def parse_log_message(self):
+        """
+        Returns the real time spacecraft message in a log packet as a LogMessage, or None if the packet is not valid
+        """
+        sync_start_index = self.find_valid_packet_start(LOG_APID)
+        if sync_start_index == -1:
+            return None
+
+        header = parse_ccsds_header(self.minxss_packet, sync_start_index)
+        seconds, milliseconds = log_message_time_struct.unpack_from(self.minxss_packet, sync_start_index + PRIMARY_HEADER_LENGTH)
+        message_end = sync_start_index + header.packet_length - log_message_trailer_length
+        message = bytes(self.minxss_packet[sync_start_index + log_message_offset:message_end]).rstrip(b'\x00')
+        log_message = LogMessage(header.sequence_count, seconds, milliseconds, message.decode('ascii', errors='replace'))
+
+        if self.log.isEnabledFor(PACKET_LOG_LEVEL):
+            self.log.log(PACKET_LOG_LEVEL, "From MinXSS parser: {0}".format(log_message))
+        return log_message
+
     def is_valid_packet(self):
-        fsb = FindSyncBytes()
-        sync_start_index = fsb.find_sync_start_index(self.minxss_packet)
-        sync_stop_index = fsb.find_sync_stop_index(self.minxss_packet)
-        packet_length = sync_stop_index - sync_start_index
+        return self.find_valid_packet_start() != -1
 
+    def find_valid_packet_start(self, apid=HOUSEKEEPING_APID):
+        """
+        Validate the packet without copying it, recording the result in status and counters
+        # Input:
+        #   apid [int]: The kind of packet to look for: HOUSEKEEPING_APID (the default) or LOG_APID
+        # Output:
+        #   sync_start_index [int]: Index of the start sync (or log sync) in minxss_packet, or -1 if the packet is not valid
+        """
+        sync_start_index = sync_finder.find_sync_bytes(self.minxss_packet, packet_sync_bytes[apid])
         if sync_start_index == -1:
-            self.log.error('Invalid packet detected. No sync start pattern found. Returning.')
-            return False
-        if sync_stop_index == -1:
-            self.log.error('Invalid packet detected. No sync stop pattern found. Returning.')
-            return False
-        if packet_length != self.expected_packet_length:
-            self.log.error('Invalid packet detected. Packet length is {0} but expected to be {1}. Returning.'.format(packet_length, self.expected_packet_length))
-            return False
+            return self.reject_packet(NO_START_SYNC, 'No sync start pattern found.')
+        if len(self.minxss_packet) - sync_start_index < PRIMARY_HEADER_LENGTH:
+            return self.reject_packet(NO_STOP_SYNC, 'Packet ends within its CCSDS header.')
+
+        # The start sync is the start of the CCSDS header, whose packet length field says where the stop sync must be
+        header = parse_ccsds_header(self.minxss_packet, sync_start_index)
+        if not header.has_expected_length():
+            return self.reject_packet(WRONG_PACKET_LENGTH, 'Packet length field says {0} bytes but expected {1} for APID {2}.'.format(
+                header.packet_length, expected_packet_lengths.get(header.apid, 'at least {0}'.format(MINIMUM_PACKET_LENGTH)),
+                header.apid))
+        if apid == LOG_APID and header.packet_length < log_message_offset + log_message_trailer_length:
+            return self.reject_packet(WRONG_PACKET_LENGTH, 'Packet length field says {0} bytes, too short to hold a log message.'.format(
+                header.packet_length))
+
+        packet_end = sync_start_index + header.packet_length
+        sync_stop_index = packet_end - len(sync_finder.stop_sync_bytes)
+        if packet_end > len(self.minxss_packet) or \
+                sync_finder.find_sync_stop_index(self.minxss_packet, sync_stop_index, packet_end) == -1:
+            # Only look further when it isn't where it belongs, to tell a short or long packet from a cut off one
+            if sync_finder.find_sync_stop_index(self.minxss_packet, sync_start_index) == -1:
+                return self.reject_packet(NO_STOP_SYNC, 'No sync stop pattern found.')
+            return self.reject_packet(WRONG_PACKET_LENGTH, 'No sync stop pattern where the packet length field ({0} bytes) puts it.'.format(
+                header.packet_length))
 
-        return True
+        self.status = VALID_PACKET
+        self.counters[VALID_PACKET] += 1
+        return sync_start_index
+
+    def reject_packet(self, status, reason):
+        self.status = status
+        self.counters[status] += 1
+        if self.log.isEnabledFor(PACKET_LOG_LEVEL):
+            self.log.log(PACKET_LOG_LEVEL, 'Invalid packet detected. {0}'.format(reason))
+        return -1
 
     def ensure_packet_starts_at_sync(self):
-        fsb = FindSyncBytes()
-        sync_offset = fsb.find_sync_start_index(self.minxss_packet)
+        # parse_packet no longer needs this since it decodes from the sync offset, but it's handy for trimming
+        # packets before storing them back to back for parse_many
+        sync_offset = sync_finder.find_sync_start_index(self.minxss_packet)
         self.minxss_packet = self.minxss_packet[sync_offset:len(self.minxss_packet)]
 
     def decode_bytes(self, bytearray_temp, return_unsigned_int=False):
         """
         Combine several bytes corresponding to a single telemetry point to a single integer
         # Input:
-        #   bytearray_temp [bytearray]: The bytes corresponding to the telemetry to decode.
-        #                               Can accept any number of bytes but do not expect more than 4
+        #   bytearray_temp [bytearray]: The bytes corresponding to the telemetry to decode, least significant first.
+        #                               Can accept 1, 2, or 4 bytes.
         # Flags:
         #   return_unsigned_int: If set, return an unsigned integer instead of the default signed integer
         # Output:
         #   telemetry_point_raw [int]: The single integer for the telemetry point to be converted to human-readable by
                                        the calling function
         """
-        if len(bytearray_temp) == 1:
-            telemetry_point_raw = bytearray_temp
-        elif len(bytearray_temp) == 2:
-            telemetry_point_raw = (uint8(bytearray_temp[1]) << 8) | uint8(bytearray_temp[0])
-        elif len(bytearray_temp) == 4:
-            telemetry_point_raw = (uint8(bytearray_temp[3]) << 24) | (uint8(bytearray_temp[2] << 16)) | \
-                                  (uint8(bytearray_temp[1] << 8)) | (uint8(bytearray_temp[0] << 0))
-        else:
+        if len(bytearray_temp) not in (1, 2, 4):
             self.log.debug("More bytes than expected")
             return None
 
-        if return_unsigned_int:
-            return uint16(telemetry_point_raw)
+        return self.backend.decode_bytes(bytearray_temp, signed=not return_unsigned_int)
+
+
+class DeltaDecoder:
+    """
+    Decodes consecutive packets, only re-decoding the telemetry points whose bytes changed since the previous packet
+    and reporting which ones changed, so that the GUI and other consumers can update just those
+    Input:
+        compiled_fields [CompiledTelemetryFields]: Definition of the telemetry. Defaults to every housekeeping telemetry point.
+    """
+    def __init__(self, compiled_fields=None):
+        self.compiled_fields = compiled_fields or compiled_housekeeping_fields
+        self.all_names = self.compiled_fields.names + [value.name for value in self.compiled_fields.derived]
+        self.previous_raw_values = None  # [list]: Raw values unpacked from the previous valid packet
+        self.previous_values = None
+
+        number_of_fields = len(self.compiled_fields.fields)
+        self.fields_by_slot = None  # [list of list of (int, function)]: Fields and their converters for each raw value
+        self.slot_range = range(len(self.compiled_fields.raw_slots))
+        self.field_range = range(number_of_fields)
+        # Past this many changed raw values, decoding them all in one go costs less than one at a time
+        self.maximum_changed_slots = len(self.compiled_fields.raw_slots) // 8
+        self.derived_inputs = [(number_of_fields + derived_index,
+                                set(self.compiled_fields.indices[name] for name in value.inputs))
+                               for derived_index, value in enumerate(self.compiled_fields.derived)]
+
+    def parse_telemetry(self, minxss_packet):
+        """
+        Validate and decode a packet like MinxssParser.parse_telemetry
+        # Input:
+        #   minxss_packet [bytearray]: Un-decoded data to be parsed
+        # Output:
+        #   telemetry [Telemetry]: Every telemetry point, already decoded, or None if the packet is not valid
+        #   changed_telemetry [list of str]: Names of the telemetry points whose values differ from the previous valid
+        #                                    packet's, including derived telemetry; all of them for the first packet
+        """
+        sync_start_index = MinxssParser(minxss_packet).find_valid_packet_start()
+        if sync_start_index == -1:
+            return None, []
+        return self.decode(minxss_packet, sync_start_index)
+
+    def decode(self, packet, offset=0):
+        """
+        Same as parse_telemetry, for a packet already known to be valid that starts at offset in packet
+        """
+        compiled_fields = self.compiled_fields
+        raw_values = get_decode_backend('python').unpack(compiled_fields, packet, offset)
+        if raw_values == self.previous_raw_values:  # e.g., the same beacon heard twice
+            return Telemetry(packet, offset, compiled_fields, list(self.previous_values)), []
+
+        if self.previous_raw_values is None:
+            values = compiled_fields.convert(list(raw_values)) + [not_decoded] * len(compiled_fields.derived)
+            changed_indices = list(range(len(values)))
         else:
-            return int16(telemetry_point_raw)
+            changed_slots = list(compress(self.slot_range, map(ne, raw_values, self.previous_raw_values)))
+            if len(changed_slots) > self.maximum_changed_slots:
+                values = compiled_fields.convert(list(raw_values)) + self.previous_values[len(self.field_range):]
+                changed_indices = list(compress(self.field_range, map(ne, values, self.previous_values)))
+            else:
+                values = list(self.previous_values)
+                changed_indices = []
+                for slot in changed_slots:
+                    raw_value = raw_values[slot]
+                    for index, converter in self.get_fields_by_slot()[slot]:
+                        value = raw_value if converter is None else converter(raw_value)
+                        if value != values[index]:  # Several flags in one byte may not all have changed
+                            values[index] = value
+                            changed_indices.append(index)
 
-    @staticmethod
-    def decode_flight_model(bytearray_temp):
-        flight_model = (bytearray_temp & 0x0030) >> 4  # [Unitless]
-
-        # Fix mistaken flight model number in final flight software burn
-        if flight_model == 3:
-            flight_model = 2
-        elif flight_model == 4:
-            flight_model = 3  # This is the engineering test unit (AKA FlatSat)
-        return flight_model
-    
-    def decode_command_accept_count(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp)  # [#]
-    
-    @staticmethod
-    def decode_spacecraft_mode(bytearray_temp):
-        return bytearray_temp & 0x07  # [Unitless]
-    
-    @staticmethod
-    def decode_pointing_mode(bytearray_temp):
-        return bytearray_temp & 0x01  # [Unitless]
-    
-    def decode_enable_x123(self, bytearray_temp):
-        decoded_byte = self.decode_bytes(bytearray_temp)
-        return (decoded_byte & 0x0002) >> 1  # [Boolean]
-    
-    def decode_enable_sps(self, bytearray_temp):
-        decoded_byte = self.decode_bytes(bytearray_temp)
-        return (decoded_byte & 0x0004) >> 2  # [Boolean]
-    
-    def decode_sps(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp) / 1e4 * 3.0  # [deg]
+            changed_fields = set(changed_indices)
+            for index, input_indices in self.derived_inputs:
+                if input_indices & changed_fields:
+                    values[index] = not_decoded  # The record recomputes it when it's needed
+                    changed_indices.append(index)
 
-    @staticmethod
-    def decode_eclipse(bytearray_temp):
-        return (bytearray_temp & 0x08) >> 3  # [Boolean]
-
-    def decode_xp(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True)  # [DN]
-    
-    def decode_temperature(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp) / 256.0  # [deg C]
-    
-    def decode_temperature_battery(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) * 0.307 - 373.0  # [deg C]
-    
-    def decode_temperature_solar_panel(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) * 0.1744 - 216.0  # [deg C]
-    
-    def decode_battery_voltage(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) / 6415.0  # [V]
-    
-    def decode_battery_current(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) * 3.5568 - 61.6  # [mA]
-    
-    def decode_solar_array_current(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) * 163.8 / 327.68  # [mA]
-    
-    def decode_solar_array_voltage(self, bytearray_temp):
-        return self.decode_bytes(bytearray_temp, return_unsigned_int=True) * 32.76 / 32768.0  # [V]
+        self.previous_raw_values = raw_values
+        self.previous_values = values
+        return Telemetry(packet, offset, compiled_fields, list(values)), [self.all_names[index] for index in changed_indices]
+
+    def get_fields_by_slot(self):
+        if self.fields_by_slot is None:  # Once the converters have been compiled by the first decode
+            self.fields_by_slot = [[] for _ in self.slot_range]
+            for index, slot in enumerate(self.compiled_fields.field_slots):
+                self.fields_by_slot[slot].append((index, self.compiled_fields.field_decoders[index][2]))
+        return self.fields_by_slot
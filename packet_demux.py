@@ -0,0 +1,48 @@
+"""Route each packet from the port to the code that handles its kind, by APID"""
+
+from logger import Logger, PACKET_LOG_LEVEL
+
+
+class PacketDemultiplexer:
+    """
+    Calls the handlers registered for every packet, e.g., an archive that saves them all, then those registered for the
+    packet's APID, e.g., the housekeeping parser for APID 25 and the log message decoder for APID 29.
+    The handlers for each APID are looked up in a dispatch table that's rebuilt whenever a handler is registered, so
+    routing a packet costs a single dictionary lookup.
+    """
+    def __init__(self):
+        self.apid_handlers = {}  # [dict of list of functions] Handlers registered for each APID
+        self.all_packet_handlers = []  # Handlers registered for every packet, whatever its APID
+        self.dispatch_table = {}  # [dict of tuple of functions] All of the handlers to call for each APID, in order
+        self.unrouted_handlers = ()  # All of the handlers to call for an APID that has none of its own
+        self.log = Logger().create_log()
+
+    def register(self, handler, apid=None):
+        """
+        Add a handler for packets
+        # Input:
+        #   handler [function]: Called with the packet, as passed to dispatch
+        #   apid [int]: Only call it for packets with this APID. Defaults to every packet.
+        """
+        if apid is None:
+            self.all_packet_handlers.append(handler)
+        else:
+            self.apid_handlers.setdefault(apid, []).append(handler)
+
+        self.dispatch_table = {apid: tuple(self.all_packet_handlers + handlers) for apid, handlers in self.apid_handlers.items()}
+        self.unrouted_handlers = tuple(self.all_packet_handlers)
+
+    def dispatch(self, apid, packet):
+        """
+        Send a packet to its handlers
+        # Input:
+        #   apid [int]: The packet's APID, e.g., from PacketReader.read_any_packet
+        #   packet: The packet in whatever form the handlers take, e.g., its frame [bytearray] or a DecodedPacket
+        """
+        handlers = self.dispatch_table.get(apid)
+        if handlers is None:
+            if self.log.isEnabledFor(PACKET_LOG_LEVEL):
+                self.log.log(PACKET_LOG_LEVEL, 'No handler for packets with APID {0}.'.format(apid))
+            handlers = self.unrouted_handlers
+        for handler in handlers:
+            handler(packet)
@@ -0,0 +1,230 @@
+"""Sidecar index of a capture file, so any packet, or the packets received in a time range, is read without a scan"""
+
+# Each binary capture (e.g., a .dat file saved by the GUI or --save) can have an index beside it, named by adding
+# INDEX_EXTENSION, with a fixed size record for each frame in the capture: where it starts, how long it is, when it was
+# received, and its APID. Records are in the order the frames were saved, so packet n is found by seeking straight to
+# record n, and, since receipt times never go backward, a time is found with a binary search over the memory mapped
+# index. CaptureWriter writes the index as it saves frames; update_index builds it after the fact, e.g., for captures
+# saved before there were indexes.
+# Run from the repository root to index old captures: python packet_index.py ~/MinXSS_Beacon_Decoder/output/*.dat
+
+import argparse
+import mmap
+import os
+import time
+from collections import Counter, namedtuple
+from struct import Struct
+from replay import close_capture, find_packets, map_capture
+
+INDEX_EXTENSION = '.idx'
+
+# One record per frame, little endian and unpadded: offset (8 bytes), length (4), receipt time (8), APID (2)
+index_record_struct = Struct('<QIdH')
+receipt_time_struct = Struct('<d')
+receipt_time_offset = 12  # Into each record
+
+# Spacecraft time, which follows the primary header of MinXSS packets, is GPS seconds and milliseconds
+spacecraft_time_struct = Struct('<IH')
+spacecraft_time_offset = 6
+gps_to_unix_seconds = 315964800 - 18  # GPS epoch (1980-01-06) as Unix time, less the leap seconds since then (2017)
+
+# A frame in a capture
+#   offset [int]: Index of its first byte in the capture
+#   length [int]: Number of bytes. The packet ends the frame, which may start with bytes from ahead of it.
+#   receipt_time [float]: [Unix s] When it was received; estimated from the spacecraft time if indexed after the fact
+#   apid [int]: Its APID, e.g., HOUSEKEEPING_APID
+IndexEntry = namedtuple('IndexEntry', ['offset', 'length', 'receipt_time', 'apid'])
+
+
+def get_index_filename(capture_filename):
+    return capture_filename + INDEX_EXTENSION
+
+
+def estimate_receipt_time(packet, previous_receipt_time, latest_receipt_time):
+    """
+    Returns when a packet from a capture without an index was most likely received: no earlier than the packet before
+    it in the capture, nor than the spacecraft time in the packet, nor later than latest_receipt_time (e.g., when the
+    capture was last written), which rules out corrupt spacecraft times
+    """
+    if len(packet) < spacecraft_time_offset + spacecraft_time_struct.size:
+        return previous_receipt_time
+    seconds, milliseconds = spacecraft_time_struct.unpack_from(packet, spacecraft_time_offset)
+    spacecraft_time = seconds + milliseconds / 1000.0 + gps_to_unix_seconds
+    if spacecraft_time > latest_receipt_time:
+        return previous_receipt_time
+    return max(previous_receipt_time, spacecraft_time)
+
+
+def update_index(capture_filename, counters=None):
+    """
+    Bring the index of a capture up to date, scanning only what it doesn't cover yet, e.g., a whole capture saved
+    before there were indexes, or the frames after a crash. A record only partly written is dropped first.
+    # Input:
+    #   capture_filename [str]: The binary capture
+    #   counters [Counter]: Where to tally the scan's FRAMED_PACKETS, FALSE_SYNCS, and ABORTED_FRAMES
+    # Output:
+    #   last_entry [IndexEntry]: The index's last record, or None if the capture has no packets
+    """
+    index_filename = get_index_filename(capture_filename)
+    with open(index_filename, 'a+b') as index_file:
+        index_file.seek(0, os.SEEK_END)
+        index_length = index_file.tell()
+        complete_length = index_length - index_length % index_record_struct.size
+        if complete_length != index_length:
+            index_file.truncate(complete_length)
+
+        last_entry = None
+        if complete_length:
+            index_file.seek(complete_length - index_record_struct.size)
+            last_entry = IndexEntry(*index_record_struct.unpack(index_file.read(index_record_struct.size)))
+        capture_end = last_entry.offset + last_entry.length if last_entry else 0
+        receipt_time = last_entry.receipt_time if last_entry else 0.0
+
+        capture = map_capture(capture_filename)
+        try:
+            if len(capture) <= capture_end:
+                return last_entry
+            latest_receipt_time = os.path.getmtime(capture_filename)
+            records = []
+            for apid, start, end in find_packets(capture, counters, start=capture_end):
+                receipt_time = estimate_receipt_time(capture[start:end], receipt_time, latest_receipt_time)
+                last_entry = IndexEntry(start, end - start, receipt_time, apid)
+                records.append(index_record_struct.pack(*last_entry))
+        finally:
+            close_capture(capture)
+        index_file.seek(0, os.SEEK_END)
+        index_file.write(b''.join(records))
+    return last_entry
+
+
+class CaptureWriter:
+    """
+    Appends frames to a binary capture, as the GUI saves them, and a record of each to the capture's index. The index
+    is brought up to date first, so appending to a capture saved without one indexes its earlier frames too.
+    Input:
+        capture_filename [str]: The binary capture, created if it doesn't exist
+        clock [function]: Returns the time in Unix seconds, e.g., for tests. Defaults to time.time.
+    """
+    def __init__(self, capture_filename, clock=time.time):
+        self.capture_filename = capture_filename
+        self.clock = clock
+        self.capture_file = open(capture_filename, 'ab')
+        last_entry = update_index(capture_filename)
+        self.offset = self.capture_file.tell()
+        self.last_receipt_time = last_entry.receipt_time if last_entry else 0.0
+        self.index_file = open(get_index_filename(capture_filename), 'ab')
+
+    def write(self, frame, apid, receipt_time=None):
+        """
+        Save a frame
+        # Input:
+        #   frame [bytes-like]: As from a framing stage, which ends with the packet
+        #   apid [int]: The packet's APID
+        #   receipt_time [float]: [Unix s] When it was received. Defaults to now.
+        """
+        receipt_time = self.clock() if receipt_time is None else receipt_time
+        receipt_time = self.last_receipt_time = max(receipt_time, self.last_receipt_time)  # Even if the clock is set back
+        self.capture_file.write(frame)
+        self.index_file.write(index_record_struct.pack(self.offset, len(frame), receipt_time, apid))
+        self.offset += len(frame)
+
+    def flush(self):
+        self.capture_file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.capture_file.close()
+        self.index_file.close()
+
+
+class PacketIndex:
+    """
+    Random access to the frames of a binary capture through its memory mapped index, which is brought up to date first.
+    Indexing gives the IndexEntry of a packet by its number in the capture.
+    Input:
+        capture_filename [str]: The binary capture
+    """
+    def __init__(self, capture_filename):
+        update_index(capture_filename)
+        self.capture = map_capture(capture_filename)
+        self.index = map_capture(get_index_filename(capture_filename))
+        self.number_of_packets = len(self.index) // index_record_struct.size
+
+    def __len__(self):
+        return self.number_of_packets
+
+    def __getitem__(self, packet_number):
+        if packet_number < 0:
+            packet_number += self.number_of_packets
+        if not 0 <= packet_number < self.number_of_packets:
+            raise IndexError('Packet {0} is not in a capture of {1} packets.'.format(packet_number, self.number_of_packets))
+        return IndexEntry(*index_record_struct.unpack_from(self.index, packet_number * index_record_struct.size))
+
+    def get_receipt_time(self, packet_number):
+        return receipt_time_struct.unpack_from(self.index, packet_number * index_record_struct.size + receipt_time_offset)[0]
+
+    def read_frame(self, packet_number):
+        """
+        Returns the frame of a packet, as it was saved
+        """
+        entry = self[packet_number]
+        return self.capture[entry.offset:entry.offset + entry.length]
+
+    def find_time(self, receipt_time):
+        """
+        Returns the number of the first packet received at or after receipt_time [Unix s], or len(self) if none was
+        """
+        low, high = 0, self.number_of_packets
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_receipt_time(middle) < receipt_time:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_time_range(self, start_time, end_time):
+        """
+        Returns the numbers of the packets received from start_time up to end_time [Unix s], as a range
+        """
+        return range(self.find_time(start_time), self.find_time(end_time))
+
+    def read_frames(self, packet_numbers):
+        """
+        Yields (entry, frame) for each packet, e.g., from get_time_range
+        """
+        for packet_number in packet_numbers:
+            entry = self[packet_number]
+            yield entry, self.capture[entry.offset:entry.offset + entry.length]
+
+    def close(self):
+        for mapped_file in (self.capture, self.index):
+            if isinstance(mapped_file, mmap.mmap):
+                mapped_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('captures', nargs='+', help='Binary captures to index, e.g., .dat files saved by the GUI')
+    args = parser.parse_args()
+
+    for capture_filename in args.captures:
+        counters = Counter()
+        update_index(capture_filename, counters)
+        with PacketIndex(capture_filename) as packet_index:
+            if len(packet_index):
+                print('{0}: {1} packets received from {2} to {3}. Scanned: {4}'.format(
+                    capture_filename, len(packet_index), time.ctime(packet_index[0].receipt_time),
+                    time.ctime(packet_index[-1].receipt_time), dict(counters)))
+            else:
+                print('{0}: no packets'.format(capture_filename))
+
+
+if __name__ == '__main__':
+    main()
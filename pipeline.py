@@ -0,0 +1,165 @@
+"""Decode beacons without the GUI, by chaining generator stages: source -> KISS or framer -> deduplicator -> parser -> sinks"""
+
+# Each stage takes the iterable from the stage before it and yields to the one after, so stages can be tested and
+# benchmarked on their own and chained differently for the GUI, the command line, and reprocessing files. For example,
+# decoding a recorded KISS stream:
+#     for decoded_packet in parse_packets(decode_kiss(read_file('pass.bin'))):
+#         print(decoded_packet.decoded)
+
+from collections import namedtuple, Counter
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from connect_port_get_packet import KissDecoder, get_kiss_packets
+from frame_extractor import FrameExtractor
+from minxss_parser import MinxssParser, DeltaDecoder
+
+# A packet after the parser stage
+#   apid [int]: From the packet's CCSDS header
+#   frame [bytearray]: The packet, with any headers that came before it (e.g., AX.25), as received
+#   decoded [Telemetry, LogMessage, or None]: Telemetry for housekeeping packets, the message for log packets, or None
+#                                             if the packet is not valid or of a kind the parser doesn't know
+#   changed_telemetry [list of str]: For housekeeping packets, the telemetry points that changed since the last one
+DecodedPacket = namedtuple('DecodedPacket', ['apid', 'frame', 'decoded', 'changed_telemetry'])
+
+
+def read_port(port):
+    """
+    Source: yields chunks of bytes as they arrive from a port, until the other end closes it
+    # Input:
+    #   port [ConnectSerial or ConnectSocket]: Already connected
+    """
+    while True:
+        data = port.get_data_from_buffer()
+        if data is None:
+            return
+        if data:
+            yield data
+
+
+def read_file(filename, chunk_size=65536):
+    """
+    Source: yields chunks of bytes from a recording, e.g., the binary file saved by the GUI, to reprocess it
+    """
+    with open(filename, 'rb') as recording:
+        while True:
+            chunk = recording.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def decode_kiss(chunks, counters=None):
+    """
+    Framing stage for KISS streams: yields (APID, frame) for each packet, as the closing FEND of its KISS frame arrives
+    # Input:
+    #   chunks [iterable of bytes-like]: From a source
+    #   counters [Counter]: Where to tally what happens to the bytes, as in FrameExtractor. Defaults to a new one.
+    """
+    kiss_decoder = KissDecoder(counters=counters)
+    for chunk in chunks:
+        for packet in get_kiss_packets(kiss_decoder.feed(chunk), kiss_decoder.counters):
+            yield packet
+
+
+def extract_frames(chunks, counters=None):
+    """
+    Framing stage for streams that aren't KISS encoded: yields (APID, frame) for each packet found by its sync bytes
+    and CCSDS header, as in decode_kiss
+    """
+    frame_extractor = FrameExtractor(counters=counters)
+    for chunk in chunks:
+        for packet in frame_extractor.feed_packets(chunk):
+            yield packet
+
+
+def deduplicate(packets, deduplicator, heard_by=None, counters=None):
+    """
+    Filter stage: passes on each (APID, frame) only the first time the packet is heard, so that copies (e.g., from a
+    TNC re-sending its buffer, or other stations) aren't parsed, displayed, or saved again
+    # Input:
+    #   packets [iterable of (int, bytearray)]: From a framing stage
+    #   deduplicator [Deduplicator]: The packets already heard, which can be shared between feeds
+    #   heard_by: Who's hearing these packets, e.g., the source of a station's feed, as recorded by the deduplicator
+    #   counters [Counter]: Where to tally the unique and duplicate packets of this feed, e.g., the framing stage's
+    """
+    for apid, frame in packets:
+        if deduplicator.check(frame, heard_by, counters) is None:
+            yield apid, frame
+
+
+def parse_packets(packets, delta_decoder=None):
+    """
+    Parser stage: yields a DecodedPacket for each (APID, frame)
+    # Input:
+    #   packets [iterable of (int, bytearray)]: From a framing stage or PacketReader.read_any_packet
+    #   delta_decoder [DeltaDecoder]: Decodes the housekeeping packets, keeping track of what changed. Defaults to a new one.
+    """
+    if delta_decoder is None:
+        delta_decoder = DeltaDecoder()
+    for apid, frame in packets:
+        if apid == HOUSEKEEPING_APID:
+            telemetry, changed_telemetry = delta_decoder.parse_telemetry(frame)
+            yield DecodedPacket(apid, frame, telemetry, changed_telemetry)
+        elif apid == LOG_APID:
+            yield DecodedPacket(apid, frame, MinxssParser(frame).parse_log_message(), [])
+        else:
+            yield DecodedPacket(apid, frame, None, [])
+
+
+def save_frames(decoded_packets, binary_file):
+    """
+    Sink: writes each frame to an open binary file, as the GUI saves them, and passes the packets on
+    """
+    for decoded_packet in decoded_packets:
+        binary_file.write(decoded_packet.frame)
+        yield decoded_packet
+
+
+def save_indexed_frames(decoded_packets, capture_writer):
+    """
+    Sink: same as save_frames, but through a packet_index.CaptureWriter, which also records each frame in the capture's
+    index
+    """
+    for decoded_packet in decoded_packets:
+        capture_writer.write(decoded_packet.frame, decoded_packet.apid)
+        yield decoded_packet
+
+
+def dispatch(decoded_packets, packet_demultiplexer):
+    """
+    Sink: hands each packet to the handlers registered for its APID with a PacketDemultiplexer, and passes them on
+    """
+    for decoded_packet in decoded_packets:
+        packet_demultiplexer.dispatch(decoded_packet.apid, decoded_packet)
+        yield decoded_packet
+
+
+def build_pipeline(chunks, kiss=False, counters=None, delta_decoder=None, deduplicator=None):
+    """
+    Chains the framing, deduplication, and parser stages onto a source
+    # Input:
+    #   chunks [iterable of bytes-like]: From a source, e.g., read_port or read_file
+    #   kiss [bool]: If set, the stream is KISS encoded, as from a TNC in KISS mode
+    #   counters [Counter]: Where the framing stage tallies what happens to the bytes. Defaults to a new one.
+    #   delta_decoder [DeltaDecoder]: For the parser stage. Defaults to a new one.
+    #   deduplicator [Deduplicator]: If given, copies of packets already heard are dropped before parsing
+    # Output:
+    #   decoded_packets [iterator of DecodedPacket]: For the sinks
+    """
+    if counters is None:
+        counters = Counter()
+    packets = decode_kiss(chunks, counters) if kiss else extract_frames(chunks, counters)
+    if deduplicator is not None:
+        packets = deduplicate(packets, deduplicator, counters=counters)
+    return parse_packets(packets, delta_decoder)
+
+
+def run(decoded_packets):
+    """
+    Pulls every packet through the pipeline, for when the sinks do all of the work
+    # Output:
+    #   number_of_packets [int]
+    """
+    number_of_packets = 0
+    for _ in decoded_packets:
+        number_of_packets += 1
+    return number_of_packets
@@ -0,0 +1,401 @@
+"""Decode archived captures, e.g., the .dat and .txt files saved by the GUI, as fast as the CPU allows"""
+
+# Run from the repository root: python replay.py ~/MinXSS_Beacon_Decoder/output/*.dat --output telemetry.csv
+# Binary captures (.dat, or anything saved with --save) are memory mapped and their packets found in place, so nothing
+# is copied through a receive buffer, and the housekeeping packets are decoded a batch at a time with
+# MinxssParser.parse_many. The output format follows the extension of --output: .csv, .jsonl (a JSON object per
+# packet), or .npz (a numpy array per telemetry point). Without --output, JSON lines are printed.
+
+import argparse
+import csv
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from ccsds import HOUSEKEEPING_APID, expected_packet_lengths
+from deduplicator import Deduplicator
+from find_sync_bytes import FindSyncBytes
+from frame_extractor import ABORTED_FRAMES, FRAMED_PACKETS, check_packet
+from minxss_parser import MinxssParser, beacon_fields, housekeeping_fields
+
+try:
+    import numpy
+except ImportError:  # Only the .npz sink and the numpy decode backend need it
+    numpy = None
+
+DECODED_PACKETS = 'decoded_packets'  # Housekeeping packets decoded and written to the sink
+
+default_backend = 'python' if numpy is None else 'numpy'
+
+# When a packet was made and the summary shown in the GUI
+default_field_names = ['SequenceCount', 'SpacecraftTimeSeconds', 'SpacecraftTimeMilliseconds'] + beacon_fields.names
+
+hex_byte_pattern = re.compile(r'0x([0-9a-fA-F]{2})')  # As the GUI writes its .txt captures
+sync_finder = FindSyncBytes()
+
+
+def map_capture(filename):
+    """
+    Returns the bytes of a capture without reading a binary one into memory
+    # Input:
+    #   filename [str]: A binary capture, which is memory mapped, or a .txt capture of hex bytes, which is converted
+    # Output:
+    #   capture [mmap or bytes]: Every byte of the capture, in order
+    """
+    if filename.endswith('.txt'):
+        with open(filename) as hex_file:
+            return bytes.fromhex(''.join(hex_byte_pattern.findall(hex_file.read())))
+
+    with open(filename, 'rb') as binary_file:
+        if os.fstat(binary_file.fileno()).st_size == 0:
+            return b''  # Empty files can't be memory mapped
+        return mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def close_capture(capture):
+    """
+    Unmaps a capture from map_capture, which is only memory mapped if it's a binary file that isn't empty
+    # Input:
+    #   capture [mmap or bytes]: The capture returned by map_capture
+    """
+    if isinstance(capture, mmap.mmap):
+        capture.close()
+
+
+def find_packets(capture, counters=None, maximum_packet_length=500, start=0, end=None):
+    """
+    Find every packet in a capture, with the same checks as FrameExtractor but without copying any bytes
+    # Input:
+    #   capture [bytes-like]: E.g., from map_capture
+    #   counters [Counter]: Where to tally FRAMED_PACKETS, FALSE_SYNCS, and ABORTED_FRAMES, as FrameExtractor does
+    #   maximum_packet_length [int]: Longest packet to accept, as FrameExtractor's maximum_frame_length
+    #   start [int]: Where in capture to start looking, e.g., the end of the packets already indexed
+    #   end [int]: Only find packets that start before this, e.g., where the next Chunk starts. Defaults to the end.
+    # Output:
+    #   Yields (apid, packet_start, packet_end) [tuple of int]: Each packet is capture[packet_start:packet_end], from its
+    #                                                            sync bytes to its stop sync
+    """
+    if counters is None:
+        counters = Counter()
+    capture_length = len(capture)
+    search_end = capture_length if end is None else min(end + 1, capture_length)  # A sync can straddle end
+    position = start
+    while True:
+        sync_position = sync_finder.find_packet_start(capture, position, search_end)
+        if sync_position is None:
+            return
+        packet_start = sync_position.index
+        status, header = check_packet(capture, packet_start, capture_length, maximum_packet_length)
+        if status == FRAMED_PACKETS:
+            counters[FRAMED_PACKETS] += 1
+            packet_end = packet_start + header.packet_length
+            yield header.apid, packet_start, packet_end
+            position = packet_end
+        else:
+            counters[ABORTED_FRAMES if status is None else status] += 1  # None if it's cut off by the end of the capture
+            if header is None:
+                return
+            position = packet_start + len(sync_finder.stop_sync_bytes)  # Search on, as this isn't a real packet
+
+
+def replay(filenames, sink, field_names=None, deduplicator=None, counters=None, batch_size=10000):
+    """
+    Decode the housekeeping packets in captures and write their telemetry to a sink, in the order they were captured
+    # Input:
+    #   filenames [list of str]: Captures, as for map_capture
+    #   sink: Has a write method that takes a batch of telemetry as returned by MinxssParser.parse_many, e.g., a CsvSink
+    #   field_names [list of str]: Housekeeping telemetry points to decode. Defaults to default_field_names.
+    #   deduplicator [Deduplicator]: Skip copies of a packet already replayed, e.g., heard by several stations
+    #   counters [Counter]: Where to tally DECODED_PACKETS and find_packets' and deduplicator's counters
+    #   batch_size [int]: Number of packets to decode at once. Larger batches are faster but take more memory.
+    # Output:
+    #   counters [Counter]: The same counters, for convenience
+    """
+    if counters is None:
+        counters = Counter()
+    field_names = default_field_names if field_names is None else field_names
+    batch_length = batch_size * expected_packet_lengths[HOUSEKEEPING_APID]
+
+    batch = bytearray()
+    for filename in filenames:
+        capture = map_capture(filename)
+        try:
+            for apid, start, end in find_packets(capture, counters):
+                if apid != HOUSEKEEPING_APID:
+                    continue
+                packet = capture[start:end]
+                if deduplicator is not None and deduplicator.check_key(hash(packet), filename, counters) is not None:
+                    continue
+                batch += packet
+                if len(batch) >= batch_length:
+                    sink.write(MinxssParser.parse_many(batch, default_backend, field_names))
+                    counters[DECODED_PACKETS] += batch_size
+                    batch = bytearray()
+        finally:
+            close_capture(capture)
+
+    if batch:
+        sink.write(MinxssParser.parse_many(batch, default_backend, field_names))
+        counters[DECODED_PACKETS] += len(batch) // expected_packet_lengths[HOUSEKEEPING_APID]
+    return counters
+
+
+# Part of a capture, for a worker process: the packets that start from start up to end (None for the end of the file)
+Chunk = namedtuple('Chunk', ['filename', 'start', 'end'])
+
+# What a worker process sends back for a Chunk
+#   telemetry [dict]: Columns for the chunk's housekeeping packets, as from MinxssParser.parse_many, or None if it has none
+#   packet_keys [list of int]: A key for Deduplicator.check_key for each of those packets, or None if not asked for
+#   counters [Counter]: From find_packets
+ChunkResult = namedtuple('ChunkResult', ['telemetry', 'packet_keys', 'counters'])
+
+
+def split_capture(filename, chunk_length=16 * 2 ** 20):
+    """
+    Split a capture into chunks for decode_chunk, each starting at a packet that passes find_packets' checks, so that
+    between them the chunks hold the same packets as the whole capture
+    # Input:
+    #   filename [str]: As for map_capture. Hex captures aren't split, as their bytes have to be converted first.
+    #   chunk_length [int]: [bytes] About how long each chunk should be
+    # Output:
+    #   chunks [list of Chunk]: In order
+    """
+    if filename.endswith('.txt'):
+        return [Chunk(filename, 0, None)]
+
+    capture = map_capture(filename)
+    starts = [0]
+    try:
+        for nominal_start in range(chunk_length, len(capture), chunk_length):
+            if nominal_start <= starts[-1]:
+                continue  # The last chunk already starts after here
+            first_packet = next(find_packets(capture, start=nominal_start), None)
+            if first_packet is None:
+                break
+            starts.append(first_packet[1])
+    finally:
+        close_capture(capture)
+    return [Chunk(filename, start, end) for start, end in zip(starts, starts[1:] + [None])]
+
+
+def get_stable_packet_key(packet):
+    # The same in every process, unlike hash, which is salted differently in each process that's spawned
+    return int.from_bytes(hashlib.blake2b(packet, digest_size=8).digest(), 'little')
+
+
+def decode_chunk(chunk, field_names=None, keyed=False):
+    """
+    Decode the housekeeping packets in a Chunk, e.g., in a worker process
+    # Input:
+    #   chunk [Chunk]: E.g., from split_capture
+    #   field_names [list of str]: As for replay
+    #   keyed [bool]: Also return a key for each packet, to check for copies with
+    # Output:
+    #   chunk_result [ChunkResult]: The chunk's telemetry, keys, and counters
+    """
+    counters = Counter()
+    capture = map_capture(chunk.filename)
+    try:
+        packets = [capture[start:end] for apid, start, end in find_packets(capture, counters, start=chunk.start, end=chunk.end)
+                   if apid == HOUSEKEEPING_APID]
+    finally:
+        close_capture(capture)
+
+    field_names = default_field_names if field_names is None else field_names
+    telemetry = MinxssParser.parse_many(b''.join(packets), default_backend, field_names) if packets else None
+    packet_keys = [get_stable_packet_key(packet) for packet in packets] if keyed else None
+    return ChunkResult(telemetry, packet_keys, counters)
+
+
+def select_rows(telemetry, keep):
+    # Just the packets to keep [list of bool] from a batch of columns
+    if numpy is not None:
+        keep = numpy.array(keep, dtype=bool)
+        return {name: numpy.asarray(column)[keep] for name, column in telemetry.items()}
+    return {name: [value for value, kept in zip(column, keep) if kept] for name, column in telemetry.items()}
+
+
+def replay_in_parallel(filenames, sink, field_names=None, deduplicator=None, counters=None, workers=None,
+                       chunk_length=16 * 2 ** 20):
+    """
+    Same as replay, but with the captures split into chunks that a pool of worker processes decode at once. Chunks are
+    written to the sink in order, and checked for copies here, so the output is the same as from replay. That check
+    takes one to two microseconds per packet in this process however many workers there are, so with a deduplicator
+    the speedup stops growing at about 3 to 5 times one worker (benchmarks/benchmark_parallel_replay.py measures it).
+    # Input:
+    #   filenames, sink, field_names, deduplicator, counters: As for replay
+    #   workers [int]: Number of worker processes. Defaults to one per CPU.
+    #   chunk_length [int]: [bytes] About how much of a capture to give a worker at once, as for split_capture
+    # Output:
+    #   counters [Counter]: The same counters, for convenience
+    """
+    if counters is None:
+        counters = Counter()
+    workers = workers or os.cpu_count() or 1
+
+    def write_chunk(chunk, chunk_future):
+        chunk_result = chunk_future.result()
+        counters.update(chunk_result.counters)
+        telemetry = chunk_result.telemetry
+        if telemetry is None:
+            return
+        number_of_packets = len(next(iter(telemetry.values())))
+        if deduplicator is not None:
+            keep = deduplicator.check_keys(chunk_result.packet_keys, chunk.filename, counters)
+            number_of_packets = sum(keep)
+            if number_of_packets < len(keep):
+                telemetry = select_rows(telemetry, keep)
+        if number_of_packets:
+            sink.write(telemetry)
+            counters[DECODED_PACKETS] += number_of_packets
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending_chunks = deque()  # Enough to keep every worker busy, without holding every chunk's results at once
+        for filename in filenames:
+            for chunk in split_capture(filename, chunk_length):
+                pending_chunks.append((chunk, executor.submit(decode_chunk, chunk, field_names, deduplicator is not None)))
+                if len(pending_chunks) > 2 * workers:
+                    write_chunk(*pending_chunks.popleft())
+        while pending_chunks:
+            write_chunk(*pending_chunks.popleft())
+    return counters
+
+
+def get_rows(telemetry):
+    # A batch of columns, as from MinxssParser.parse_many, as rows of python values
+    return zip(*[column.tolist() if hasattr(column, 'tolist') else column for column in telemetry.values()])
+
+
+class CsvSink:
+    """
+    Writes each packet's telemetry as a row of a CSV file, with a header row of telemetry point names
+    """
+    def __init__(self, output_file):
+        self.writer = csv.writer(output_file)
+        self.wrote_header = False
+
+    def write(self, telemetry):
+        if not self.wrote_header:
+            self.writer.writerow(telemetry.keys())
+            self.wrote_header = True
+        self.writer.writerows(get_rows(telemetry))
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """
+    Writes each packet's telemetry as a JSON object on a line of its own, as minxss_decoder_cli prints them
+    """
+    def __init__(self, output_file):
+        self.output_file = output_file
+
+    def write(self, telemetry):
+        names = list(telemetry.keys())
+        self.output_file.writelines(json.dumps(dict(zip(names, row))) + '\n' for row in get_rows(telemetry))
+
+    def close(self):
+        pass
+
+
+class NpzSink:
+    """
+    Collects every batch and, on close, saves each telemetry point as a numpy array in a .npz file
+    """
+    def __init__(self, filename):
+        if numpy is None:
+            raise ImportError('Saving .npz files needs numpy to be installed.')
+        self.filename = filename
+        self.batches = []
+
+    def write(self, telemetry):
+        self.batches.append(telemetry)
+
+    def close(self):
+        if not self.batches:
+            return
+        numpy.savez(self.filename, **{name: numpy.concatenate([batch[name] for batch in self.batches])
+                                      for name in self.batches[0]})
+
+
+def open_sink(output_filename):
+    """
+    Returns a sink for replay, by the extension of output_filename (.csv, .jsonl, or .npz), and the file it writes
+    to, if any, for the caller to close. With no output_filename, JSON lines are written to stdout.
+    """
+    if output_filename is None:
+        return JsonLinesSink(sys.stdout), None
+    extension = os.path.splitext(output_filename)[1].lower()
+    if extension == '.npz':
+        return NpzSink(output_filename), None
+    if extension == '.csv':
+        output_file = open(output_filename, 'w', newline='')
+        return CsvSink(output_file), output_file
+    if extension in ('.jsonl', '.json'):
+        output_file = open(output_filename, 'w')
+        return JsonLinesSink(output_file), output_file
+    raise ValueError('Unknown output format {0}: use .csv, .jsonl, or .npz.'.format(output_filename))
+
+
+def get_capture_filenames(paths):
+    """
+    Returns the captures to replay, in order: each file as given, and the .dat files in each directory, sorted by name
+    (which the GUI starts with the time). A directory's .txt files are skipped, as the GUI saves the same packets in both.
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.dat'))
+        else:
+            filenames.append(path)
+    return filenames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('captures', nargs='+',
+                        help='Binary (.dat) or hex (.txt) captures to decode, in order, or directories of .dat captures')
+    parser.add_argument('--output', help='File to write the telemetry to: .csv, .jsonl, or .npz. Defaults to printing JSON lines.')
+    parser.add_argument('--all-fields', action='store_true', help='Decode every housekeeping telemetry point, not just the summary')
+    parser.add_argument('--duplicate-memory', type=int, default=1000000,
+                        help='Skip copies of any of the last this many packets, e.g., heard by several stations. 0 keeps them all.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Number of packets to decode at once')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes to decode with, each taking a chunk of a capture at a time. 0 uses one per CPU. '
+                             'Copies are still checked in the main process, which limits the speedup to about 3 to 5 times '
+                             'one process; add --duplicate-memory 0 if the captures cannot overlap.')
+    parser.add_argument('--chunk-size', type=float, default=16, help='[MB] About how much of a capture each process takes at a time')
+    args = parser.parse_args()
+
+    field_names = [field.name for field in housekeeping_fields] if args.all_fields else default_field_names
+    # Captures are replayed far faster than they were heard, so copies are remembered by number rather than by time
+    deduplicator = Deduplicator(float('inf'), args.duplicate_memory) if args.duplicate_memory > 0 else None
+    sink, output_file = open_sink(args.output)
+    captures = get_capture_filenames(args.captures)
+
+    start_time = time.perf_counter()
+    try:
+        if args.workers == 1:
+            counters = replay(captures, sink, field_names, deduplicator, batch_size=args.batch_size)
+        else:
+            counters = replay_in_parallel(captures, sink, field_names, deduplicator, workers=args.workers or None,
+                                          chunk_length=int(args.chunk_size * 2 ** 20))
+        sink.close()
+    finally:
+        if output_file:
+            output_file.close()
+    seconds = time.perf_counter() - start_time
+
+    print('Decoded {0} packets from {1} captures in {2:.2f} s ({3:.0f} packets/s). Link statistics: {4}'.format(
+        counters[DECODED_PACKETS], len(captures), seconds, counters[DECODED_PACKETS] / max(seconds, 1e-9),
+        dict(counters)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
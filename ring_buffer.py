@@ -0,0 +1,61 @@
+"""Fixed size buffer for bytes received from a serial port or socket"""
+
+
+class RingBuffer:
+    """
+    Preallocated buffer of received bytes between head (the oldest byte still needed) and tail (where the next byte goes).
+    Consuming bytes only moves head, and writing copies into the existing storage, so memory use never grows no matter
+    how many bytes pass through. When the free space at the end runs out, the bytes still needed are moved back to the
+    start, instead of wrapping around, so that they stay contiguous and a frame can be searched and sliced in one piece.
+    Input:
+        capacity [int]: The most bytes held at once
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.data = bytearray(capacity)
+        self.view = memoryview(self.data)
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def write(self, data):
+        """
+        Copy as much of data into the buffer as fits
+        # Input:
+        #   data [bytes-like]: The bytes to add
+        # Output:
+        #   number_of_bytes_written [int]: Which can be less than len(data) when the buffer is nearly full
+        """
+        number_of_bytes = len(data)
+        if number_of_bytes > self.capacity - self.tail:
+            if self.head > 0:
+                self.compact()
+            number_of_bytes = min(number_of_bytes, self.capacity - self.tail)
+            data = memoryview(data)[:number_of_bytes]
+        tail = self.tail
+        self.data[tail:tail + number_of_bytes] = data
+        self.tail = tail + number_of_bytes
+        return number_of_bytes
+
+    def consume(self, number_of_bytes):
+        """
+        Drop the oldest number_of_bytes from the buffer
+        """
+        self.head = min(self.head + number_of_bytes, self.tail)
+        if self.head == self.tail:  # Empty, so the next write can start from the beginning for free
+            self.head = self.tail = 0
+
+    def compact(self):
+        # Move the bytes still needed to the start of the storage, e.g., a partial frame waiting on its stop sync
+        number_of_bytes = len(self)
+        self.data[:number_of_bytes] = self.data[self.head:self.tail]  # Copies the slice first, as the two can overlap
+        self.head = 0
+        self.tail = number_of_bytes
+
+    def copy(self, start, end):
+        """
+        Returns a copy of the bytes from data[start:end], where start and end are indices into data
+        """
+        return bytearray(self.view[start:end])
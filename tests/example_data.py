@@ -1,3 +1,8 @@
+# A short log packet (APID 29) with a secondary header holding the spacecraft time, and the message "Hi"
+log_packet = bytearray([0x08, 0x1d, 0xc0, 0x01, 0x00, 0x0b]) + bytearray([0x10, 0x00, 0x00, 0x00, 0x20, 0x00]) + \
+             bytearray(b'Hi') + bytearray([0x00, 0x00, 0xa5, 0xa5])
+
+
 def get_example_data(sample_number):
     if sample_number == 0:
         if sample_number == 0:
@@ -0,0 +1,99 @@
+import asyncio
+from aggregation_server import read_station_config, AggregationServer, Station, StationFeed, DECODED_PACKETS
+from async_socket_source import AsyncSocketSource, AsyncSerialSource
+from ccsds import HOUSEKEEPING_APID
+from deduplicator import Deduplicator, UNIQUE_PACKETS, DUPLICATE_PACKETS
+from frame_extractor import FRAMED_PACKETS
+from test_send_tcpip_packets import serve_example_packets
+
+# As written by the GUI
+gui_config = """[input_properties]
+serial_port = 3
+baud_rate = 19200
+ip_address = localhost
+port = 10000
+decode_kiss = True
+forward_data = True
+callsign = SFJPM86
+latitude = 40.240
+longitude = -105.2353
+"""
+
+
+def test_read_station_config(tmpdir):
+    stations_file = tmpdir.join('stations.cfg')
+    stations_file.write(gui_config + "\n[fairbanks]\nserial_port = /dev/ttyUSB0\nbaud_rate = 9600\n"
+                                     "callsign = KL7AA\nlatitude = 64.84\nlongitude = -147.72\n")
+    (boulder, boulder_source), (fairbanks, fairbanks_source) = read_station_config(str(stations_file), read_timeout=60)
+
+    assert boulder == Station('SFJPM86', 40.24, -105.2353)
+    assert isinstance(boulder_source, AsyncSocketSource) and not isinstance(boulder_source, AsyncSerialSource)
+    assert (boulder_source.ip_address, boulder_source.port, boulder_source.decode_kiss) == ('localhost', 10000, True)
+    assert boulder_source.read_timeout == 60
+
+    assert fairbanks == Station('KL7AA', 64.84, -147.72)
+    assert isinstance(fairbanks_source, AsyncSerialSource)
+    assert (fairbanks_source.serial_port, fairbanks_source.baud_rate, fairbanks_source.decode_kiss) == ('/dev/ttyUSB0', 9600, False)
+
+
+def test_packets_are_tagged_by_station():
+    async def run():
+        servers = [await serve_example_packets(cadence=0) for _ in range(3)]
+        station_feeds = [StationFeed(Station('STATION{0}'.format(i), 40.0 + i, -105.0),
+                                     AsyncSocketSource('localhost', server.sockets[0].getsockname()[1]))
+                         for i, server in enumerate(servers)]
+        aggregation_server = AggregationServer(station_feeds)
+        received = []
+        aggregation_server.packet_demultiplexer.register(received.append, HOUSEKEEPING_APID)
+
+        running = asyncio.ensure_future(aggregation_server.run())
+        for _ in range(200):
+            if len(received) >= 18:  # Six of the seven examples are valid beacons without KISS decoding
+                break
+            await asyncio.sleep(0.01)
+        running.cancel()
+        for server in servers:
+            server.close()
+        await asyncio.sleep(0.05)  # Let the stations finish sending
+        return aggregation_server, received
+
+    aggregation_server, received = asyncio.run(run())
+    statistics = aggregation_server.get_statistics()
+    assert sorted(statistics) == ['STATION0', 'STATION1', 'STATION2']
+    for i in range(3):
+        callsign = 'STATION{0}'.format(i)
+        station_packets = [station_packet for station_packet in received if station_packet.station.callsign == callsign]
+        assert len(station_packets) > 0
+        assert all(station_packet.station.latitude == 40.0 + i for station_packet in station_packets)
+        assert station_packets[0].decoded_packet.decoded['SequenceCount'] == 9462  # The beacon in example 0
+        assert statistics[callsign][DECODED_PACKETS] == statistics[callsign][FRAMED_PACKETS] == len(station_packets)
+
+
+def test_beacons_heard_by_several_stations_are_passed_on_once():
+    async def run():
+        servers = [await serve_example_packets(cadence=0) for _ in range(2)]
+        deduplicator = Deduplicator()
+        station_feeds = [StationFeed(Station('STATION{0}'.format(i), 40.0, -105.0),
+                                     AsyncSocketSource('localhost', server.sockets[0].getsockname()[1], deduplicator=deduplicator))
+                         for i, server in enumerate(servers)]
+        aggregation_server = AggregationServer(station_feeds)
+        received = []
+        aggregation_server.packet_demultiplexer.register(received.append, HOUSEKEEPING_APID)
+
+        running = asyncio.ensure_future(aggregation_server.run())
+        for _ in range(200):
+            if all(source.counters[FRAMED_PACKETS] >= 6 for station, source in station_feeds):
+                break
+            await asyncio.sleep(0.01)
+        running.cancel()
+        for server in servers:
+            server.close()
+        await asyncio.sleep(0.05)
+        return aggregation_server, received
+
+    aggregation_server, received = asyncio.run(run())
+    assert len(received) == 6  # Each example beacon once, from whichever station heard it first
+    statistics = aggregation_server.get_statistics().values()
+    assert sum(counters.get(UNIQUE_PACKETS, 0) for counters in statistics) == 6
+    assert sum(counters.get(DUPLICATE_PACKETS, 0) for counters in statistics) == \
+        sum(counters[FRAMED_PACKETS] for counters in statistics) - 6
@@ -0,0 +1,127 @@
+import asyncio
+from example_data import get_example_data, log_packet
+from async_socket_source import AsyncSocketSource, read_feeds, RECONNECTS
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from frame_extractor import FRAMED_PACKETS
+
+
+def kiss_encode(packet):
+    escaped_packet = packet.replace(bytearray([0xdb]), bytearray([0xdb, 0xdd])).replace(bytearray([0xc0]), bytearray([0xdb, 0xdc]))
+    return bytearray([0xc0, 0x00]) + escaped_packet + bytearray([0xc0])
+
+
+async def serve(connections):
+    # A TNC that sends each connection's bytes, a few at a time, then hangs up
+    async def handle_connection(reader, writer):
+        data = connections.pop(0) if connections else b''
+        for chunk_start in range(0, len(data), 50):
+            writer.write(data[chunk_start:chunk_start + 50])
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+
+
+async def read_until(source, number_of_packets):
+    decoded_packets = []
+    async for decoded_packet in source.read_packets():
+        decoded_packets.append(decoded_packet)
+        if len(decoded_packets) == number_of_packets:
+            break
+    source.close()
+    return decoded_packets
+
+
+def test_kiss_feed_reconnects():
+    async def run():
+        # The first connection drops part way through a beacon, which is dropped rather than finished by the next one
+        connections = [kiss_encode(get_example_data(1)) + kiss_encode(log_packet) + kiss_encode(get_example_data(2))[:100],
+                       kiss_encode(get_example_data(2))]
+        server = await serve(connections)
+        source = AsyncSocketSource('127.0.0.1', server.sockets[0].getsockname()[1], decode_kiss=True, initial_backoff=0.01)
+        decoded_packets = await asyncio.wait_for(read_until(source, 3), 10)
+        server.close()
+        return source, decoded_packets
+
+    source, decoded_packets = asyncio.run(run())
+    assert [decoded_packet.apid for decoded_packet in decoded_packets] == [HOUSEKEEPING_APID, LOG_APID, HOUSEKEEPING_APID]
+    assert [decoded_packet.frame for decoded_packet in decoded_packets] == [get_example_data(1), log_packet, get_example_data(2)]
+    assert decoded_packets[2].decoded['SequenceCount'] == 15761
+    assert source.counters[RECONNECTS] == 1
+    assert source.counters[FRAMED_PACKETS] == 3
+
+
+def test_connect_retries_until_the_server_is_up():
+    async def run():
+        server = await serve([])
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+
+        source = AsyncSocketSource('127.0.0.1', port, initial_backoff=0.05)
+        reading = asyncio.ensure_future(read_until(source, 1))
+        await asyncio.sleep(0.2)  # A few failed attempts
+        server = await asyncio.start_server(lambda reader, writer: writer.write(get_example_data(1)), '127.0.0.1', port)
+        decoded_packets = await asyncio.wait_for(reading, 10)
+        server.close()
+        return decoded_packets
+
+    decoded_packets = asyncio.run(run())
+    assert decoded_packets[0].frame == get_example_data(1)
+
+
+def test_read_timeout_reconnects():
+    async def run():
+        async def handle_connection(reader, writer):
+            await reader.read()  # Connected, but silent until the source hangs up
+
+        server = await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+        source = AsyncSocketSource('127.0.0.1', server.sockets[0].getsockname()[1], read_timeout=0.05, initial_backoff=0.01)
+        reading = asyncio.ensure_future(read_until(source, 1))
+        await asyncio.sleep(0.3)
+        reading.cancel()
+        server.close()
+        return source
+
+    source = asyncio.run(run())
+    assert source.counters[RECONNECTS] >= 2
+    assert source.writer is None
+
+
+def test_read_feeds_on_one_loop():
+    async def run():
+        servers = [await serve([get_example_data(1) + get_example_data(2)]), await serve([kiss_encode(log_packet)])]
+        sources = [AsyncSocketSource('127.0.0.1', servers[0].sockets[0].getsockname()[1]),
+                   AsyncSocketSource('127.0.0.1', servers[1].sockets[0].getsockname()[1], decode_kiss=True)]
+        received = []
+
+        def handle_packet(source, decoded_packet):
+            received.append((sources.index(source), decoded_packet.apid))
+
+        reading = asyncio.ensure_future(read_feeds(sources, handle_packet))
+        for _ in range(100):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.02)
+        reading.cancel()
+        for server in servers:
+            server.close()
+        return received
+
+    assert sorted(asyncio.run(run())) == [(0, HOUSEKEEPING_APID), (0, HOUSEKEEPING_APID), (1, LOG_APID)]
+
+
+def test_backoff_when_the_server_hangs_up_at_once():
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+        source = AsyncSocketSource('127.0.0.1', server.sockets[0].getsockname()[1], initial_backoff=0.05)
+        reading = asyncio.ensure_future(read_until(source, 1))
+        await asyncio.sleep(0.5)
+        reading.cancel()
+        server.close()
+        return source
+
+    source = asyncio.run(run())
+    # Waits of 0.05, 0.1, and 0.2 s fit in the half second, rather than thousands of reconnects
+    assert 2 <= source.counters[RECONNECTS] <= 4
+    assert source.backoff >= 0.4
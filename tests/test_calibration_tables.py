@@ -0,0 +1,51 @@
+import math
+import numpy as np
+from calibration_tables import CalibrationTable
+from minxss_parser import CompiledTelemetryFields, TelemetryField, calibrate_battery_voltage, calibrate_sps_angle
+
+
+def thermistor_temperature(raw):
+    # A made up non-linear curve, shaped like a thermistor's
+    resistance = 10e3 * (raw + 1) / 65537.0
+    return 1.0 / (1.129e-3 + 2.341e-4 * math.log(resistance) + 8.775e-8 * math.log(resistance) ** 3) - 273.15
+
+
+def test_table_matches_calibration():
+    for raw in [0, 1, 12345, 65535]:
+        assert calibrate_battery_voltage.get_lookup()(raw) == raw / 6415.0
+    for raw in [-32768, -1, 0, 1, 32767]:
+        assert calibrate_sps_angle.get_lookup(signed=True)(raw) == raw / 1e4 * 3.0
+
+
+def test_table_is_built_lazily():
+    table = CalibrationTable(lambda raw: raw * 2.0)
+    assert table.tables == {}
+    assert table(3) == 6.0  # Calling it directly doesn't need the table
+    assert table.tables == {}
+
+    assert table.get_lookup()(3) == 6.0
+    assert len(table.tables[False]) == 65536
+    assert table.get_lookup().__self__ is table.tables[False]  # Cached
+
+
+def test_column_lookup_matches_single_lookup():
+    for table, signed, dtype in [(CalibrationTable(thermistor_temperature), False, '<u2'),
+                                 (CalibrationTable(thermistor_temperature), False, '>u2'),
+                                 (CalibrationTable(lambda raw: math.atan(raw / 1e4)), True, '<i2')]:
+        column = np.arange(-32768 if signed else 0, 32768 if signed else 65536, 7).astype(dtype)
+        calibrated = table.get_column_lookup(signed)(column)
+        lookup = table.get_lookup(signed)
+        assert [value.hex() for value in calibrated.tolist()] == [lookup(raw).hex() for raw in column.tolist()]
+
+
+def test_non_linear_calibration_in_telemetry_fields():
+    fields = [TelemetryField('Thermistor', 160, 2, False, None, 0, CalibrationTable(thermistor_temperature), 'deg C')]
+    compiled_fields = CompiledTelemetryFields(fields)
+    packets = bytearray(range(256)) * 2
+    packets = packets[:2 * compiled_fields.packet_length]
+
+    expected = [thermistor_temperature(int.from_bytes(packets[offset + 160:offset + 162], 'little'))
+                for offset in [0, compiled_fields.packet_length]]
+    assert [compiled_fields.decode(packets, offset)['Thermistor'] for offset in [0, compiled_fields.packet_length]] == expected
+    assert list(compiled_fields.decode_many(packets)['Thermistor']) == expected
+    assert compiled_fields.decode_many(packets, 'python')['Thermistor'] == expected
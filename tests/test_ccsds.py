@@ -0,0 +1,21 @@
+from example_data import get_example_data
+from ccsds import parse_ccsds_header, CcsdsHeader, HOUSEKEEPING_APID, LOG_APID, MINIMUM_PACKET_LENGTH
+
+
+def test_parse_housekeeping_header():
+    header = parse_ccsds_header(get_example_data(1))
+    assert header == (0, 0, 1, HOUSEKEEPING_APID, 3, 15707, 247)
+    assert header.packet_length == 254
+    assert header.has_expected_length()
+
+    # In place after the KISS and AX.25 headers
+    assert parse_ccsds_header(memoryview(get_example_data(4)), 18) == (0, 0, 1, HOUSEKEEPING_APID, 3, 367, 247)
+
+def test_packet_lengths_by_apid():
+    assert not CcsdsHeader(0, 0, 1, HOUSEKEEPING_APID, 3, 0, 200).has_expected_length()
+    assert CcsdsHeader(0, 0, 1, LOG_APID, 3, 0, 200).has_expected_length()  # Log packets can be any length
+    assert CcsdsHeader(0, 0, 1, LOG_APID, 3, 0, 200).packet_length == 207
+    # But not shorter than a header, spacecraft time, checksum, and stop sync, e.g., a sync in noise that ends in a5 a5
+    assert CcsdsHeader(0, 0, 1, LOG_APID, 3, 0, MINIMUM_PACKET_LENGTH - 7).has_expected_length()
+    assert not CcsdsHeader(0, 0, 1, LOG_APID, 3, 0, MINIMUM_PACKET_LENGTH - 8).has_expected_length()
+    assert not CcsdsHeader(0, 0, 1, 3, 3, 0, 1).has_expected_length()
@@ -1,4 +1,7 @@
+import socket
+from example_data import get_example_data
 from connect_port_get_packet import ConnectSocket
+import pipeline
 
 
 class TestPort:
@@ -22,3 +25,40 @@ class TestPort:
     def can_read_packet(self):
         packet = self.connected_port.read_packet()
         assert len(packet) == 272
+
+
+def test_socket_reads_in_bulk():
+    sending_socket, receiving_socket = socket.socketpair()
+    connect_socket = ConnectSocket('localhost', '10006', receive_buffer_size=300)
+    connect_socket.client_socket = receiving_socket
+    try:
+        sending_socket.sendall(get_example_data(1) + get_example_data(4) + get_example_data(2))
+        assert connect_socket.read_packet() == get_example_data(1)
+        assert connect_socket.read_packet() == get_example_data(4)
+        assert connect_socket.read_packet() == get_example_data(2)
+    finally:
+        sending_socket.close()
+        receiving_socket.close()
+
+
+def test_socket_closed_by_the_other_end():
+    sending_socket, receiving_socket = socket.socketpair()
+    connect_socket = ConnectSocket('localhost', '10006')
+    connect_socket.client_socket = receiving_socket
+    get_data_from_buffer = connect_socket.get_data_from_buffer
+
+    def get_data_from_buffer_a_few_times():  # Rather than spin forever if the end of the stream is missed
+        get_data_from_buffer_a_few_times.reads += 1
+        assert get_data_from_buffer_a_few_times.reads < 10, 'Still reading after the other end closed'
+        return get_data_from_buffer()
+    get_data_from_buffer_a_few_times.reads = 0
+    connect_socket.get_data_from_buffer = get_data_from_buffer_a_few_times
+    try:
+        sending_socket.sendall(get_example_data(1))
+        sending_socket.close()
+        assert connect_socket.read_packet() == get_example_data(1)
+        assert connect_socket.read_any_packet() is None
+        assert connect_socket.port_readable is False
+        assert list(pipeline.read_port(connect_socket)) == []
+    finally:
+        receiving_socket.close()
@@ -0,0 +1,85 @@
+import random
+from decode_backends import PythonDecodeBackend, NumpyDecodeBackend, get_decode_backend
+from minxss_parser import beacon_fields, compiled_housekeeping_fields
+
+python_backend = PythonDecodeBackend()
+numpy_backend = NumpyDecodeBackend()
+
+
+def build_random_packets(number_of_packets, seed=0):
+    rng = random.Random(seed)
+    packets = bytearray(rng.getrandbits(8) for _ in range(number_of_packets * beacon_fields.packet_length))
+    for packet_start in range(0, len(packets), beacon_fields.packet_length):
+        packets[packet_start:packet_start + 2] = bytearray([0x08, 0x19])
+        packets[packet_start + 252:packet_start + 254] = bytearray([0xa5, 0xa5])
+    return packets
+
+
+def same_bits(value1, value2):
+    # Every raw value fits exactly in a float, so comparing the floats' bits covers ints and calibrated values alike
+    return float(value1).hex() == float(value2).hex()
+
+
+def test_get_decode_backend():
+    assert isinstance(get_decode_backend('python'), PythonDecodeBackend)
+    assert isinstance(get_decode_backend('numpy'), NumpyDecodeBackend)
+    assert get_decode_backend(numpy_backend) is numpy_backend
+
+
+def test_decode_bytes_backends_agree():
+    rng = random.Random(1)
+    for _ in range(5000):
+        number_of_bytes = rng.choice([1, 2, 4])
+        raw_bytes = bytearray(rng.getrandbits(8) for _ in range(number_of_bytes))
+        for signed in [True, False]:
+            python_value = python_backend.decode_bytes(raw_bytes, signed)
+            numpy_value = numpy_backend.decode_bytes(raw_bytes, signed)
+            assert python_value == numpy_value, (raw_bytes, signed)
+
+
+def test_decode_bytes_full_width():
+    assert python_backend.decode_bytes(bytearray([0x07, 0x01, 0x00, 0x80]), signed=False) == 0x80000107
+    assert python_backend.decode_bytes(bytearray([0xff, 0xff, 0xff, 0xff])) == -1
+
+
+def test_single_packet_backends_agree():
+    packets = build_random_packets(500)
+    for offset in range(0, len(packets), beacon_fields.packet_length):
+        python_values = beacon_fields.decode_raw(packets, offset, python_backend)
+        numpy_values = beacon_fields.decode_raw(packets, offset, numpy_backend)
+        assert all(same_bits(value1, value2) for value1, value2 in zip(python_values, numpy_values))
+
+
+def test_many_packet_backends_agree():
+    packets = build_random_packets(2000, seed=2)
+    python_columns = beacon_fields.decode_many(packets, python_backend)
+    numpy_columns = beacon_fields.decode_many(packets, numpy_backend)
+
+    for name in beacon_fields.names:
+        assert len(python_columns[name]) == len(numpy_columns[name]) == 2000
+        assert all(same_bits(value1, value2) for value1, value2 in zip(python_columns[name], numpy_columns[name])), name
+
+    # And batches agree with decoding one packet at a time
+    for packet_number in range(0, 2000, 97):
+        telemetry = beacon_fields.decode(packets, packet_number * beacon_fields.packet_length)
+        for name in beacon_fields.names:
+            assert same_bits(telemetry[name], numpy_columns[name][packet_number]), name
+
+
+def test_housekeeping_backends_agree():
+    packets = build_random_packets(200, seed=3)
+    numpy_columns = compiled_housekeeping_fields.decode_many(packets, numpy_backend)
+    python_columns = compiled_housekeeping_fields.decode_many(packets, python_backend)
+    for packet_number in range(200):
+        offset = packet_number * compiled_housekeeping_fields.packet_length
+        python_values = compiled_housekeeping_fields.decode_raw(packets, offset, python_backend)
+        numpy_values = compiled_housekeeping_fields.decode_raw(packets, offset, numpy_backend)
+        assert all(same_bits(value1, value2) for value1, value2 in zip(python_values, numpy_values))
+        for name, value in zip(compiled_housekeeping_fields.names, python_values):
+            assert same_bits(value, python_columns[name][packet_number]), name
+            assert same_bits(value, numpy_columns[name][packet_number]), name
+
+
+def test_many_packet_backends_with_no_packets():
+    assert beacon_fields.decode_many(bytearray(), python_backend)['Xp'] == []
+    assert len(beacon_fields.decode_many(bytearray(), numpy_backend)['Xp']) == 0
@@ -0,0 +1,69 @@
+from collections import Counter
+from example_data import get_example_data
+from deduplicator import Deduplicator, get_packet_key, UNIQUE_PACKETS, DUPLICATE_PACKETS
+import pipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_copies_match_however_they_were_framed():
+    beacon = get_example_data(1)
+    sync_start_index = beacon.find(bytearray([0x08, 0x19]))
+    assert get_packet_key(beacon) == get_packet_key(bytearray([0xc0, 0x00]) + beacon[sync_start_index:])
+    assert get_packet_key(beacon) != get_packet_key(get_example_data(2))
+
+
+def test_duplicates_are_counted_with_who_heard_them_first():
+    station_counters = {'boulder': Counter(), 'fairbanks': Counter()}
+    deduplicator = Deduplicator()
+    assert deduplicator.check(get_example_data(1), 'boulder', station_counters['boulder']) is None
+    assert deduplicator.check(get_example_data(2), 'fairbanks', station_counters['fairbanks']) is None
+    heard_packet = deduplicator.check(get_example_data(1), 'fairbanks', station_counters['fairbanks'])
+    assert heard_packet.first_heard_by == 'boulder'
+    assert heard_packet.copies == 1
+
+    assert deduplicator.counters == Counter({UNIQUE_PACKETS: 2, DUPLICATE_PACKETS: 1})
+    assert station_counters['boulder'] == Counter({UNIQUE_PACKETS: 1})
+    assert station_counters['fairbanks'] == Counter({UNIQUE_PACKETS: 1, DUPLICATE_PACKETS: 1})
+
+
+def test_index_is_bounded_by_time_and_size():
+    clock = FakeClock()
+    deduplicator = Deduplicator(window=60, maximum_packets=2, clock=clock)
+    deduplicator.check(get_example_data(1))
+    clock.time = 30
+    assert deduplicator.check(get_example_data(1)) is not None
+    clock.time = 61
+    assert deduplicator.check(get_example_data(1)) is None  # Heard again after the window, so it counts as new
+    assert len(deduplicator.heard_packets) == 1
+
+    deduplicator.check(get_example_data(2))
+    deduplicator.check(get_example_data(3))
+    assert len(deduplicator.heard_packets) == 2
+    assert deduplicator.check(get_example_data(1)) is None  # The oldest was dropped to make room
+
+
+def test_replayed_buffer_is_parsed_once():
+    stream = get_example_data(1) + get_example_data(2) + get_example_data(1) + get_example_data(2)
+    counters = Counter()
+    decoded_packets = list(pipeline.build_pipeline([stream], counters=counters, deduplicator=Deduplicator()))
+    assert [decoded_packet.decoded['SequenceCount'] for decoded_packet in decoded_packets] == [15707, 15761]
+    assert counters[UNIQUE_PACKETS] == 2
+    assert counters[DUPLICATE_PACKETS] == 2
+
+
+def test_check_a_batch_of_keys():
+    deduplicator = Deduplicator(maximum_packets=3)
+    counters = Counter()
+    assert deduplicator.check_keys([1, 2, 1, 3], 'boulder', counters) == [True, True, False, True]
+    assert deduplicator.check_keys([4, 2], 'fairbanks') == [True, False]
+    assert len(deduplicator.heard_packets) == 3
+    assert deduplicator.heard_packets[2].first_heard_by == 'boulder'
+    assert counters == Counter({UNIQUE_PACKETS: 3, DUPLICATE_PACKETS: 1})
+    assert deduplicator.counters == Counter({UNIQUE_PACKETS: 4, DUPLICATE_PACKETS: 2})
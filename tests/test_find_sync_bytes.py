@@ -0,0 +1,34 @@
+from find_sync_bytes import FindSyncBytes, LOG_SYNC_START, SYNC_START
+
+fsb = FindSyncBytes()
+packets = bytearray([0x00, 0x08, 0x19, 0xa5, 0xa5, 0x08, 0x1D, 0x08, 0x19, 0xa5, 0xa5])
+
+
+def test_find_sync_bytes():
+    assert fsb.find_sync_start_index(packets) == 1
+    assert fsb.find_sync_stop_index(packets) == 3
+    assert fsb.find_log_sync_start_index(packets) == 5
+
+
+def test_find_sync_bytes_from_offset():
+    assert fsb.find_sync_start_index(packets, 2) == 7
+    assert fsb.find_sync_stop_index(packets, 4) == 9
+    assert fsb.find_sync_stop_index(packets, 4, 10) == -1
+
+
+def test_find_sync_bytes_in_memoryview():
+    packets_view = memoryview(packets)[1:]
+    assert fsb.find_sync_start_index(packets_view) == 0
+    assert fsb.find_sync_start_index(packets_view, 1) == 6
+    assert fsb.find_log_sync_start_index(packets_view) == 4
+    assert fsb.find_sync_stop_index(packets_view, 0, 3) == -1
+
+
+def test_find_sync_bytes_in_list():
+    assert fsb.find_sync_start_index(list(packets)) == 1
+
+
+def test_find_packet_start():
+    assert fsb.find_packet_start(packets) == (1, SYNC_START)
+    assert fsb.find_packet_start(memoryview(packets), 2) == (5, LOG_SYNC_START)
+    assert fsb.find_packet_start(packets, 8) is None
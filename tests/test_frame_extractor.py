@@ -0,0 +1,141 @@
+from collections import Counter
+from example_data import get_example_data, log_packet
+from frame_extractor import FrameExtractor, FRAMED_PACKETS, DISCARDED_BYTES, FALSE_SYNCS, ABORTED_FRAMES
+from connect_port_get_packet import PacketReader, KissFrame, KISS_DATA_FRAME, get_kiss_packets
+from deduplicator import get_packet_key
+from minxss_parser import MinxssParser
+import pipeline
+
+
+def feed_in_chunks(data, chunk_size):
+    frame_extractor = FrameExtractor()
+    frames = []
+    for chunk_start in range(0, len(data), chunk_size):
+        frames.extend(frame_extractor.feed(data[chunk_start:chunk_start + chunk_size]))
+    return frames
+
+
+def test_frames_keep_headers():
+    frames = feed_in_chunks(get_example_data(4), 1)
+    assert frames == [get_example_data(4)]
+    assert len(frames[0]) == 272
+
+
+def test_frames_do_not_depend_on_chunk_size():
+    stream = bytearray()
+    for sample_number in range(7):
+        stream += get_example_data(sample_number)
+
+    frames = feed_in_chunks(stream, 1)
+    # Sample 5 is still KISS escaped, so its stop sync isn't where its header says and it's dropped. That leaves too
+    # much ahead of sample 6 to be its header, so its frame starts at its start sync.
+    assert [len(frame) for frame in frames] == [254, 255, 254, 254, 272, 254]
+    for chunk_size in [2, 3, 253, 254, 255, 4096, len(stream)]:
+        assert feed_in_chunks(stream, chunk_size) == frames
+
+
+def test_stop_sync_split_across_chunks():
+    sample = get_example_data(1)
+    frame_extractor = FrameExtractor()
+    assert frame_extractor.feed(sample[:253]) == []
+    assert frame_extractor.feed(sample[253:]) == [sample]
+
+
+def test_log_packets_are_dropped():
+    stream = log_packet + get_example_data(1) + log_packet + log_packet + get_example_data(2)
+    assert feed_in_chunks(stream, 1) == [get_example_data(1), get_example_data(2)]
+
+
+def test_stop_sync_in_data_does_not_end_the_packet():
+    sample = get_example_data(1)
+    sample[100:102] = bytearray([0xa5, 0xa5])
+    assert feed_in_chunks(sample, 7) == [sample]
+
+
+def test_buffer_stays_bounded_without_stop_sync():
+    frame_extractor = FrameExtractor()
+    for _ in range(1000):
+        assert frame_extractor.feed(bytearray(range(0x10, 0x90))) == []
+    assert len(frame_extractor.ring_buffer) <= frame_extractor.maximum_frame_length
+
+    frame_extractor.feed(get_example_data(1))
+    assert len(frame_extractor.ring_buffer) == 0
+
+
+def test_chunks_bigger_than_the_buffer():
+    stream = bytearray(range(0x10, 0x90)) * 10
+    for sample_number in [1, 4, 2]:
+        stream += get_example_data(sample_number)
+    frames = FrameExtractor(buffer_capacity=600).feed(stream)
+    assert frames[0].endswith(get_example_data(1))  # After whatever junk was kept in case it started a sync
+    assert frames[1:] == [get_example_data(4), get_example_data(2)]
+
+
+def test_read_packet_after_log_packet():
+    class ListPacketReader(PacketReader):
+        def __init__(self, chunks):
+            super(ListPacketReader, self).__init__()
+            self.chunks = chunks
+
+        def get_data_from_buffer(self):
+            return self.chunks.pop(0)
+
+    reader = ListPacketReader([log_packet, get_example_data(1) + get_example_data(2)])
+    assert reader.read_packet() == get_example_data(1)
+    assert reader.read_packet() == get_example_data(2)
+
+
+def test_counters_account_for_every_byte():
+    junk = bytearray(range(0x10, 0x90)) * 5
+    false_sync = bytearray([0x08, 0x19, 0xc0, 0x00, 0x01, 0x00])  # Packet length field far too long
+    truncated = get_example_data(2)[:200]  # Header is fine, but the stop sync never comes
+    stream = junk + false_sync + get_example_data(1) + truncated + log_packet + junk + get_example_data(3)
+
+    frame_extractor = FrameExtractor()
+    packets = frame_extractor.feed_packets(stream)
+    assert [len(frame) for apid, frame in packets][-1] == 254
+    assert frame_extractor.counters[FRAMED_PACKETS] == len(packets) == 3
+    assert frame_extractor.counters[FALSE_SYNCS] == 1
+    assert frame_extractor.counters[ABORTED_FRAMES] == 1
+    assert sum(len(frame) for apid, frame in packets) + frame_extractor.counters[DISCARDED_BYTES] + \
+        len(frame_extractor.ring_buffer) == len(stream)
+
+
+def test_runt_packets_are_false_syncs():
+    runt = bytearray([0x08, 0x1d, 0xc0, 0x01, 0x00, 0x01, 0xa5, 0xa5])  # Noise with a log sync and a stop sync 8 bytes apart
+    frame_extractor = FrameExtractor()
+    assert frame_extractor.feed(runt + get_example_data(1)) == [get_example_data(1)]
+    assert frame_extractor.counters[FALSE_SYNCS] == 1
+    assert frame_extractor.counters[FRAMED_PACKETS] == 1
+
+    counters = Counter()
+    assert list(get_kiss_packets([KissFrame(0, KISS_DATA_FRAME, runt)], counters)) == []
+    assert counters[FALSE_SYNCS] == 1
+    assert counters[DISCARDED_BYTES] == len(runt)
+
+
+def test_truncated_beacon_followed_by_a_good_one():
+    # The packet validated here must be the one the parser and the deduplicator find: the first sync in the frame
+    good_beacon = get_example_data(2)
+    for lost_bytes in [get_example_data(1)[:150],  # Cut short by RF loss
+                       bytearray([0x10, 0x20, 0x08, 0x19, 0xff, 0xff, 0x30])]:  # A false sync in junk
+        frames = feed_in_chunks(lost_bytes + good_beacon, 7)
+        kiss_frames = [KissFrame(0, KISS_DATA_FRAME, lost_bytes + good_beacon)]
+        for frame in frames + [frame for apid, frame in get_kiss_packets(kiss_frames, Counter())]:
+            assert frame == good_beacon
+            assert MinxssParser(frame).parse_packet(['SequenceCount'])['SequenceCount'] == 15761
+            assert get_packet_key(frame) == get_packet_key(good_beacon)
+
+
+def test_lost_bytes_are_counted_as_lost_on_the_link():
+    # Framed packets are exactly the good beacons, so the parser rejects none and losses all show up as RF losses
+    truncated = get_example_data(1)[:150]
+    stream = truncated + get_example_data(2) + get_example_data(3)
+    counters = Counter()
+    parser_counters = Counter()
+    for decoded_packet in pipeline.parse_packets(pipeline.extract_frames([stream[:100], stream[100:]], counters)):
+        parser_counters[decoded_packet.decoded is not None] += 1
+    assert counters[FRAMED_PACKETS] == parser_counters[True] == 2
+    assert parser_counters[False] == 0
+    assert counters[DISCARDED_BYTES] == len(truncated)
+    assert counters[ABORTED_FRAMES] == 1
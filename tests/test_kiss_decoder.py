@@ -0,0 +1,38 @@
+from example_data import get_example_data, log_packet
+from connect_port_get_packet import KissDecoder, KISS_DATA_FRAME, PacketReader
+
+
+def test_unescape_in_one_pass():
+    # FESC TFESC is an escaped FESC, so the TFEND after it is just data
+    assert KissDecoder.unescape(bytearray([0x01, 0xdb, 0xdd, 0xdc, 0xdb, 0xdc, 0x02])) == bytearray([0x01, 0xdb, 0xdc, 0xc0, 0x02])
+    assert KissDecoder.unescape(bytearray([0x01, 0x02])) == bytearray([0x01, 0x02])
+
+
+def test_frames_split_on_frame_end():
+    kiss_decoder = KissDecoder()
+    assert kiss_decoder.feed(bytearray([0xc0, 0x00, 0x01, 0xdb])) == []
+    kiss_frames = kiss_decoder.feed(bytearray([0xdc, 0xc0, 0xc0, 0x21, 0x02, 0xc0]))
+    assert kiss_frames == [(0, KISS_DATA_FRAME, bytearray([0x01, 0xc0])), (2, 1, bytearray([0x02]))]
+
+
+def test_frames_too_long_are_dropped():
+    kiss_decoder = KissDecoder(maximum_frame_length=10)
+    assert kiss_decoder.feed(bytearray([0xc0]) + bytearray(20) + bytearray([0xc0, 0x00, 0x01, 0xc0])) == [(0, 0, bytearray([0x01]))]
+
+
+def test_read_packet_decodes_kiss():
+    class ListPacketReader(PacketReader):
+        def __init__(self, chunks):
+            super(ListPacketReader, self).__init__(decode_kiss=True)
+            self.chunks = chunks
+
+        def get_data_from_buffer(self):
+            return self.chunks.pop(0)
+
+    escaped_log_packet = log_packet.replace(bytearray([0xc0]), bytearray([0xdb, 0xdc]))
+    stream = get_example_data(5)  # Ends in FEND and holds a FESC, so the beacon can't be framed by sync bytes alone
+    stream += bytearray([0x00]) + escaped_log_packet + bytearray([0xc0, 0xc0, 0x00]) + get_example_data(1) + bytearray([0xc0])
+
+    reader = ListPacketReader([stream[:100], stream[100:]])
+    assert reader.read_packet() == KissDecoder.unescape(get_example_data(5)[2:-1])
+    assert reader.read_packet() == get_example_data(1)
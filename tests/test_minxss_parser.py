@@ -1,4 +1,9 @@
-from minxss_parser import MinxssParser
+import pytest
+import tracemalloc
+from minxss_parser import MinxssParser, CompiledTelemetryFields, TelemetryField, Telemetry, not_decoded, housekeeping_fields
+from minxss_parser import DeltaDecoder
+from minxss_parser import VALID_PACKET, NO_START_SYNC, NO_STOP_SYNC, WRONG_PACKET_LENGTH
+from logger import Logger, PACKET_LOG_LEVEL
 from example_data import get_example_data
 from find_sync_bytes import FindSyncBytes
 from numpy.testing import assert_approx_equal
@@ -83,3 +88,242 @@ def test_shift_packet_to_sync_start():
 def test_decode_bytes():
     assert minxss_parser.decode_bytes(bytearray([0xFF, 0xDC])) == -8961
     assert minxss_parser.decode_bytes(bytearray([0xFF, 0xDC]), return_unsigned_int=True) == 56575
+
+
+def test_parse_many_matches_parse_packet():
+    fsb = FindSyncBytes()
+    aligned_packets = bytearray()
+    expected_telemetry = []
+    for sample_number in [1, 2, 3, 4, 6]:
+        sample = get_example_data(sample_number)
+        sync_start_index = fsb.find_sync_start_index(sample)
+        aligned_packets += sample[sync_start_index:sync_start_index + 254]
+        expected_telemetry.append(MinxssParser(sample).parse_packet())
+
+    telemetry = MinxssParser.parse_many(aligned_packets)
+
+    assert telemetry.keys() == expected_telemetry[0].keys()
+    for key in telemetry:
+        assert len(telemetry[key]) == len(expected_telemetry)
+        for packet_index, expected in enumerate(expected_telemetry):
+            assert telemetry[key][packet_index] == expected[key], key
+
+
+def test_parse_many_rejects_unaligned_buffer():
+    with pytest.raises(ValueError):
+        MinxssParser.parse_many(get_example_data(1)[1:])
+
+
+def test_compiled_telemetry_fields():
+    fields = [TelemetryField('StartSync', 0, 2, False, None, 0, None, 'Unitless'),
+              TelemetryField('ModeBit', 12, 1, False, 0x04, 2, None, 'Boolean'),
+              TelemetryField('Mode', 12, 1, False, 0x07, 0, lambda raw: raw * 10, 'Unitless')]
+    compiled_fields = CompiledTelemetryFields(fields)
+
+    assert compiled_fields.struct.size == 13
+    assert compiled_fields.decode(get_example_data(1)) == {'StartSync': 0x1908, 'ModeBit': 1, 'Mode': 40}
+
+    overlapping_fields = fields + [TelemetryField('Overlap', 1, 2, False, None, 0, None, 'Unitless')]
+    with pytest.raises(ValueError):
+        CompiledTelemetryFields(overlapping_fields)
+
+
+def test_parse_packet_from_memoryview():
+    sample = get_example_data(4)
+    assert MinxssParser(memoryview(sample)).parse_packet() == MinxssParser(sample).parse_packet()
+
+
+def test_parse_packet_does_not_copy_buffer():
+    # Bury the packet behind a lot of junk so that any copy of the buffer stands out from the decode itself
+    junk_length = 1000000
+    buffer_with_junk = bytearray(junk_length) + get_example_data(1)
+    parser = MinxssParser(buffer_with_junk)
+    parser.parse_packet()  # Warm up any lazily created objects
+
+    tracemalloc.start()
+    memory_before_parse = tracemalloc.get_traced_memory()[0]
+    telemetry = parser.parse_packet()
+    peak_memory_during_parse = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert telemetry['CommandAcceptCount'] == 2691
+    assert peak_memory_during_parse - memory_before_parse < junk_length / 10
+
+
+def test_telemetry_record_decodes_lazily():
+    sample = get_example_data(4)
+    expected_telemetry = MinxssParser(sample).parse_packet()
+    telemetry = MinxssParser(sample).parse_telemetry()
+
+    assert isinstance(telemetry, Telemetry)
+    assert all(value is not_decoded for value in telemetry.values)
+
+    assert telemetry['BatteryVoltage'] == expected_telemetry['BatteryVoltage']
+    assert sum(value is not not_decoded for value in telemetry.values) == 1
+
+    solar_panel_power = expected_telemetry['SolarPanelPlusXVoltage'] * expected_telemetry['SolarPanelPlusXCurrent'] / 1e3
+    assert telemetry['SolarPanelPlusXPower'] == solar_panel_power
+    assert sum(value is not not_decoded for value in telemetry.values) == 4
+
+    all_telemetry = telemetry.to_dict()
+    assert {name: all_telemetry[name] for name in expected_telemetry} == expected_telemetry
+    assert len(telemetry) == len(housekeeping_fields)
+    assert len(all_telemetry) == len(housekeeping_fields) + len(telemetry.compiled_fields.derived)
+    assert all_telemetry['SolarPanelPlusXPower'] == solar_panel_power
+    assert 'SolarPanelPlusXPower' in telemetry
+
+
+def test_telemetry_record_has_no_instance_dict():
+    telemetry = MinxssParser(get_example_data(1)).parse_telemetry()
+    assert not hasattr(telemetry, '__dict__')
+
+
+def test_invalid_packet_has_no_telemetry_record():
+    assert MinxssParser(get_example_data(1)[1:]).parse_telemetry() is None
+
+
+def test_validation_status_and_counters():
+    sample = get_example_data(1)
+    counters_before = MinxssParser.counters.copy()
+
+    for packet, expected_status in [(sample, VALID_PACKET), (sample[1:], NO_START_SYNC), (sample[:-2], NO_STOP_SYNC),
+                                    (sample[0:20] + sample[22:], WRONG_PACKET_LENGTH)]:
+        parser = MinxssParser(packet)
+        parser.parse_packet()
+        assert parser.status == expected_status
+
+    counts = MinxssParser.counters - counters_before
+    assert counts == {VALID_PACKET: 1, NO_START_SYNC: 1, NO_STOP_SYNC: 1, WRONG_PACKET_LENGTH: 1}
+
+
+def test_packet_length_comes_from_the_ccsds_header():
+    sample = get_example_data(1)
+    sample[100:102] = bytearray([0xa5, 0xa5])  # A stop sync pattern in the data doesn't end the packet
+    parser = MinxssParser(sample)
+    assert parser.parse_packet() is not None
+
+    sample = get_example_data(1)
+    sample[5] -= 1  # Packet length field one short of a housekeeping packet
+    parser = MinxssParser(sample)
+    assert parser.parse_packet() is None
+    assert parser.status == WRONG_PACKET_LENGTH
+
+
+def test_packet_logging_is_opt_in(caplog):
+    caplog.set_level(PACKET_LOG_LEVEL)
+    MinxssParser(get_example_data(1)).parse_packet()
+    assert not [record for record in caplog.records if record.levelno == PACKET_LOG_LEVEL]
+
+    Logger().enable_packet_logging()
+    try:
+        MinxssParser(get_example_data(1)).parse_packet()
+        MinxssParser(get_example_data(1)[1:]).parse_packet()
+    finally:
+        Logger().enable_packet_logging(False)
+    packet_messages = [record.getMessage() for record in caplog.records if record.levelno == PACKET_LOG_LEVEL]
+    assert len(packet_messages) == 2
+    assert packet_messages[0].startswith('From MinXSS parser:')
+    assert packet_messages[1].startswith('Invalid packet detected.')
+
+
+def test_xp_uses_all_four_bytes():
+    telemetry = MinxssParser(get_example_data(3)).parse_packet()
+    assert telemetry['Xp'] == 0x0107
+
+
+def test_parse_many_with_python_backend():
+    packets = get_example_data(1) + get_example_data(2)
+    numpy_telemetry = MinxssParser.parse_many(packets)
+    python_telemetry = MinxssParser.parse_many(packets, backend='python')
+    for key in numpy_telemetry:
+        assert list(numpy_telemetry[key]) == python_telemetry[key]
+
+
+def test_housekeeping_fields_cover_whole_packet():
+    covered_bytes = []
+    for field in housekeeping_fields:
+        covered_bytes.extend(range(field.offset, field.offset + field.width))
+    assert set(covered_bytes) == set(range(252))  # Everything up to the stop sync
+
+
+def test_ccsds_header_and_time():
+    telemetry = MinxssParser(get_example_data(1)).parse_telemetry()
+    assert telemetry['Apid'] == 25
+    assert telemetry['CcsdsSecondaryHeaderFlag'] == 1
+    assert telemetry['SequenceFlags'] == 3
+    assert telemetry['SequenceCount'] == 15707
+    assert telemetry['PacketDataLength'] == 247
+    assert telemetry['SpacecraftTimeSeconds'] == 1176276536
+    assert telemetry['SpacecraftTimeMilliseconds'] == 363
+
+
+def test_decode_all_matches_lazy_decode():
+    sample = get_example_data(4)
+    all_at_once = MinxssParser(sample).parse_telemetry().decode_all()
+    one_at_a_time = MinxssParser(sample).parse_telemetry()
+    for name in one_at_a_time:
+        assert all_at_once[name] == one_at_a_time[name]
+
+    names = list(one_at_a_time) + ['SolarPanelPlusXPower']
+    for number_accessed in [1, len(names) * 3 // 4]:  # Either side of decoding the rest one at a time or in one pass
+        partly_decoded = MinxssParser(sample).parse_telemetry()
+        for name in names[:number_accessed]:
+            partly_decoded[name]
+        assert partly_decoded.to_dict() == all_at_once.to_dict()
+
+
+def test_parse_packet_subset():
+    telemetry = MinxssParser(get_example_data(1)).parse_packet(fields=['Apid', 'BatteryVoltage'])
+    assert list(telemetry) == ['Apid', 'BatteryVoltage']
+    assert telemetry['Apid'] == 25
+    assert telemetry['BatteryVoltage'] == minxss_parser.parse_packet()['BatteryVoltage']
+
+    with pytest.raises(KeyError):
+        MinxssParser(get_example_data(1)).parse_packet(fields=['NotATelemetryPoint'])
+
+
+def test_parse_many_subset_with_big_endian_fields():
+    packets = get_example_data(1) + get_example_data(2)
+    fields = ['Apid', 'SequenceCount', 'Eclipse', 'BatteryVoltage']
+    numpy_telemetry = MinxssParser.parse_many(packets, fields=fields)
+    python_telemetry = MinxssParser.parse_many(packets, backend='python', fields=fields)
+    assert list(python_telemetry) == fields
+    assert python_telemetry['SequenceCount'] == [15707, 15761]
+    for key in fields:
+        assert list(numpy_telemetry[key]) == python_telemetry[key]
+
+
+def test_delta_decoder_reports_changes():
+    delta_decoder = DeltaDecoder()
+    sample = get_example_data(1)
+    telemetry, changed_telemetry = delta_decoder.parse_telemetry(sample)
+    assert len(changed_telemetry) == len(housekeeping_fields) + 3  # Everything, including derived power, at first
+    assert telemetry.to_dict() == MinxssParser(sample).parse_telemetry().to_dict()
+
+    telemetry, changed_telemetry = delta_decoder.parse_telemetry(sample)
+    assert changed_telemetry == []
+    assert telemetry['BatteryVoltage'] == MinxssParser(sample).parse_packet()['BatteryVoltage']
+
+    next_packet = bytearray(sample)
+    next_packet[136:138] = (1000).to_bytes(2, 'little')  # SolarPanelMinusYCurrent
+    next_packet[12] = (next_packet[12] & ~0x07) | (next_packet[12] + 1 & 0x07)  # SpacecraftMode but not Eclipse
+    telemetry, changed_telemetry = delta_decoder.parse_telemetry(next_packet)
+    assert sorted(changed_telemetry) == ['SolarPanelMinusYCurrent', 'SolarPanelMinusYPower', 'SpacecraftMode']
+    assert telemetry.to_dict() == MinxssParser(next_packet).parse_telemetry().to_dict()
+    assert telemetry['SolarPanelMinusYPower'] == MinxssParser(next_packet).parse_telemetry()['SolarPanelMinusYPower']
+
+
+def test_delta_decoder_matches_full_decode():
+    delta_decoder = DeltaDecoder()
+    for sample_number in [1, 2, 3, 4, 6, 1]:
+        sample = get_example_data(sample_number)
+        telemetry, changed_telemetry = delta_decoder.parse_telemetry(sample)
+        assert telemetry.to_dict() == MinxssParser(sample).parse_telemetry().to_dict()
+
+    decoded_values = list(telemetry.values)
+    telemetry.decode_all()  # Keeps what the delta decoder already decoded
+    assert all(before is after for before, after in zip(decoded_values, telemetry.values) if before is not not_decoded)
+
+    assert delta_decoder.parse_telemetry(get_example_data(5)) == (None, [])
+    telemetry, changed_telemetry = delta_decoder.parse_telemetry(get_example_data(1))
+    assert changed_telemetry == []  # The invalid packet didn't replace the previous one
@@ -0,0 +1,46 @@
+from example_data import get_example_data
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from connect_port_get_packet import PacketReader
+from minxss_parser import MinxssParser
+from packet_demux import PacketDemultiplexer
+
+log_packet = bytearray([0x08, 0x1d, 0xc0, 0x01, 0x00, 0x0f]) + bytearray([0x10, 0x00, 0x00, 0x00, 0x20, 0x00]) + \
+             bytearray(b'Hello') + bytearray([0x00, 0x00, 0x00, 0xa5, 0xa5])
+
+
+def test_dispatch_by_apid():
+    calls = []
+    packet_demultiplexer = PacketDemultiplexer()
+    packet_demultiplexer.register(lambda frame: calls.append(('housekeeping', frame)), HOUSEKEEPING_APID)
+    packet_demultiplexer.register(lambda frame: calls.append(('archive', frame)))
+    packet_demultiplexer.register(lambda frame: calls.append(('log', frame)), LOG_APID)
+
+    packet_demultiplexer.dispatch(HOUSEKEEPING_APID, 'beacon')
+    packet_demultiplexer.dispatch(LOG_APID, 'message')
+    packet_demultiplexer.dispatch(3, 'other')
+    assert calls == [('archive', 'beacon'), ('housekeeping', 'beacon'), ('archive', 'message'), ('log', 'message'),
+                     ('archive', 'other')]
+
+
+def test_log_packets_are_routed_not_dropped():
+    class ListPacketReader(PacketReader):
+        def __init__(self, chunks):
+            super(ListPacketReader, self).__init__()
+            self.chunks = chunks
+
+        def get_data_from_buffer(self):
+            return self.chunks.pop(0)
+
+    stream = get_example_data(1) + log_packet + get_example_data(2)
+    reader = ListPacketReader([stream[:300], stream[300:]])
+
+    log_messages = []
+    beacons = []
+    packet_demultiplexer = PacketDemultiplexer()
+    packet_demultiplexer.register(lambda frame: log_messages.append(MinxssParser(frame).parse_log_message()), LOG_APID)
+    packet_demultiplexer.register(lambda frame: beacons.append(MinxssParser(frame).parse_packet()), HOUSEKEEPING_APID)
+    for _ in range(3):
+        packet_demultiplexer.dispatch(*reader.read_any_packet())
+
+    assert log_messages == [(1, 16, 32, 'Hello')]
+    assert beacons == [MinxssParser(get_example_data(1)).parse_packet(), MinxssParser(get_example_data(2)).parse_packet()]
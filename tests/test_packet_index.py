@@ -0,0 +1,56 @@
+import os
+from example_data import get_example_data, log_packet
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from packet_index import CaptureWriter, PacketIndex, get_index_filename, gps_to_unix_seconds, index_record_struct
+
+
+def test_seek_straight_to_a_packet_or_time_range(tmpdir):
+    capture_filename = str(tmpdir.join('pass.dat'))
+    frames = [(get_example_data(1), HOUSEKEEPING_APID), (log_packet, LOG_APID), (get_example_data(2), HOUSEKEEPING_APID),
+              (get_example_data(3), HOUSEKEEPING_APID)]
+    capture_writer = CaptureWriter(capture_filename)
+    for receipt_time, (frame, apid) in zip([100.0, 109.0, 105.0, 127.0], frames):  # The clock was set back once
+        capture_writer.write(frame, apid, receipt_time)
+    capture_writer.close()
+
+    with PacketIndex(capture_filename) as packet_index:
+        assert len(packet_index) == 4
+        assert packet_index.read_frame(2) == get_example_data(2)
+        assert packet_index[1].apid == LOG_APID
+        assert packet_index[-1].offset == len(get_example_data(1) + log_packet + get_example_data(2))
+        assert [entry.receipt_time for entry in (packet_index[i] for i in range(4))] == [100.0, 109.0, 109.0, 127.0]
+        assert packet_index.get_time_range(105.0, 127.0) == range(1, 3)
+        assert packet_index.find_time(200.0) == 4
+        assert [frame for entry, frame in packet_index.read_frames(range(2, 4))] == [get_example_data(2), get_example_data(3)]
+
+
+def test_index_a_capture_saved_without_one(tmpdir):
+    capture = tmpdir.join('old_pass.dat')
+    capture.write_binary(bytes(get_example_data(1) + log_packet + get_example_data(2)))
+
+    with PacketIndex(str(capture)) as packet_index:
+        assert [entry.apid for entry in (packet_index[i] for i in range(len(packet_index)))] == \
+               [HOUSEKEEPING_APID, LOG_APID, HOUSEKEEPING_APID]
+        assert packet_index.read_frame(1) == log_packet
+        # Estimated from the spacecraft time, which follows each packet's header, and never going backward
+        assert packet_index[0].receipt_time == 1176276536 + 0.363 + gps_to_unix_seconds
+        assert packet_index[1].receipt_time == packet_index[0].receipt_time  # Its spacecraft time is from 1980
+        assert packet_index[2].receipt_time > packet_index[1].receipt_time
+
+
+def test_append_after_a_crash(tmpdir):
+    capture_filename = str(tmpdir.join('pass.dat'))
+    capture_writer = CaptureWriter(capture_filename)
+    capture_writer.write(get_example_data(1), HOUSEKEEPING_APID, os.path.getmtime(str(tmpdir)))
+    capture_writer.close()
+    with open(capture_filename, 'ab') as capture_file:  # Saved, but its record not written
+        capture_file.write(get_example_data(2))
+    with open(get_index_filename(capture_filename), 'ab') as index_file:  # Part of a record written
+        index_file.write(b'\x00' * 5)
+
+    capture_writer = CaptureWriter(capture_filename)
+    capture_writer.write(get_example_data(3), HOUSEKEEPING_APID)
+    capture_writer.close()
+    assert os.path.getsize(get_index_filename(capture_filename)) == 3 * index_record_struct.size
+    with PacketIndex(capture_filename) as packet_index:
+        assert [packet_index.read_frame(i) for i in range(3)] == [get_example_data(i) for i in (1, 2, 3)]
@@ -0,0 +1,85 @@
+import io
+from collections import Counter
+from example_data import get_example_data, log_packet
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from frame_extractor import FRAMED_PACKETS
+from minxss_parser import LogMessage, MinxssParser, NO_STOP_SYNC, WRONG_PACKET_LENGTH
+from packet_demux import PacketDemultiplexer
+import pipeline
+
+stream = get_example_data(1) + log_packet + get_example_data(2)
+
+
+def test_read_file_in_chunks(tmpdir):
+    recording = tmpdir.join('pass.bin')
+    recording.write_binary(bytes(stream))
+    chunks = list(pipeline.read_file(str(recording), chunk_size=100))
+    assert all(len(chunk) == 100 for chunk in chunks[:-1])
+    assert b''.join(chunks) == stream
+
+
+def test_extract_frames():
+    counters = Counter()
+    packets = list(pipeline.extract_frames([stream[:300], stream[300:]], counters))
+    assert packets == [(HOUSEKEEPING_APID, get_example_data(1)), (LOG_APID, log_packet),
+                       (HOUSEKEEPING_APID, get_example_data(2))]
+    assert counters[FRAMED_PACKETS] == 3
+
+
+def test_decode_kiss():
+    kiss_stream = bytearray([0xc0, 0x00]) + log_packet.replace(bytearray([0xc0]), bytearray([0xdb, 0xdc])) + \
+                  bytearray([0xc0, 0xc0, 0x00]) + get_example_data(1) + bytearray([0xc0])
+    packets = list(pipeline.decode_kiss([kiss_stream[:10], kiss_stream[10:]]))
+    assert packets == [(LOG_APID, log_packet), (HOUSEKEEPING_APID, get_example_data(1))]
+
+
+def test_parse_packets():
+    decoded_packets = list(pipeline.parse_packets(pipeline.extract_frames([stream])))
+    assert [decoded_packet.apid for decoded_packet in decoded_packets] == [HOUSEKEEPING_APID, LOG_APID, HOUSEKEEPING_APID]
+    assert decoded_packets[0].decoded['SequenceCount'] == 15707
+    assert decoded_packets[1].decoded == LogMessage(1, 16, 32, 'Hi')
+    assert decoded_packets[1].changed_telemetry == []
+    assert 'SequenceCount' in decoded_packets[2].changed_telemetry
+
+
+def test_short_log_frames_are_rejected():
+    runt = bytearray([0x08, 0x1d, 0xc0, 0x01, 0x00, 0x01, 0xa5, 0xa5])  # Stop sync right after the header, no time
+    kiss_runt = bytearray([0xc0, 0x00]) + runt.replace(bytearray([0xc0]), bytearray([0xdb, 0xdc])) + bytearray([0xc0])
+    for chunks, kiss in [([runt + get_example_data(1)], False),
+                         ([kiss_runt + bytearray([0xc0, 0x00]) + get_example_data(1) + bytearray([0xc0])], True)]:
+        decoded_packets = list(pipeline.build_pipeline(chunks, kiss))
+        assert [decoded_packet.apid for decoded_packet in decoded_packets if decoded_packet.decoded] == [HOUSEKEEPING_APID]
+
+    counters_before = MinxssParser.counters.copy()
+    truncated = log_packet[:10]  # Cut off within its spacecraft time
+    decoded_packets = list(pipeline.parse_packets([(LOG_APID, runt), (LOG_APID, truncated)]))
+    assert [decoded_packet.decoded for decoded_packet in decoded_packets] == [None, None]
+    assert MinxssParser.counters - counters_before == {WRONG_PACKET_LENGTH: 1, NO_STOP_SYNC: 1}
+
+
+def test_parse_packets_of_unknown_apid():
+    decoded_packet, = pipeline.parse_packets([(3, bytearray(10))])
+    assert decoded_packet.decoded is None
+
+
+def test_sinks_pass_packets_on():
+    binary_file = io.BytesIO()
+    routed = []
+    packet_demultiplexer = PacketDemultiplexer()
+    packet_demultiplexer.register(routed.append, LOG_APID)
+
+    decoded_packets = pipeline.build_pipeline([stream])
+    decoded_packets = pipeline.dispatch(pipeline.save_frames(decoded_packets, binary_file), packet_demultiplexer)
+    assert pipeline.run(decoded_packets) == 3
+    assert binary_file.getvalue() == stream
+    assert [decoded_packet.frame for decoded_packet in routed] == [log_packet]
+
+
+def test_reprocess_kiss_recording(tmpdir):
+    recording = tmpdir.join('pass.bin')
+    recording.write_binary(bytes(get_example_data(5)))
+    counters = Counter()
+    decoded_packets = list(pipeline.build_pipeline(pipeline.read_file(str(recording)), kiss=True, counters=counters))
+    assert len(decoded_packets) == 1
+    assert decoded_packets[0].decoded is not None
+    assert counters[FRAMED_PACKETS] == 1
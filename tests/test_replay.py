@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+from collections import Counter
+import numpy
+from example_data import get_example_data, log_packet
+from ccsds import HOUSEKEEPING_APID, LOG_APID
+from deduplicator import Deduplicator, DUPLICATE_PACKETS
+from frame_extractor import ABORTED_FRAMES, FRAMED_PACKETS
+import pipeline
+import replay
+
+stream = get_example_data(1) + log_packet + get_example_data(2)
+
+
+def test_find_packets_in_place_as_the_frame_extractor_does():
+    counters = Counter()
+    packets = [(apid, bytes(stream[start:end])) for apid, start, end in replay.find_packets(bytes(stream), counters)]
+    framed_packets = list(pipeline.extract_frames([stream]))
+    assert [apid for apid, packet in packets] == [HOUSEKEEPING_APID, LOG_APID, HOUSEKEEPING_APID]
+    assert all(frame.endswith(packet) for (apid, packet), (_, frame) in zip(packets, framed_packets))
+    assert counters[FRAMED_PACKETS] == 3
+
+    list(replay.find_packets(bytes(stream[:-10]), counters))
+    assert counters[ABORTED_FRAMES] == 1  # The capture ends part way through the last packet
+
+
+def test_replay_binary_and_hex_captures(tmpdir):
+    binary_capture = tmpdir.join('minxss_decoder.dat')
+    binary_capture.write_binary(bytes(stream))
+    hex_capture = tmpdir.join('minxss_decoder.txt')
+    hex_capture.write(''.join('0x{0:02x}'.format(byte) for byte in get_example_data(2) + get_example_data(3)))
+    empty_capture = tmpdir.join('empty.dat')
+    empty_capture.write_binary(b'')
+
+    output_file = io.StringIO()
+    counters = replay.replay([str(binary_capture), str(hex_capture), str(empty_capture)], replay.CsvSink(output_file),
+                             deduplicator=Deduplicator(float('inf')), batch_size=2)
+    rows = list(csv.DictReader(io.StringIO(output_file.getvalue())))
+    assert [int(row['SequenceCount']) for row in rows] == [15707, 15761, 14922]
+    assert set(rows[0]) == set(replay.default_field_names)
+    assert counters[replay.DECODED_PACKETS] == 3
+    assert counters[DUPLICATE_PACKETS] == 1  # Example 2 is in both captures
+
+
+def test_npz_sink(tmpdir):
+    capture = tmpdir.join('minxss_decoder.dat')
+    capture.write_binary(bytes(stream))
+    output_filename = str(tmpdir.join('telemetry.npz'))
+    sink, output_file = replay.open_sink(output_filename)
+    replay.replay([str(capture)], sink, ['SequenceCount', 'BatteryVoltage'], batch_size=1)
+    sink.close()
+    telemetry = numpy.load(output_filename)
+    assert list(telemetry['SequenceCount']) == [15707, 15761]
+    assert len(telemetry['BatteryVoltage']) == 2
+
+
+def test_chunks_hold_the_same_packets_as_the_whole_capture(tmpdir):
+    capture = tmpdir.join('minxss_decoder.dat')
+    capture.write_binary(bytes(stream * 20))
+    chunks = replay.split_capture(str(capture), chunk_length=1000)
+    assert len(chunks) > 3
+    assert chunks[0].start == 0 and chunks[-1].end is None
+    assert all(earlier.end == later.start for earlier, later in zip(chunks, chunks[1:]))
+
+    whole_capture = Counter()
+    list(replay.find_packets(bytes(stream * 20), whole_capture))
+    chunk_results = [replay.decode_chunk(chunk) for chunk in chunks]
+    assert sum((chunk_result.counters for chunk_result in chunk_results), Counter()) == whole_capture
+    assert [sequence_count for chunk_result in chunk_results for sequence_count in chunk_result.telemetry['SequenceCount']] == \
+           [15707, 15761] * 20
+
+
+def test_replay_in_parallel_matches_replay(tmpdir):
+    for name, copies in [('a.dat', 3), ('b.dat', 5)]:
+        tmpdir.join(name).write_binary(bytes((stream + get_example_data(3)) * copies))
+    captures = replay.get_capture_filenames([str(tmpdir)])
+    assert [os.path.basename(capture) for capture in captures] == ['a.dat', 'b.dat']
+
+    outputs = []
+    for replay_captures in [replay.replay, replay.replay_in_parallel]:
+        output_file = io.StringIO()
+        extra = {} if replay_captures is replay.replay else {'workers': 2, 'chunk_length': 500}
+        counters = replay_captures(captures, replay.CsvSink(output_file), deduplicator=Deduplicator(float('inf')), **extra)
+        outputs.append((output_file.getvalue(), counters))
+    assert outputs[0] == outputs[1]
+    assert outputs[0][1][replay.DECODED_PACKETS] == 3
@@ -0,0 +1,23 @@
+from ring_buffer import RingBuffer
+
+
+def test_write_and_consume():
+    ring_buffer = RingBuffer(8)
+    assert ring_buffer.write(b'abcde') == 5
+    ring_buffer.consume(2)
+    assert ring_buffer.copy(ring_buffer.head, ring_buffer.tail) == bytearray(b'cde')
+
+    # Doesn't fit after the tail, so the remaining bytes move to the start
+    assert ring_buffer.write(b'fghij') == 5
+    assert (ring_buffer.head, ring_buffer.tail) == (0, 8)
+    assert ring_buffer.copy(ring_buffer.head, ring_buffer.tail) == bytearray(b'cdefghij')
+
+
+def test_capacity_is_never_exceeded():
+    ring_buffer = RingBuffer(8)
+    assert ring_buffer.write(b'0123456789') == 8
+    assert ring_buffer.write(b'x') == 0
+    assert len(ring_buffer.data) == 8
+
+    ring_buffer.consume(8)
+    assert (ring_buffer.head, ring_buffer.tail) == (0, 0)
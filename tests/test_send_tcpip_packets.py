@@ -1,25 +1,57 @@
 # 1. Run this code in a dedicated terminal
 # 2. Launch the beacon decoder and connect it to ip = localhost, port = (see hard-code value below)
 # 3. Observe that the sequence of data are decoded and red/yellow/green highlighted
+# Importing it instead gives serve_example_packets, which simulates many stations on one event loop, e.g., for
+# benchmarks/load_test_aggregation_server.py
 
+import asyncio
 import socket
 import time
 from example_data import get_example_data
 
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 port = 10006
-server_socket.bind(('localhost', port))
-server_socket.listen(5)  # become a server socket, maximum 5 connections
-print('Ready for client connections on port {}.'.format(port))
+number_of_examples = 7
 
-# Infinite loop waiting for client connection
-test_in_progress = True
-while test_in_progress:
-    connection, address = server_socket.accept()
-    for i in range(0, 7):
+
+def send_example_packets(connection, cadence=3):
+    for i in range(0, number_of_examples):
         connection.send(get_example_data(i))
         print('Sent example packet data number {}'.format(i))
-        time.sleep(3)  # Nominal beacon cadence is actually 9 seconds
-        if i == 6:
-            print('Test complete.')
-            test_in_progress = False
+        time.sleep(cadence)  # Nominal beacon cadence is actually 9 seconds
+
+
+async def serve_example_packets(port=0, cadence=3, repeat=1):
+    """
+    A simulated station: sends each client that connects the example packets, repeat times, then hangs up
+    # Input:
+    #   port [int]: Port to listen on. Defaults to any free one.
+    #   cadence [float]: [s] Time between packets
+    #   repeat [int]: Number of times to send the examples, or None to keep sending them
+    # Output:
+    #   server [asyncio.Server]: Already listening. Close it when done.
+    """
+    async def handle_connection(reader, writer):
+        number_of_sends = 0
+        try:
+            while repeat is None or number_of_sends < repeat:
+                for i in range(0, number_of_examples):
+                    writer.write(get_example_data(i))
+                    await writer.drain()
+                    await asyncio.sleep(cadence)
+                number_of_sends += 1
+        except ConnectionError:  # The client hung up first
+            pass
+        writer.close()
+
+    return await asyncio.start_server(handle_connection, 'localhost', port)
+
+
+if __name__ == '__main__':
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.bind(('localhost', port))
+    server_socket.listen(5)  # become a server socket, maximum 5 connections
+    print('Ready for client connections on port {}.'.format(port))
+
+    connection, address = server_socket.accept()
+    send_example_packets(connection)
+    print('Test complete.')